@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Chronologie du premier démarrage, relue depuis tipi-setup.log
+Le log (partition boot du Pi) reçoit une ligne par phase de start.sh et du
+portail : « [tipi-setup] timeline <phase> <uptime>s », uptime = secondes
+depuis le démarrage du noyau. Le log est en ajout : chaque « start » ouvre
+un nouveau démarrage.
+
+Affiche, pour le dernier démarrage de chaque log (tous avec --all), l'instant
+de chaque phase, sa durée depuis la précédente et le délai boot → portail
+(phase portal-ready). Plusieurs logs — un par version de l'image — se
+comparent côte à côte.
+
+Usage :
+  boottime.py tipi-setup.log [autre.log…] [--all] [--json]
+"""
+
+import argparse
+import json
+import re
+
+_LINE = re.compile(r"\[tipi-setup\] timeline (\S+) ([\d.]+)s")
+
+
+def parse(path: str) -> list[list[tuple[str, float]]]:
+    """Démarrages du log, chacun liste de (phase, uptime)."""
+    boots = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            m = _LINE.search(line)
+            if not m:
+                continue
+            phase, up = m.group(1), float(m.group(2))
+            if phase == "start" or not boots:
+                boots.append([])
+            boots[-1].append((phase, up))
+    return boots
+
+
+def print_boot(name: str, boot: list[tuple[str, float]]):
+    print(f"== {name}")
+    print(f"{'phase':<16}{'uptime (s)':>12}{'Δ (s)':>10}")
+    previous = None
+    for phase, up in boot:
+        delta = "" if previous is None else f"{up - previous:.2f}"
+        print(f"{phase:<16}{up:>12.2f}{delta:>10}")
+        previous = up
+    ready = dict(boot).get("portal-ready")
+    print(f"{'boot → portail':<16}{ready:>12.2f}" if ready is not None
+          else "boot → portail : portail jamais prêt dans ce démarrage")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("logs", nargs="+")
+    parser.add_argument("--all", action="store_true", help="tous les démarrages, pas seulement le dernier")
+    parser.add_argument("--json", action="store_true", help="sortie JSON {log: [{phase: uptime}]}")
+    args = parser.parse_args()
+
+    result = {}
+    for path in args.logs:
+        boots = parse(path)
+        result[path] = boots if args.all else boots[-1:]
+
+    if args.json:
+        print(json.dumps({path: [dict(b) for b in boots] for path, boots in result.items()}, indent=2))
+        return
+    for path, boots in result.items():
+        if not boots:
+            print(f"== {path}\naucune ligne timeline")
+        for i, boot in enumerate(boots):
+            print_boot(path if len(boots) == 1 else f"{path} #{i + 1}", boot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Binaire de substitution pour le simulateur
+Installé par sim.py sous le nom de chaque commande système (nmcli, apt-get,
+docker, systemctl…). Rejoue la durée, la sortie et le code retour enregistrés
+dans la recording TIPI_SIM_RECORDING, et journalise l'appel dans TIPI_SIM_LOG.
+
+Une entrée peut aussi rejouer `status_repeat` sur le fd passé par
+`-o APT::Status-Fd=N` (apt-get), entrelacé avec la sortie ; gabarit avec
+{i}, {n} (= i + 1) et {pct} (n / count en %).
+
+Variables d'environnement :
+  TIPI_SIM_RECORDING  chemin de la recording JSON (obligatoire)
+  TIPI_SIM_SPEED      facteur d'accélération des durées (défaut : 1)
+  TIPI_SIM_LOG        fichier JSON-lines des appels (optionnel)
+"""
+
+import json
+import os
+import sys
+import time
+
+
+def _match(recording: dict, argv: list[str]) -> dict | None:
+    """Première entrée dont `argv` est un préfixe de la ligne de commande."""
+    for entry in recording.get("commands", []):
+        pattern = entry["argv"]
+        if argv[:len(pattern)] == pattern:
+            return entry
+    return None
+
+
+def _lines(entry: dict) -> list[str]:
+    lines = list(entry.get("output", []))
+    repeat = entry.get("output_repeat")
+    if repeat:
+        lines += [repeat["template"].format(i=i) for i in range(repeat["count"])]
+    return lines
+
+
+def _status(entry: dict, argv: list[str]):
+    """(fichier, lignes) de la sortie APT::Status-Fd, ou (None, [])."""
+    repeat = entry.get("status_repeat")
+    fd = next((a.split("=", 1)[1] for a in argv if a.startswith("APT::Status-Fd=")), None)
+    if not repeat or fd is None:
+        return None, []
+    count = repeat["count"]
+    lines = [repeat["template"].format(i=i, n=i + 1, pct=f"{(i + 1) * 100 / count:.4f}")
+             for i in range(count)]
+    return os.fdopen(int(fd), "w"), lines
+
+
+def main() -> int:
+    argv = [os.path.basename(sys.argv[0])] + sys.argv[1:]
+    with open(os.environ["TIPI_SIM_RECORDING"]) as f:
+        recording = json.load(f)
+    speed = float(os.environ.get("TIPI_SIM_SPEED", "1")) or 1.0
+
+    entry = _match(recording, argv)
+    matched = entry is not None
+    entry = entry or recording.get("default", {})
+
+    if entry.get("stdin"):
+        sys.stdin.buffer.read()
+
+    start = time.time()
+    duration = float(entry.get("duration", 0)) / speed
+    lines = _lines(entry)
+    # Sortie répartie régulièrement sur la durée enregistrée
+    pause = duration / (len(lines) + 1) if lines else duration
+    out = sys.stderr if entry.get("stream") == "stderr" else sys.stdout
+    status, status_lines = _status(entry, argv)
+    sent = 0
+    for k, line in enumerate(lines):
+        if pause:
+            time.sleep(pause)
+        out.write(line + "\n")
+        out.flush()
+        if status:
+            upto = (k + 1) * len(status_lines) // len(lines)
+            status.write("".join(s + "\n" for s in status_lines[sent:upto]))
+            status.flush()
+            sent = upto
+    if status:
+        status.write("".join(s + "\n" for s in status_lines[sent:]))
+        status.close()
+    if pause:
+        time.sleep(pause)
+
+    rc = int(entry.get("rc", 0))
+    log_path = os.environ.get("TIPI_SIM_LOG")
+    if log_path:
+        with open(log_path, "a") as f:
+            f.write(json.dumps({
+                "argv": argv, "matched": matched, "rc": rc,
+                "start": round(start, 3), "end": round(time.time(), 3),
+            }) + "\n")
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
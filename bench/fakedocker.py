@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Faux démon Docker pour le simulateur
+Démarré par sim.py sur un socket Unix (DOCKER_HOST=unix://…). Sert le
+sous-ensemble de l'API Engine utilisé par dockerapi.py :
+
+  GET /containers/<nom>/json   état du container (404 tant qu'il n'existe pas)
+  GET /events                  flux chunked des transitions (start, health_status)
+
+Le scénario vient de la section "docker" de la recording :
+  {"containers": [{"name": "runtipi", "running_after": 25, "healthy_after": 35}, …]}
+Les délais (s, divisés par la vitesse) partent de la première requête reçue,
+c'est-à-dire de la fin de l'installateur.
+"""
+
+import json
+import os
+import select
+import socketserver
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+
+
+class FakeDocker:
+    def __init__(self, path: str, spec: dict, speed: float = 1.0):
+        self.path = path
+        self._containers = {c["name"]: c for c in spec.get("containers", [])}
+        self._speed = speed or 1.0
+        self._t0 = None
+        self._lock = threading.Lock()
+        self._server = None
+
+    # ------------------------------------------------------------------ #
+    #  Scénario                                                          #
+    # ------------------------------------------------------------------ #
+    def _elapsed(self) -> float:
+        with self._lock:
+            if self._t0 is None:
+                self._t0 = time.monotonic()
+            return (time.monotonic() - self._t0) * self._speed
+
+    def inspect(self, name: str) -> dict | None:
+        spec = self._containers.get(name)
+        now = self._elapsed()
+        if spec is None or now < spec.get("created_after", 0):
+            return None
+        state = {"Status": "running" if now >= spec.get("running_after", 0) else "created"}
+        if "healthy_after" in spec:
+            state["Health"] = {"Status": "healthy" if now >= spec["healthy_after"] else "starting"}
+        return {"Name": "/" + name, "State": state}
+
+    def events(self, names) -> list[tuple[float, dict]]:
+        """Transitions (instant, événement) triées, au format de /events."""
+        timeline = []
+        for name, spec in self._containers.items():
+            if names and name not in names:
+                continue
+            actions = [("start", spec.get("running_after", 0))]
+            if "healthy_after" in spec:
+                actions.append(("health_status: healthy", spec["healthy_after"]))
+            for action, at in actions:
+                timeline.append((at, {
+                    "Type": "container", "Action": action,
+                    "Actor": {"ID": name, "Attributes": {"name": name}},
+                }))
+        return sorted(timeline, key=lambda e: e[0])
+
+    # ------------------------------------------------------------------ #
+    #  Serveur                                                           #
+    # ------------------------------------------------------------------ #
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts[-3:-2] == ["containers"] and parts[-1] == "json":
+                    info = fake.inspect(parts[-2])
+                    body = json.dumps(info or {"message": "No such container"}).encode()
+                    self.send_response(200 if info else 404)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif parts[-1] == "events":
+                    filters = json.loads(urllib.parse.parse_qs(url.query).get("filters", ["{}"])[0])
+                    self._stream(filters.get("container"))
+                else:
+                    self.send_error(404)
+
+            def _stream(self, names):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self.wfile.flush()
+                start = fake._elapsed()
+                for at, event in fake.events(names):
+                    if at <= start:
+                        continue
+                    wait = (at - fake._elapsed()) / fake._speed
+                    # Client parti (socket lisible = EOF) : on arrête
+                    if wait > 0 and select.select([self.connection], [], [], wait)[0]:
+                        return
+                    data = json.dumps(event).encode() + b"\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+                # Comme dockerd, le flux reste ouvert jusqu'à la déconnexion
+                select.select([self.connection], [], [])
+                self.close_connection = True
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Banc des sondes de portail captif
+Compare le répondeur captive.py (asyncio, port 80 sur le hotspot) au même
+traitement par le portail Flask (pool de threads de server.py) :
+
+  - latence d'une sonde (connexion neuve par sonde, comme les OS) ;
+  - débit sous rafale (N clients concurrents) et sondes refusées (503) ;
+  - délai jusqu'à la fenêtre captive : sonde → redirection → page du portail
+    chargée (/configure), c'est-à-dire ce que l'OS affiche.
+
+Les deux serveurs tournent dans un processus fils (environnement simulé de
+sim.py), les clients dans celui-ci.
+
+Usage :
+  probes.py [--probes N] [--clients C] [--burst B] [--recording R]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from sim import APP_DIR, DEFAULT_RECORDING, simulation
+
+# Sondes de connectivité, par OS (même liste que CAPTIVE_PORTAL_PATHS d'app.py)
+PROBES = (
+    ("connectivitycheck.gstatic.com", "/generate_204"),       # Android
+    ("www.google.com", "/gen_204"),                            # Android (ancien)
+    ("captive.apple.com", "/hotspot-detect.html"),             # iOS / macOS
+    ("www.apple.com", "/library/test/success.html"),           # iOS (ancien)
+    ("www.msftconnecttest.com", "/connecttest.txt"),           # Windows 10/11
+    ("www.msftncsi.com", "/ncsi.txt"),                         # Windows 7/8
+    ("www.msftconnecttest.com", "/redirect"),                  # Windows (navigateur)
+    ("detectportal.firefox.com", "/success.txt"),              # Firefox
+    ("detectportal.firefox.com", "/canonical.html"),           # Firefox
+)
+
+_SERVERS = r"""
+import asyncio, json, sys, threading
+sys.path.insert(0, sys.argv[1])
+import app, captive, server
+
+portal = server.PooledWSGIServer("127.0.0.1", 0, app.app)
+threading.Thread(target=portal.serve_forever, daemon=True).start()
+portal_url = f"http://127.0.0.1:{portal.server_port}/"
+
+async def main():
+    srv = await captive.ProbeResponder(portal_url).start("127.0.0.1", 0)
+    print(json.dumps({"portal": portal.server_port,
+                      "captive": srv.sockets[0].getsockname()[1]}), flush=True)
+    await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+
+asyncio.run(main())
+"""
+
+
+def _get(port: int, host: str, path: str) -> http.client.HTTPResponse:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", path, headers={"Host": host})
+    resp = conn.getresponse()
+    resp.read()
+    conn.close()
+    return resp
+
+
+def latency(port: int, n: int) -> list[float]:
+    samples = []
+    for i in range(n):
+        host, path = PROBES[i % len(PROBES)]
+        start = time.perf_counter()
+        _get(port, host, path)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def burst(port: int, clients: int, per_client: int) -> tuple[float, int]:
+    """(sondes/s, sondes non redirigées) pour `clients` clients concurrents."""
+    refused = [0]
+    lock = threading.Lock()
+    gate = threading.Barrier(clients + 1)
+
+    def client(k: int):
+        gate.wait()
+        for i in range(per_client):
+            host, path = PROBES[(k + i) % len(PROBES)]
+            try:
+                ok = _get(port, host, path).status == 302
+            except OSError:
+                ok = False
+            if not ok:
+                with lock:
+                    refused[0] += 1
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(clients)]
+    for t in threads:
+        t.start()
+    gate.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return clients * per_client / (time.perf_counter() - start), refused[0]
+
+
+def time_to_popup(port: int, portal_port: int, n: int) -> list[float]:
+    """Sonde, puis redirections suivies jusqu'à la page du portail (200)."""
+    samples = []
+    for i in range(n):
+        host, path = PROBES[i % len(PROBES)]
+        start = time.perf_counter()
+        resp = _get(port, host, path)
+        hops = 0
+        while resp.status in (301, 302) and hops < 5:
+            url = urlsplit(resp.getheader("Location"))
+            resp = _get(url.port or portal_port, "portal", url.path or "/")
+            hops += 1
+        if resp.status != 200:
+            raise SystemExit(f"fenêtre captive : statut final {resp.status} pour {path}")
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _pct(samples: list[float], q: float) -> float:
+    return sorted(samples)[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--probes", type=int, default=300, help="sondes séquentielles par serveur")
+    parser.add_argument("--clients", type=int, default=64, help="clients concurrents de la rafale")
+    parser.add_argument("--burst", type=int, default=20, help="sondes par client dans la rafale")
+    parser.add_argument("--recording", default=DEFAULT_RECORDING)
+    args = parser.parse_args()
+
+    with simulation(args.recording, speed=100) as (_, env):
+        proc = subprocess.Popen([sys.executable, "-c", _SERVERS, os.path.abspath(APP_DIR)],
+                                env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        try:
+            ports = json.loads(proc.stdout.readline())
+            _get(ports["portal"], "portal", "/configure")   # rendu initial hors mesure
+            rows = []
+            for name, port in (("captive.py", ports["captive"]), ("flask", ports["portal"])):
+                lat = latency(port, args.probes)
+                rate, refused = burst(port, args.clients, args.burst)
+                popup = time_to_popup(port, ports["portal"], max(args.probes // 10, len(PROBES)))
+                rows.append((name, statistics.median(lat), _pct(lat, 0.95), rate, refused,
+                             statistics.median(popup)))
+        finally:
+            proc.stdin.close()
+            proc.wait(timeout=10)
+
+    print(f"{'serveur':<12}{'p50 (ms)':>10}{'p95 (ms)':>10}{'sondes/s':>10}{'refusées':>10}{'popup (ms)':>12}")
+    for name, p50, p95, rate, refused, popup in rows:
+        print(f"{name:<12}{p50:>10.2f}{p95:>10.2f}{rate:>10.0f}{refused:>10}{popup:>12.2f}")
+    print(f"rafale : {args.clients} clients × {args.burst} sondes")
+
+
+if __name__ == "__main__":
+    main()
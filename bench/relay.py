@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Micro-banc du relais de sortie (relay.py)
+Compare, pour un même flux produit par un processus fils :
+
+  - setup  : run_cmd() — readline sur pipe texte + print(flush=True) par
+             ligne (avant) / relay.batches + une écriture par trame (après) ;
+  - portal : lecteur de la sortie de setup.py (runner.py) — readline + un
+             ProgressLog.append par ligne (avant) / relay.batches +
+             ProgressLog.extend par trame (après).
+
+Mesures : lignes/s, CPU du lecteur (processus courant, le producteur n'est
+pas compté), CPU par ligne et nombre d'écritures. --rate limite le débit du
+producteur (lignes/s) pour mesurer le CPU à un rythme d'apt-get réaliste ;
+0 = au plus vite.
+
+Usage :
+  relay.py [--lines N] [--rate R]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from sim import APP_DIR
+
+sys.path.insert(0, APP_DIR)
+import relay                            # noqa: E402
+from logstore import ProgressLog        # noqa: E402
+
+# Producteur : sortie type apt-get / docker pull (couleurs comprises), ou
+# lignes relayées et trames de messages (ipc.py) telles qu'écrites par setup.py
+_PRODUCER = r"""
+import sys, time
+n, rate, kind = int(sys.argv[1]), float(sys.argv[2]), sys.argv[3]
+if kind == "setup":
+    lines = ["Unpacking libfoo%d (1.2.%d-1) over (1.2.0-1) ..." % (i, i) if i % 3 else
+             "\x1b[1;34m%x: Downloading\x1b[0m [=====>      ] %d.1MB/40MB" % (i, i % 40)
+             for i in range(n)]
+else:
+    lines = ['{"v":1,"msgs":[{"type":"step","key":"step_%d","params":{}}]}' % i if i % 200 == 0 else
+             "Setting up libfoo%d (1.2.%d-1) ..." % (i, i) for i in range(n)]
+out = sys.stdout
+if rate <= 0:
+    out.write("\n".join(lines) + "\n")
+else:
+    # Rafales toutes les 10 ms, comme un dpkg qui déballe
+    per_tick = max(1, int(rate / 100))
+    start = time.monotonic()
+    for k in range(0, n, per_tick):
+        out.write("\n".join(lines[k:k + per_tick]) + "\n")
+        out.flush()
+        delay = start + (k + per_tick) / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+out.flush()
+"""
+
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*[mGKHFABCDJr]')
+
+
+def _spawn(kind: str, n: int, rate: float, text: bool) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-c", _PRODUCER, str(n), str(rate), kind],
+                            stdout=subprocess.PIPE, text=text, bufsize=1 if text else 0)
+
+
+# ---------------------------------------------------------------------------
+# Lecteurs — « avant » reproduit le code remplacé par relay.py
+# ---------------------------------------------------------------------------
+def setup_before(proc, sink) -> int:
+    writes = 0
+    for line in iter(proc.stdout.readline, ""):
+        line = _ANSI_RE.sub("", line).rstrip()
+        if line:
+            print(line, file=sink, flush=True)
+            writes += 1
+    return writes
+
+
+def setup_after(proc, sink) -> int:
+    writes = 0
+    for lines in relay.batches(proc.stdout.fileno()):
+        sink.write("".join(line + "\n" for line in lines))
+        sink.flush()
+        writes += 1
+    return writes
+
+
+def portal_before(proc, log) -> int:
+    writes = 0
+    for raw in iter(proc.stdout.readline, ""):
+        line = raw.rstrip()
+        if line:
+            log.append({"msg": line, "level": "log", "ts": round(time.time(), 3)})
+            writes += 1
+    return writes
+
+
+def portal_after(proc, log) -> int:
+    writes = 0
+    for lines in relay.batches(proc.stdout.fileno(), interval=0, strip_ansi=False):
+        ts = round(time.time(), 3)
+        log.extend([{"msg": line, "level": "log", "ts": ts} for line in lines])
+        writes += 1
+    return writes
+
+
+def measure(kind: str, reader, text: bool, n: int, rate: float, target) -> dict:
+    proc = _spawn(kind, n, rate, text)
+    wall, cpu = time.perf_counter(), time.process_time()
+    writes = reader(proc, target)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    proc.wait()
+    return {"lines_s": n / wall, "cpu": cpu, "cpu_us_line": cpu / n * 1e6, "writes": writes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=200_000, help="lignes produites par mesure")
+    parser.add_argument("--rate", type=float, default=0, help="débit du producteur (lignes/s, 0 = max)")
+    args = parser.parse_args()
+
+    rows = []
+    with open(os.devnull, "w") as sink, tempfile.TemporaryDirectory() as tmp:
+        for name, reader, text in (("avant", setup_before, True), ("relais", setup_after, False)):
+            rows.append(("setup", name, measure("setup", reader, text, args.lines, args.rate, sink)))
+        for name, reader, text in (("avant", portal_before, True), ("relais", portal_after, False)):
+            log = ProgressLog(os.path.join(tmp, name, "progress.jsonl"))
+            rows.append(("portal", name, measure("portal", reader, text, args.lines, args.rate, log)))
+
+    print(f"{'étage':<8}{'lecteur':<9}{'lignes/s':>12}{'CPU (s)':>10}{'µs/ligne':>10}{'écritures':>11}")
+    for stage, name, r in rows:
+        print(f"{stage:<8}{name:<9}{r['lines_s']:>12.0f}{r['cpu']:>10.2f}"
+              f"{r['cpu_us_line']:>10.2f}{r['writes']:>11}")
+    print(f"{args.lines} lignes, débit producteur : {'max' if not args.rate else f'{args.rate:.0f} lignes/s'}")
+
+
+if __name__ == "__main__":
+    main()
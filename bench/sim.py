@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Simulateur hermétique du premier démarrage
+Exécute setup.py (ou le portail complet) contre des binaires de substitution
+(fakebin.py), un faux démon Docker (fakedocker.py) et une racine jetable,
+puis mesure chaque étape.
+
+Usage :
+  sim.py pipeline [--recording R] [--runs N] [--speed S] [--baseline B] [--output O]
+  sim.py portal   [--recording R] [--runs N] [--speed S] [--baseline B] [--output O]
+  sim.py import-report <tipi-install-report.json> [--recording R]
+  sim.py eta-failure [--recording R] [--speed S]
+
+`pipeline` lance setup.py seul, `portal` pilote app.py (formulaire → fin de
+l'installation). Avec --baseline, toute étape dont la médiane dépasse la
+référence au-delà de la tolérance fait échouer la commande (code 1).
+`import-report` recale les durées d'une recording sur un rapport réel
+(/boot/firmware/tipi-install-report.json d'un Pi). `eta-failure` fait
+échouer l'installateur Runtipi sous le superviseur (runner.py) et vérifie
+que la table des durées (eta.py) n'a pas bougé (code 1 sinon).
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from fakedocker import FakeDocker
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR   = os.path.join(BENCH_DIR, "..", "stage-tipi", "01-config", "files", "app")
+DEFAULT_RECORDING = os.path.join(BENCH_DIR, "recordings", "pi4-ethernet.json")
+
+sys.path.insert(0, APP_DIR)
+import ipc                              # noqa: E402
+
+# Commandes toujours remplacées, même absentes de la recording : aucune ne doit
+# atteindre le vrai système pendant une simulation.
+FAKE_COMMANDS = (
+    "apt-get", "bash", "chpasswd", "curl", "docker", "getent", "hostnamectl",
+    "id", "ip", "locale-gen", "nmcli", "pkill", "ssh-keygen", "sshd",
+    "systemctl", "timedatectl", "update-locale", "useradd", "userdel",
+)
+
+SIM_CONFIG = {
+    "hostname": "simpi", "username": "alice", "password": "correct-horse",
+    "ssh_port": "22", "ssh_key": "", "disable_password_auth": False,
+    "timezone": "Europe/Paris", "locale": "fr_FR.UTF-8",
+    "static_ip": "", "static_gw": "", "static_dns": "8.8.8.8",
+    "wifi_ssid": "", "wifi_password": "", "cockpit_enabled": False, "lang": "en",
+}
+
+
+# ---------------------------------------------------------------------------
+# Environnement jetable
+# ---------------------------------------------------------------------------
+
+def make_root(base: str) -> str:
+    """Crée une racine minimale : /etc/hosts, sshd_config, locale.gen, /boot/firmware…"""
+    root = os.path.join(base, "root")
+    for d in ("etc/ssh", "boot/firmware", "var/lib/tipi-setup", "tmp", "opt", "home"):
+        os.makedirs(os.path.join(root, d), exist_ok=True)
+    files = {
+        "etc/hosts": "127.0.0.1\tlocalhost\n127.0.1.1\ttipisetup\n",
+        "etc/ssh/sshd_config": "#Port 22\n#PermitRootLogin prohibit-password\n#PasswordAuthentication yes\n",
+        "etc/locale.gen": "# en_GB.UTF-8 UTF-8\n# en_US.UTF-8 UTF-8\n# fr_FR.UTF-8 UTF-8\n",
+        "var/lib/tipi-setup/.not-configured": "",
+    }
+    for rel, content in files.items():
+        with open(os.path.join(root, rel), "w") as f:
+            f.write(content)
+    return root
+
+
+def make_bin(base: str, recording: dict) -> str:
+    bin_dir = os.path.join(base, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    fake = os.path.join(BENCH_DIR, "fakebin.py")
+    os.chmod(fake, 0o755)
+    names = set(FAKE_COMMANDS) | {c["argv"][0] for c in recording.get("commands", [])}
+    for name in names:
+        os.symlink(fake, os.path.join(bin_dir, name))
+    return bin_dir
+
+
+_probe_port: int | None = None
+
+
+def probe_listener() -> int:
+    """Écoute TCP locale qui remplace les hôtes sondés par netwait (hors réseau)."""
+    global _probe_port
+    if _probe_port is None:
+        srv = socket.create_server(("127.0.0.1", 0))
+
+        def _accept():
+            while True:
+                conn, _ = srv.accept()
+                conn.close()
+
+        threading.Thread(target=_accept, daemon=True).start()
+        _probe_port = srv.getsockname()[1]
+    return _probe_port
+
+
+@contextmanager
+def simulation(recording_path: str, speed: float):
+    """Racine, binaires et faux démon Docker jetables ; produit (base, env)."""
+    with open(recording_path) as f:
+        recording = json.load(f)
+    with tempfile.TemporaryDirectory(prefix="tipi-sim-") as base:
+        docker = FakeDocker(os.path.join(base, "docker.sock"), recording.get("docker", {}), speed).start()
+        try:
+            yield base, sim_env(base, recording_path, recording, speed, docker.path)
+        finally:
+            docker.stop()
+
+
+def sim_env(base: str, recording_path: str, recording: dict, speed: float, docker_sock: str) -> dict:
+    return {
+        **os.environ,
+        "PATH": make_bin(base, recording) + os.pathsep + os.environ.get("PATH", ""),
+        "TIPI_ROOT": make_root(base),
+        "TIPI_SIM_RECORDING": os.path.abspath(recording_path),
+        "TIPI_SIM_SPEED": str(speed),
+        "TIPI_SIM_LOG": os.path.join(base, "calls.jsonl"),
+        "TIPI_PROBE_TARGETS": f"tcp://127.0.0.1:{probe_listener()}",
+        "DOCKER_HOST": f"unix://{docker_sock}",
+        "PYTHONUNBUFFERED": "1",
+    }
+
+
+# ---------------------------------------------------------------------------
+# Exécutions
+# ---------------------------------------------------------------------------
+
+def _steps_from_timing(lines) -> dict:
+    """Durées des étapes d'après les messages "timing" (trames ipc sur stdout)."""
+    steps = {}
+    for line in lines:
+        for msg in ipc.decode(line) or ():
+            if msg.get("type") == "timing" and msg.get("event") == "end":
+                steps[msg["step"]] = msg["duration"]
+    return steps
+
+
+def _warn_unmatched(base: str):
+    """Signale les commandes absentes de la recording (rejouées avec `default`)."""
+    try:
+        with open(os.path.join(base, "calls.jsonl")) as f:
+            calls = [json.loads(line) for line in f]
+    except OSError:
+        return
+    for argv in sorted({" ".join(c["argv"][:3]) for c in calls if not c["matched"]}):
+        print(f"avertissement : commande non enregistrée : {argv}", file=sys.stderr)
+
+
+def run_pipeline_once(recording: str, speed: float) -> dict:
+    with simulation(recording, speed) as (base, env):
+        config_path = os.path.join(env["TIPI_ROOT"], "tmp", "tipi-config.json")
+        with open(config_path, "w") as f:
+            json.dump(SIM_CONFIG, f)
+        start = time.monotonic()
+        proc = subprocess.run(
+            [sys.executable, os.path.join(APP_DIR, "setup.py"), config_path],
+            env=env, capture_output=True, text=True,
+        )
+        total = time.monotonic() - start
+        _warn_unmatched(base)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stdout[-2000:] + proc.stderr[-2000:])
+            raise SystemExit(f"setup.py a échoué (code {proc.returncode})")
+        return {"total": round(total, 3), "steps": _steps_from_timing(proc.stdout.splitlines())}
+
+
+_PORTAL_DRIVER = r"""
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+import app
+client = app.app.test_client()
+result = {"requests": {}, "bytes": {}}
+
+def timed(name, fn):
+    start = time.monotonic()
+    r = fn()
+    result["requests"][name] = round((time.monotonic() - start) * 1000, 2)
+    return r
+
+def page(name, path, headers={}):
+    r = timed(name + "_ms", lambda: client.get(path, headers=headers))
+    result["bytes"][name] = len(r.get_data())
+    return r
+
+page("configure", "/configure")
+page("configure_again", "/configure")
+gz = page("configure_gzip", "/configure", {"Accept-Encoding": "gzip"})
+page("configure_revalidate", "/configure",
+     {"Accept-Encoding": "gzip", "If-None-Match": gz.headers.get("ETag", "")})
+timed("wifi_rescan_ms", lambda: client.get("/wifi/rescan"))
+timed("wifi_rescan_cached_ms", lambda: client.get("/wifi/rescan"))
+cfg = json.loads(sys.argv[2])
+form = {**cfg, "confirm_password": cfg["password"]}
+start = time.monotonic()
+client.post("/configure/apply", data=form)
+since = 0
+payload = 0   # octets reçus par le navigateur pendant l'installation
+while True:
+    r = client.get(f"/progress/log?from={since}&wait=5")
+    payload += len(r.get_data())
+    data = r.get_json()
+    since += len(data["entries"])
+    if data["done"] and since >= data["total"]:
+        break
+result["total"] = round(time.monotonic() - start, 3)
+result["bytes"]["progress_log"] = payload
+with open(app.runner.INSTALL_REPORT_PATH) as f:
+    report = json.load(f)
+result["steps"] = {k: v["duration"] for k, v in report["steps"].items() if "duration" in v}
+print(json.dumps(result))
+"""
+
+
+def run_portal_once(recording: str, speed: float) -> dict:
+    with simulation(recording, speed) as (base, env):
+        proc = subprocess.run(
+            [sys.executable, "-c", _PORTAL_DRIVER, os.path.abspath(APP_DIR), json.dumps(SIM_CONFIG)],
+            env=env, capture_output=True, text=True,
+        )
+        _warn_unmatched(base)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr[-4000:])
+            raise SystemExit(f"le portail a échoué (code {proc.returncode})")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_eta_failure(recording_path: str, speed: float) -> list[str]:
+    """Installateur Runtipi en échec (code 1) sous runner.py : la table des
+    durées ne doit pas recevoir la tentative ratée. Retourne les anomalies."""
+    with open(recording_path) as f:
+        recording = json.load(f)
+    for entry in recording["commands"]:
+        if entry["argv"] == ["bash"]:
+            entry.update(rc=1, duration=2.0)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(recording, f)
+    try:
+        with simulation(f.name, speed) as (base, env):
+            root = env["TIPI_ROOT"]
+            config_path = os.path.join(root, "tmp", "tipi-config.json")
+            with open(config_path, "w") as cfg:
+                json.dump(SIM_CONFIG, cfg)
+            table_path = os.path.join(root, "var", "lib", "tipi-setup", "step-durations.json")
+            with open(os.path.join(APP_DIR, "step-durations.json")) as src:
+                before = src.read()
+            with open(table_path, "w") as dst:
+                dst.write(before)
+            subprocess.run([sys.executable, os.path.join(APP_DIR, "runner.py"), config_path],
+                           env=env, capture_output=True, text=True)
+            _warn_unmatched(base)
+            with open(table_path) as t:
+                after = t.read()
+            with open(os.path.join(root, "boot", "firmware", "tipi-install-report.json")) as r:
+                report = json.load(r)
+    finally:
+        os.remove(f.name)
+    problems = []
+    status = report["steps"].get("runtipi", {}).get("status")
+    if status != "failed":
+        problems.append(f"étape runtipi rapportée « {status} » au lieu de « failed »")
+    if not report.get("install_failed"):
+        problems.append("rapport sans install_failed")
+    if after != before:
+        problems.append("table des durées modifiée par une installation en échec")
+    return problems
+
+
+# ---------------------------------------------------------------------------
+# Rapport et comparaison
+# ---------------------------------------------------------------------------
+
+def summarize(runs: list[dict]) -> dict:
+    names = sorted({name for r in runs for name in r["steps"]})
+    summary = {
+        "runs": len(runs),
+        "total": round(statistics.median(r["total"] for r in runs), 3),
+        "steps": {n: round(statistics.median(r["steps"].get(n, 0) for r in runs), 3) for n in names},
+    }
+    if runs and "requests" in runs[0]:
+        summary["requests"] = {
+            k: round(statistics.median(r["requests"][k] for r in runs), 2) for k in runs[0]["requests"]
+        }
+        summary["bytes"] = runs[0].get("bytes", {})
+    return summary
+
+
+def compare(summary: dict, baseline: dict, tolerance: float, min_delta: float) -> list[str]:
+    regressions = []
+    pairs = [("total", summary["total"], baseline.get("total"))]
+    pairs += [(n, v, baseline.get("steps", {}).get(n)) for n, v in summary["steps"].items()]
+    for name, value, ref in pairs:
+        if ref is not None and value > ref * (1 + tolerance) and value - ref > min_delta:
+            regressions.append(f"{name}: {value:.2f} s (référence {ref:.2f} s)")
+    return regressions
+
+
+def print_summary(summary: dict, baseline: dict | None):
+    ref_steps = (baseline or {}).get("steps", {})
+    print(f"{'étape':<14}{'médiane (s)':>12}{'référence':>12}")
+    for name, value in summary["steps"].items():
+        ref = ref_steps.get(name)
+        print(f"{name:<14}{value:>12.2f}{'' if ref is None else f'{ref:>12.2f}'}")
+    print(f"{'TOTAL':<14}{summary['total']:>12.2f}")
+    for name, ms in summary.get("requests", {}).items():
+        print(f"{name:<26}{ms:>8.2f} ms")
+    for name, size in summary.get("bytes", {}).items():
+        print(f"{name + '_bytes':<26}{size:>8} o")
+
+
+def import_report(report_path: str, recording_path: str):
+    """Recale la durée des commandes de la recording sur un rapport réel."""
+    with open(report_path) as f:
+        report = json.load(f)
+    with open(recording_path) as f:
+        recording = json.load(f)
+    measured = {}
+    for step in report.get("steps", {}).values():
+        for cmd in step.get("commands", []):
+            measured[tuple(cmd["name"].split())] = cmd["duration"]
+    updated = 0
+    for entry in recording["commands"]:
+        key = tuple(entry["argv"][:2])
+        if key in measured:
+            entry["duration"] = measured[key]
+            updated += 1
+    with open(recording_path, "w") as f:
+        json.dump(recording, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"{updated} commande(s) recalée(s) depuis {report_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=("pipeline", "portal", "import-report", "eta-failure"))
+    parser.add_argument("report", nargs="?", help="rapport d'installation (mode import-report)")
+    parser.add_argument("--recording", default=DEFAULT_RECORDING)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--speed", type=float, default=10.0,
+                        help="accélération des commandes simulées (les sleep internes de setup.py ne sont pas accélérés)")
+    parser.add_argument("--baseline", help="JSON de référence ({total, steps}) pour détecter les régressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="marge relative tolérée (défaut 15 %%)")
+    parser.add_argument("--min-delta", type=float, default=0.5, help="écart absolu minimal signalé (s)")
+    parser.add_argument("--output", help="écrit le résumé JSON (utilisable comme --baseline)")
+    args = parser.parse_args()
+
+    if args.mode == "import-report":
+        if not args.report:
+            parser.error("import-report attend le chemin du rapport")
+        import_report(args.report, args.recording)
+        return
+    if args.mode == "eta-failure":
+        problems = run_eta_failure(args.recording, args.speed)
+        for line in problems:
+            print(f"ÉCHEC {line}")
+        if problems:
+            sys.exit(1)
+        print("table des durées inchangée après un échec de Runtipi")
+        return
+
+    run_once = run_pipeline_once if args.mode == "pipeline" else run_portal_once
+    runs = [run_once(args.recording, args.speed) for _ in range(args.runs)]
+    summary = {"mode": args.mode, "speed": args.speed, **summarize(runs)}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+            f.write("\n")
+    if baseline:
+        regressions = compare(summary, baseline, args.tolerance, args.min_delta)
+        for line in regressions:
+            print(f"RÉGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,27 @@ install -v -d "${ROOTFS_DIR}/etc/hostapd"
 install -v -m 755 files/start.sh                          "${ROOTFS_DIR}/opt/tipi-setup/start.sh"
 install -v -m 644 files/app/app.py                        "${ROOTFS_DIR}/opt/tipi-setup/app.py"
 install -v -m 644 files/app/setup.py                      "${ROOTFS_DIR}/opt/tipi-setup/setup.py"
+install -v -m 644 files/app/netstate.py                   "${ROOTFS_DIR}/opt/tipi-setup/netstate.py"
+install -v -m 644 files/app/logstore.py                   "${ROOTFS_DIR}/opt/tipi-setup/logstore.py"
+install -v -m 644 files/app/pagecache.py                  "${ROOTFS_DIR}/opt/tipi-setup/pagecache.py"
+install -v -m 644 files/app/pipeline.py                   "${ROOTFS_DIR}/opt/tipi-setup/pipeline.py"
+install -v -m 644 files/app/ipc.py                        "${ROOTFS_DIR}/opt/tipi-setup/ipc.py"
+install -v -m 644 files/app/progress.py                   "${ROOTFS_DIR}/opt/tipi-setup/progress.py"
+install -v -m 644 files/app/relay.py                      "${ROOTFS_DIR}/opt/tipi-setup/relay.py"
+install -v -m 644 files/app/runner.py                     "${ROOTFS_DIR}/opt/tipi-setup/runner.py"
+install -v -m 644 files/app/bootlog.py                    "${ROOTFS_DIR}/opt/tipi-setup/bootlog.py"
+install -v -m 644 files/app/checkpoint.py                 "${ROOTFS_DIR}/opt/tipi-setup/checkpoint.py"
+install -v -m 644 files/app/eta.py                        "${ROOTFS_DIR}/opt/tipi-setup/eta.py"
+install -v -m 644 files/app/step-durations.json           "${ROOTFS_DIR}/opt/tipi-setup/step-durations.json"
+install -v -m 644 files/app/netwait.py                    "${ROOTFS_DIR}/opt/tipi-setup/netwait.py"
+install -v -m 644 files/app/ifwait.py                     "${ROOTFS_DIR}/opt/tipi-setup/ifwait.py"
+install -v -m 644 files/app/sdnotify.py                   "${ROOTFS_DIR}/opt/tipi-setup/sdnotify.py"
+install -v -m 644 files/app/dockerapi.py                  "${ROOTFS_DIR}/opt/tipi-setup/dockerapi.py"
+install -v -m 644 files/app/server.py                     "${ROOTFS_DIR}/opt/tipi-setup/server.py"
+install -v -m 644 files/app/captive.py                    "${ROOTFS_DIR}/opt/tipi-setup/captive.py"
 install -v -m 644 files/app/translations.py               "${ROOTFS_DIR}/opt/tipi-setup/translations.py"
+install -v -m 644 files/app/i18n.py                       "${ROOTFS_DIR}/opt/tipi-setup/i18n.py"
+install -v -m 644 files/app/assets.py                     "${ROOTFS_DIR}/opt/tipi-setup/assets.py"
 install -v -m 644 files/app/templates/base.html           "${ROOTFS_DIR}/opt/tipi-setup/templates/base.html"
 install -v -m 644 files/app/templates/wifi.html           "${ROOTFS_DIR}/opt/tipi-setup/templates/wifi.html"
 install -v -m 644 files/app/templates/configure.html      "${ROOTFS_DIR}/opt/tipi-setup/templates/configure.html"
@@ -19,6 +39,16 @@ install -v -m 644 files/app/templates/progress.html       "${ROOTFS_DIR}/opt/tip
 install -d                                                 "${ROOTFS_DIR}/opt/tipi-setup/static"
 install -v -m 644 files/app/static/favicon.ico            "${ROOTFS_DIR}/opt/tipi-setup/static/favicon.ico"
 
+# ---- Catalogues de traduction ----
+# Compilés une fois ici ; le build échoue si une langue ne couvre pas toutes
+# les clés de "en".
+python3 -B files/app/i18n.py build "${ROOTFS_DIR}/opt/tipi-setup/catalogs"
+
+# ---- Assets statiques (CSS/JS/favicon) ----
+# Minifiés, renommés d'après leur empreinte et précompressés (.gz, .br si la
+# commande brotli est présente) ; servis par /assets avec un cache immuable.
+python3 -B files/app/assets.py build files/app/static "${ROOTFS_DIR}/opt/tipi-setup/assets"
+
 # ---- Systemd service ----
 install -v -m 644 files/tipi-setup.service                "${ROOTFS_DIR}/etc/systemd/system/tipi-setup.service"
 install -v -m 644 files/tipi-runtipi-retry.service        "${ROOTFS_DIR}/etc/systemd/system/tipi-runtipi-retry.service"
@@ -32,6 +62,39 @@ install -v -m 600 files/hostapd.conf                      "${ROOTFS_DIR}/etc/hos
 install -v -d "${ROOTFS_DIR}/etc/NetworkManager/conf.d"
 printf '[connection]\nwifi.powersave = 2\n' > "${ROOTFS_DIR}/etc/NetworkManager/conf.d/wifi-powersave-off.conf"
 
+# ---- Bundle hors ligne (optionnel) ----
+# TIPI_OFFLINE=1 et TIPI_RUNTIPI_VERSION=vX.Y.Z (exportés dans la config pi-gen) :
+# épingle l'installateur, embarque la CLI et les images Docker de Runtipi
+# (docker save compressé). Au premier démarrage, setup.py les charge avec
+# `docker load` et démarre la pile sans aucun pull réseau.
+# Nécessite docker sur la machine de build. TIPI_OFFLINE_IMAGES doit suivre
+# le docker-compose de la version épinglée.
+if [ "${TIPI_OFFLINE:-0}" = "1" ]; then
+    : "${TIPI_RUNTIPI_VERSION:?TIPI_OFFLINE=1 requiert TIPI_RUNTIPI_VERSION (ex. v3.8.0)}"
+    OFFLINE_DIR="${ROOTFS_DIR}/opt/tipi-setup/offline"
+    OFFLINE_IMAGES="${TIPI_OFFLINE_IMAGES:-ghcr.io/runtipi/runtipi:${TIPI_RUNTIPI_VERSION} postgres:14 traefik:v3.1 rabbitmq:4-alpine}"
+    install -v -d "${OFFLINE_DIR}"
+    curl -fsSL https://setup.runtipi.io -o "${OFFLINE_DIR}/install.sh"
+    curl -fsSL "https://github.com/runtipi/runtipi/releases/download/${TIPI_RUNTIPI_VERSION}/runtipi-cli-linux-aarch64.tar.gz" \
+        -o "${OFFLINE_DIR}/runtipi-cli.tar.gz"
+    for img in ${OFFLINE_IMAGES}; do
+        docker pull --platform linux/arm64 "${img}"
+    done
+    # shellcheck disable=SC2086
+    docker save ${OFFLINE_IMAGES} | pigz -6 > "${OFFLINE_DIR}/runtipi-images.tar.gz"
+    IMAGES_JSON=$(printf '"%s",' ${OFFLINE_IMAGES})
+    cat > "${OFFLINE_DIR}/manifest.json" << MANIFEST
+{
+  "version": "${TIPI_RUNTIPI_VERSION}",
+  "installer": "install.sh",
+  "installer_sha256": "$(sha256sum "${OFFLINE_DIR}/install.sh" | cut -d' ' -f1)",
+  "cli": "runtipi-cli.tar.gz",
+  "images_archive": "runtipi-images.tar.gz",
+  "images": [${IMAGES_JSON%,}]
+}
+MANIFEST
+fi
+
 # ---- Marqueur de premier démarrage ----
 touch "${ROOTFS_DIR}/var/lib/tipi-setup/.not-configured"
 
@@ -69,6 +132,11 @@ systemctl disable cockpit.socket  2>/dev/null || true
 systemctl mask    cockpit.socket  2>/dev/null || true
 systemctl mask    cockpit.service 2>/dev/null || true
 
+# ---- Bundle hors ligne : Docker préinstallé (l'installateur ne le télécharge plus) ----
+if [ "${TIPI_OFFLINE:-0}" = "1" ]; then
+    apt-get install -y docker.io docker-compose
+fi
+
 # ---- Activer SSH (désactivé par défaut sur Trixie) ----
 systemctl enable ssh.service
 
@@ -14,25 +14,60 @@ import subprocess
 import threading
 import time
 from urllib.parse import quote
-from flask import Flask, Response, jsonify, redirect, render_template, request, session
-from translations import get_t, DEFAULT_LANG, SUPPORTED_LANGS, LANG_LABELS
+from flask import Flask, Response, jsonify, redirect, render_template, request, send_file, session
+from assets import Assets
+import bootlog
+import ipc
+from logstore import ProgressReader
+from pagecache import PageCache, RenderedPage
+import runner
+import server
+from netstate import get_state as get_netstate
+from i18n import get_t, DEFAULT_LANG, SUPPORTED_LANGS, LANG_LABELS
 
 # ---------------------------------------------------------------------------
 # Init Flask
 # ---------------------------------------------------------------------------
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
 STATIC_DIR  = os.path.join(os.path.dirname(__file__), "static")
+ASSETS_DIR  = os.path.join(os.path.dirname(__file__), "assets")   # produit par assets.py au build
 app = Flask(__name__, template_folder=TEMPLATE_DIR, static_folder=STATIC_DIR)
 app.secret_key = os.urandom(32)
 
+# CSS/JS empreintés : un nom donné ne change jamais de contenu
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_assets = Assets(ASSETS_DIR)
+app.jinja_env.globals["asset_url"] = _assets.url
+
+# ---------------------------------------------------------------------------
+# Racine du système de fichiers — TIPI_ROOT pointe vers une racine jetable
+# quand le portail tourne dans le simulateur (bench/sim.py)
+# ---------------------------------------------------------------------------
+ROOT = os.environ.get("TIPI_ROOT", "/")
+
+
+def rooted(path: str) -> str:
+    return os.path.join(ROOT, path.lstrip("/"))
+
 # ---------------------------------------------------------------------------
-# État global partagé (setup tourne dans un thread séparé)
+# Progression — l'installation tourne dans son propre superviseur (runner.py) ;
+# le portail lit son journal et son état, et peut redémarrer à tout moment
 # ---------------------------------------------------------------------------
-_config: dict = {}
-_progress_log: list = []
-_setup_started = False
-_setup_done = False
+PROGRESS_RING_SIZE    = 1000  # entrées récentes gardées en mémoire
+PROGRESS_PAGE_SIZE    = 500   # entrées max par réponse /progress/log
+PROGRESS_LONGPOLL_MAX = 25    # attente max d'une requête long-poll (s)
+PROGRESS_SSE_PING     = 15    # commentaire keep-alive SSE (s)
+PROGRESS_SSE_MAX      = 300   # durée max d'un flux SSE ; le client se reconnecte (s)
+PROGRESS_ETA_EVERY    = 5     # intervalle min entre deux estimations envoyées en SSE (s)
+
+# Suit le journal du superviseur (anneau mémoire + fichier indexé) ; sa
+# Condition réveille SSE / long-poll
+_progress_log = ProgressReader(runner.PROGRESS_LOG_PATH, PROGRESS_RING_SIZE, is_done=runner.finished,
+                               done_paths=(runner.STATE_PATH, runner.LOCK_PATH),
+                               read_state=runner.read_state)
 _setup_lock = threading.Lock()
+# Pages rendues par (langue, état réseau) — /configure
+_page_cache = PageCache()
 
 LOCALES = [
     ("fr_FR.UTF-8", "Français (France)"),
@@ -53,19 +88,13 @@ LOCALES = [
 # ---------------------------------------------------------------------------
 
 def ethernet_connected() -> bool:
-    """Retourne True si eth0 est UP avec une adresse IP."""
-    try:
-        result = subprocess.run(
-            ["ip", "-4", "addr", "show", "eth0"],
-            capture_output=True, text=True, timeout=5,
-        )
-        return "inet " in result.stdout and "LOWER_UP" in result.stdout
-    except Exception:
-        return False
+    """Retourne True si eth0 est UP (porteuse) avec une adresse IP."""
+    net = get_netstate()
+    return net.carrier("eth0") and bool(net.ipv4("eth0"))
 
 
-def get_wifi_networks() -> list:
-    """Scanne les réseaux WiFi disponibles via nmcli."""
+def _scan_wifi_networks() -> list:
+    """Scanne les réseaux WiFi disponibles via nmcli (appel bloquant, jusqu'à 20 s)."""
     try:
         subprocess.run(
             ["nmcli", "dev", "wifi", "rescan"],
@@ -97,23 +126,134 @@ def get_wifi_networks() -> list:
         return []
 
 
+# ---------------------------------------------------------------------------
+# Cache de scan WiFi — rempli en tâche de fond, un seul rescan à la fois
+# ---------------------------------------------------------------------------
+WIFI_SCAN_INTERVAL = 20   # rafraîchissement de fond (s)
+WIFI_SCAN_MAX_AGE  = 30   # au-delà, un appelant peut demander un rescan (s)
+WIFI_SCAN_WAIT     = 25   # attente max d'un rescan partagé (s)
+
+
+class WifiScanCache:
+    """Résultats du dernier scan nmcli, partagés entre toutes les requêtes.
+
+    Un thread de fond rescanne toutes les `interval` secondes. Les appelants
+    lisent la mémoire ; s'ils exigent des données fraîches, ils rejoignent le
+    scan en cours au lieu d'en lancer un nouveau (single-flight).
+    """
+
+    def __init__(self, scan_fn, interval: float, max_age: float):
+        self._scan_fn   = scan_fn
+        self._interval  = interval
+        self._max_age   = max_age
+        self._cond      = threading.Condition()
+        self._networks: list = []
+        self._scanned_at: float | None = None   # time.monotonic() du dernier scan
+        self._generation = 0                     # incrémenté à chaque scan terminé
+        self._scanning  = False
+        self._wanted    = False
+        self._paused    = False
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        with self._cond:
+            self._start_locked()
+
+    def _start_locked(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="wifi-scan", daemon=True)
+            self._thread.start()
+
+    def pause(self):
+        """Suspend les scans de fond (ex. pendant l'installation)."""
+        with self._cond:
+            self._paused = True
+            self._cond.notify_all()
+
+    def age(self) -> float | None:
+        with self._cond:
+            return None if self._scanned_at is None else time.monotonic() - self._scanned_at
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return self._snapshot_locked()
+
+    def get(self, max_age: float | None = None, timeout: float = WIFI_SCAN_WAIT) -> dict:
+        """Retourne le cache ; si plus vieux que `max_age`, attend le rescan partagé
+        (le thread de fond n'est lancé qu'à ce moment, s'il ne tourne pas déjà)."""
+        max_age = self._max_age if max_age is None else max_age
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._is_fresh_locked(max_age):
+                return self._snapshot_locked()
+            # Un scan déjà en cours suffit : ses résultats auront un âge ~0
+            target = self._generation + 1
+            if not self._scanning:
+                self._wanted = True
+                self._start_locked()
+                self._cond.notify_all()
+            while self._generation < target and not self._paused:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._snapshot_locked()
+
+    def request_rescan(self):
+        """Demande un rescan sans attendre (fusionné avec un scan en cours)."""
+        with self._cond:
+            self._wanted = True
+            self._cond.notify_all()
+
+    def _is_fresh_locked(self, max_age: float) -> bool:
+        return self._scanned_at is not None and time.monotonic() - self._scanned_at <= max_age
+
+    def _snapshot_locked(self) -> dict:
+        age = None if self._scanned_at is None else round(time.monotonic() - self._scanned_at, 1)
+        return {"networks": self._networks, "age": age, "scanning": self._scanning}
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._paused or not (
+                    self._wanted or not self._is_fresh_locked(self._interval)
+                ):
+                    if self._paused:
+                        self._cond.wait()
+                        continue
+                    wait = self._interval - (time.monotonic() - self._scanned_at)
+                    self._cond.wait(max(wait, 0.1))
+                self._wanted   = False
+                self._scanning = True
+            networks = self._scan_fn()
+            with self._cond:
+                self._networks   = networks
+                self._scanned_at = time.monotonic()
+                self._generation += 1
+                self._scanning   = False
+                self._cond.notify_all()
+
+
+_wifi_cache = WifiScanCache(_scan_wifi_networks, WIFI_SCAN_INTERVAL, WIFI_SCAN_MAX_AGE)
+
+
+def get_wifi_networks(max_age: float | None = None) -> dict:
+    """Réseaux WiFi depuis le cache (`age` en secondes, None si jamais scanné)."""
+    return _wifi_cache.get(max_age)
+
+
 def get_current_ip() -> str | None:
-    """Retourne la première IP non-loopback disponible."""
-    for iface in ["eth0", "wlan0"]:
-        try:
-            r = subprocess.run(
-                ["ip", "-4", "addr", "show", iface],
-                capture_output=True, text=True, timeout=5,
-            )
-            m = re.search(r"inet\s+(\d+\.\d+\.\d+\.\d+)", r.stdout)
-            if m and not m.group(1).startswith("10.42."):
-                return m.group(1)
-        except Exception:
-            pass
-    return None
+    """Retourne la première IP non-loopback disponible (hors hotspot)."""
+    return get_netstate().first_ipv4(("eth0", "wlan0"), exclude=("10.42.",))
+
+
+_timezones: list | None = None   # liste timedatectl, fixe pendant tout le boot
 
 
 def get_timezones() -> list:
+    global _timezones
+    if _timezones is not None:
+        return _timezones
     try:
         result = subprocess.run(
             ["timedatectl", "list-timezones"],
@@ -122,7 +262,11 @@ def get_timezones() -> list:
         zones = [z for z in result.stdout.strip().splitlines() if z and not z.startswith("Etc/")]
         if "UTC" in zones:
             zones = ["UTC"] + [z for z in zones if z != "UTC"]
-        return zones if zones else _fallback_timezones()
+        if not zones:
+            return _fallback_timezones()
+        # Seule une vraie liste est gardée : un échec est retenté au prochain appel
+        _timezones = zones
+        return zones
     except Exception:
         return _fallback_timezones()
 
@@ -149,18 +293,17 @@ CAPTIVE_PORTAL_PATHS = {
 
 @app.before_request
 def handle_captive_portal():
+    # Sur le hotspot, captive.py répond à ces sondes sur le port 80 ; ici ne
+    # restent que celles envoyées directement au portail
     if request.path in CAPTIVE_PORTAL_PATHS:
-        return redirect("http://10.42.0.1/", 302)
+        return redirect("/", 302)
 
 
 @app.context_processor
 def inject_i18n():
     lang = session.get("lang", DEFAULT_LANG)
-    T    = get_t(lang)
-    def t(key, **kw):
-        val = T.get(key, key)
-        return val.format(**kw) if kw else val
-    return {"t": t, "lang": lang, "lang_labels": LANG_LABELS, "supported_langs": SUPPORTED_LANGS}
+    # Le catalogue est lui-même la fonction t() des templates
+    return {"t": get_t(lang), "lang": lang, "lang_labels": LANG_LABELS, "supported_langs": SUPPORTED_LANGS}
 
 
 @app.route("/lang")
@@ -178,19 +321,38 @@ def set_lang():
 
 @app.route("/")
 def index():
-    if _setup_started:
+    if not runner.can_launch():
         return redirect("/progress")
     return redirect("/configure")
 
 
+@app.route("/assets/<name>")
+def asset(name):
+    """Asset empreinté ; variante .br / .gz précompressée selon Accept-Encoding."""
+    found = _assets.resolve(name, request.accept_encodings)
+    if found is None:
+        return "", 404
+    path, encoding, mimetype = found
+    resp = send_file(path, mimetype=mimetype)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Cache-Control"] = ASSET_CACHE_CONTROL
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
 @app.route("/wifi")
 def wifi_page():
-    return render_template("wifi.html", networks=get_wifi_networks())
+    scan = get_wifi_networks()
+    html = render_template("wifi.html", networks=scan["networks"], scan_age=scan["age"])
+    return RenderedPage(html).response(request)
 
 
 @app.route("/wifi/rescan")
 def wifi_rescan():
-    return jsonify(get_wifi_networks())
+    """Réseaux WiFi en cache ; `?force=1` rejoint un rescan neuf (partagé)."""
+    max_age = 0 if request.args.get("force") == "1" else None
+    return jsonify(get_wifi_networks(max_age))
 
 
 @app.route("/wifi/connect", methods=["POST"])
@@ -220,20 +382,28 @@ def wifi_connect():
 @app.route("/configure")
 def configure_page():
     error = request.args.get("error", "")
-    return render_template(
-        "configure.html",
-        timezones=get_timezones(),
-        locales=LOCALES,
-        ethernet=ethernet_connected(),
-        current_ip=get_current_ip(),
-        error=error,
-    )
+    ethernet   = ethernet_connected()
+    current_ip = get_current_ip()
+
+    def render() -> str:
+        return render_template(
+            "configure.html",
+            timezones=get_timezones(),
+            locales=LOCALES,
+            ethernet=ethernet,
+            current_ip=current_ip,
+            error=error,
+        )
+
+    if error:
+        # Message libre venu de l'URL : jamais mis en cache
+        return RenderedPage(render()).response(request)
+    key = (session.get("lang", DEFAULT_LANG), ethernet, current_ip)
+    return _page_cache.get(key, render).response(request)
 
 
 @app.route("/configure/apply", methods=["POST"])
 def apply_config():
-    global _config
-
     # Validation et nettoyage
     T = get_t(session.get("lang", DEFAULT_LANG))
 
@@ -292,7 +462,7 @@ def apply_config():
     wifi_password = request.form.get("wifi_password", "").strip()
     cockpit_enabled = request.form.get("cockpit_enabled") == "1"
 
-    _config = {
+    config = {
         "hostname":              hostname,
         "username":              username,
         "password":              password,
@@ -310,145 +480,178 @@ def apply_config():
         "lang":                  session.get("lang", DEFAULT_LANG),
     }
 
-    # Lancer le thread dès maintenant (ne pas attendre que le SSE se connecte)
+    # Lancer l'installation dès maintenant (ne pas attendre que le SSE se
+    # connecte) ; une installation déjà lancée — même par un portail
+    # précédent — n'est jamais relancée, sauf si son superviseur est mort
+    # avant de démarrer setup.py
     with _setup_lock:
-        global _setup_started
-        if not _setup_started:
-            _setup_started = True
-            t = threading.Thread(target=_run_setup, daemon=True)
-            t.start()
+        if runner.can_launch():
+            _wifi_cache.pause()
+            try:
+                runner.launch(config)
+            except OSError as e:
+                return redirect(f"/configure?error={quote(T('setup_launch_error', e=e))}")
 
     return redirect("/progress")
 
 
 @app.route("/progress")
 def progress_page():
-    if not _config:
+    state = runner.read_state()
+    if not state:
         return redirect("/")
-    # Après un changement d'hôte (mDNS/IP), la session peut être nouvelle.
-    # On restaure la langue choisie lors de la soumission de la config.
-    session["lang"] = _config.get("lang", DEFAULT_LANG)
-    static_ip_raw = _config.get("static_ip", "")
+    # Après un changement d'hôte (mDNS/IP) ou un redémarrage du portail, la
+    # session peut être nouvelle : on restaure la langue choisie à la soumission.
+    session["lang"] = state.get("lang") or DEFAULT_LANG
+    static_ip_raw = state.get("static_ip", "")
     static_ip = static_ip_raw.split("/")[0] if static_ip_raw else ""
-    return render_template("progress.html", hostname=_config.get("hostname", "runtipios"), static_ip=static_ip)
+    return render_template("progress.html", hostname=state.get("hostname") or "runtipios", static_ip=static_ip)
 
 
 # ---------------------------------------------------------------------------
 # SSE — Progression en temps réel
 # ---------------------------------------------------------------------------
 
-def _append_log(msg: str, level: str = "log") -> dict:
-    entry = {"msg": msg, "level": level}
-    _progress_log.append(entry)
-    return entry
+def _localize(entries: list[dict], T) -> list[dict]:
+    """Rend le texte des entrées traduisibles (clé + paramètres, cf. ipc.py) ;
+    la page ne reçoit que le texte."""
+    shown = []
+    for entry in entries:
+        if "key" in entry:
+            text = ipc.render(T, entry["key"], entry.get("params"))
+            entry = {k: v for k, v in entry.items() if k not in ("key", "params")}
+            entry["msg"] = text
+        shown.append(entry)
+    return shown
 
 
-def _run_setup():
-    """Thread de configuration système — lit _config, écrit dans _progress_log."""
-    global _setup_done
+def _viewer_t():
+    # Session sans langue (changement d'hôte) : langue choisie à la soumission
+    return get_t(session.get("lang") or runner.read_state().get("lang") or DEFAULT_LANG)
 
-    def step(msg):  _append_log(msg, "step")
-    def done(msg):  _append_log(msg, "success")
-    def err(msg):   _append_log(msg, "error")
-    def out(msg):   _append_log(msg, "log")
 
-    try:
-        _run_setup_inner(step, done, err, out)
-    except Exception as e:
-        _append_log(f"Erreur inattendue du thread : {e}", "error")
-    finally:
-        _setup_done = True
+def _eta_remaining() -> int | None:
+    """Secondes restantes estimées ; None avant le plan ou après la fin.
+    Dernière estimation publiée par le superviseur (état relu par le lecteur
+    du journal à chaque écriture), décomptée depuis."""
+    if _progress_log.done:
+        return None
+    snapshot = _progress_log.state.get("eta")
+    if not snapshot:
+        return None
+    return max(round(snapshot["remaining"] - (time.time() - snapshot["t"])), 0)
 
 
-def _run_setup_inner(step, done, err, out):
-    T = get_t(_config.get("lang", DEFAULT_LANG))
-
-    # Écriture de la config dans un fichier temporaire (évite les env vars avec mdp)
-    config_path = "/tmp/tipi-config.json"
-    try:
-        with open(config_path, "w") as f:
-            json.dump(_config, f)
-        os.chmod(config_path, 0o600)
-    except Exception as e:
-        err(T["setup_write_error"].format(e=e))
-        return
-
-    step(T["setup_starting"])
-
-    try:
-        process = subprocess.Popen(
-            ["python3", "/opt/tipi-setup/setup.py", config_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-        )
-    except Exception as e:
-        err(T["setup_launch_error"].format(e=e))
-        return
-
-    final_ip = None
-    for raw_line in iter(process.stdout.readline, ""):
-        line = raw_line.rstrip()
-        if not line:
-            continue
-        if line.startswith("TIPI_IP:"):
-            final_ip = line.split(":", 1)[1].strip()
-        elif line.startswith("TIPI_STEP:"):
-            step(line.split(":", 1)[1].strip())
-        elif line.startswith("TIPI_DONE:"):
-            done(line.split(":", 1)[1].strip())
-        elif line.startswith("TIPI_ERROR:"):
-            err(line.split(":", 1)[1].strip())
-        else:
-            out(line)
-
-    process.wait()
-
-    hostname = _config.get("hostname", "runtipios")
-    ssh_port = _config.get("ssh_port", "22")
-
-    # Nettoyage : on désactive le service (ne se relancera plus au prochain boot)
-    subprocess.run(["systemctl", "disable", "tipi-setup.service"], capture_output=True)
-    # Arrêter hostapd/dnsmasq si toujours actifs (cas sans WiFi configuré)
-    subprocess.run(["pkill", "-f", "tipi-hostapd.conf"], capture_output=True)
-    subprocess.run(["pkill", "-f", "tipi-dnsmasq"], capture_output=True)
-    try:
-        os.remove("/var/lib/tipi-setup/.not-configured")
-    except FileNotFoundError:
-        pass
-
-    if process.returncode == 0:
-        _progress_log.append({
-            "level":    "final",
-            "msg":      T["setup_complete"],
-            "ip":       final_ip,
-            "hostname": hostname,
-            "ssh_port": ssh_port,
-        })
-    else:
-        err(T["setup_error"])
+def _resume_index(since: int, gen: str) -> int:
+    """Index de reprise d'un client ; 0 s'il suivait un autre journal
+    (nouvelle installation depuis sa dernière entrée)."""
+    return since if not gen or gen == _progress_log.generation else 0
 
 
 @app.route("/progress/log")
 def progress_log_poll():
-    """Polling endpoint — retourne les entrées du log depuis l'index `from`."""
-    since = request.args.get("from", 0, type=int)
-    entries = _progress_log[since:]
+    """Long-poll — entrées du log depuis l'index `from` du journal `gen`.
+
+    Avec `wait=<s>`, la réponse est retenue jusqu'à l'arrivée d'une entrée
+    (ou la fin du setup), au plus PROGRESS_LONGPOLL_MAX secondes.
+    `gen` : journal des entrées renvoyées (ProgressReader.generation).
+    `eta` : temps restant estimé en secondes (null hors installation).
+    Les messages sont rendus dans la langue du lecteur.
+    """
+    since = _resume_index(max(request.args.get("from", 0, type=int), 0), request.args.get("gen", ""))
+    wait = min(request.args.get("wait", 0, type=float), PROGRESS_LONGPOLL_MAX)
+    T = _viewer_t()
+    if wait > 0:
+        _progress_log.wait(since, wait)
+    # Hors du verrou du lecteur (le suivi du journal et les autres clients
+    # l'attendraient) ; sous le verrou, lecture mémoire seule
+    eta = _eta_remaining()
+    with _progress_log.cond:
+        entries = _progress_log.read(since, PROGRESS_PAGE_SIZE)
+        gen     = _progress_log.generation
+        done    = _progress_log.done
+        total   = len(_progress_log)
     return jsonify({
-        "entries": entries,
-        "done":    _setup_done,
-        "total":   len(_progress_log),
+        "entries": _localize(entries, T),
+        "gen":     gen,
+        "done":    done,
+        "total":   total,
+        "eta":     eta,
     })
 
 
+@app.route("/progress/stream")
+def progress_stream():
+    """Server-Sent Events — une entrée par événement, `id` = « gen:index »
+    (journal, index dans ce journal).
+
+    Reprise : l'en-tête Last-Event-ID (reconnexion automatique d'EventSource)
+    a priorité sur `?from=&gen=` ; le flux repart de l'entrée suivante, ou
+    de zéro si le journal a changé.
+    L'événement `eta` porte le temps restant estimé (s), au plus toutes les
+    PROGRESS_ETA_EVERY secondes.
+    """
+    gen, _, last = request.headers.get("Last-Event-ID", "").rpartition(":")
+    if last.isdigit():
+        since = _resume_index(int(last) + 1, gen)
+    else:
+        since = _resume_index(max(request.args.get("from", 0, type=int), 0), request.args.get("gen", ""))
+    # Lu avant le flux : le générateur tourne hors du contexte de la requête
+    T = _viewer_t()
+
+    def generate(since: int):
+        # Flux borné dans le temps : libère le thread du serveur, EventSource
+        # se reconnecte seul avec Last-Event-ID
+        deadline = time.monotonic() + PROGRESS_SSE_MAX
+        eta_sent = 0.0
+        gen = None
+        yield "retry: 2000\n\n"
+        while time.monotonic() < deadline and not _progress_log.closed:
+            has_new = _progress_log.wait(since, PROGRESS_SSE_PING)
+            with _progress_log.cond:
+                # Journal remplacé pendant le flux : reprise depuis son début
+                if gen is not None and _progress_log.generation != gen:
+                    since = 0
+                gen = _progress_log.generation
+                entries = _progress_log.read(since, PROGRESS_PAGE_SIZE)
+                done = _progress_log.done
+            for entry in _localize(entries, T):
+                yield f"id: {gen}:{since}\ndata: {json.dumps(entry)}\n\n"
+                since += 1
+            # Estimation : la page décompte seule entre deux envois
+            if time.monotonic() - eta_sent >= PROGRESS_ETA_EVERY:
+                remaining = _eta_remaining()
+                if remaining is not None:
+                    yield f"event: eta\ndata: {json.dumps({'eta': remaining})}\n\n"
+                    eta_sent = time.monotonic()
+            if done and len(entries) == 0:
+                yield "event: done\ndata: {}\n\n"
+                return
+            if not has_new:
+                yield ": ping\n\n"
+
+    return Response(
+        generate(since),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/reboot", methods=["POST"])
 def reboot():
     """Redémarre le Pi après un court délai (laisse la réponse partir)."""
     def _do_reboot():
         time.sleep(2)
-        # Nettoyage du portail de configuration (plus nécessaire après installation)
-        shutil.rmtree("/opt/tipi-setup", ignore_errors=True)
+        # Nettoyage du portail de configuration (plus nécessaire après installation),
+        # sauf si Runtipi doit être retenté au démarrage : retry-runtipi.sh
+        # relance setup.py --resume depuis ce répertoire
+        if not bootlog.exists("tipi-install-failed.flag"):
+            shutil.rmtree(rooted("/opt/tipi-setup"), ignore_errors=True)
+        # Journal et flag encore en tmpfs : recopiés avant l'arrêt
+        try:
+            bootlog.flush(final=True)
+        except OSError:
+            pass
         subprocess.run(["systemctl", "reboot"], check=False)
     threading.Thread(target=_do_reboot, daemon=True).start()
     return jsonify({"ok": True})
@@ -458,10 +661,8 @@ def reboot():
 # Point d'entrée
 # ---------------------------------------------------------------------------
 if __name__ == "__main__":
-    app.run(
-        host="0.0.0.0",
-        port=8080,
-        debug=False,
-        threaded=True,
-        use_reloader=False,
-    )
+    get_netstate()
+    # Portail redémarré pendant l'installation : pas de scan (radio occupée)
+    if not runner.read_state():
+        _wifi_cache.start()
+    server.serve(app, host="0.0.0.0", port=8080, on_shutdown=_progress_log.close_readers)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Assets statiques du portail (CSS, JS, favicon)
+Utilisé par app.py (route /assets) et par 00-run.sh au build de l'image.
+
+`python3 assets.py build <static> <sortie>` minifie chaque fichier de static/,
+le renomme d'après l'empreinte de son contenu (portal.3f2a1b9c04.css), écrit
+à côté ses variantes .gz et .br, puis un manifest.json nom → nom empreinté.
+Un nom empreinté ne change jamais de contenu : il est servi avec
+`Cache-Control: immutable`, et les pages suivantes du parcours ne
+re-téléchargent rien sur le hotspot.
+
+Sans manifest (arbre source, simulateur bench/), les fichiers sont servis
+tels quels depuis /static.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+MANIFEST = "manifest.json"
+
+# Variantes précompressées, par ordre de préférence
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+MIMETYPES = {
+    ".css": "text/css",
+    ".js":  "text/javascript",
+    ".ico": "image/x-icon",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+}
+
+
+# ---------------------------------------------------------------------------
+# Minification — volontairement prudente : pas d'analyse syntaxique, seuls
+# commentaires et blancs sans effet sont retirés
+# ---------------------------------------------------------------------------
+def minify_css(text: str) -> str:
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    # Pas autour de ":" (".a :hover" ≠ ".a:hover") ni de "+"/"-" (calc())
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)
+    return text.replace(";}", "}").strip()
+
+
+def minify_js(text: str) -> str:
+    """Retire indentation, lignes vides et lignes de commentaire `//`.
+    Les retours à la ligne sont gardés (insertion automatique des `;`) et
+    l'intérieur des gabarits `…` multilignes n'est pas touché."""
+    out = []
+    in_template = False
+    for line in text.splitlines():
+        if in_template:
+            out.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith("//"):
+                out.append(stripped)
+        if line.count("`") % 2:
+            in_template = not in_template
+    return "\n".join(out) + "\n"
+
+
+def _brotli(data: bytes) -> bytes | None:
+    try:
+        import brotli
+        return brotli.compress(data, quality=11)
+    except ImportError:
+        pass
+    if shutil.which("brotli"):
+        return subprocess.run(["brotli", "-c", "-q", "11"], input=data,
+                              capture_output=True, check=True).stdout
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+def build(src_dir: str, out_dir: str) -> int:
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    no_brotli = False
+    for name in sorted(os.listdir(src_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext not in MIMETYPES:
+            continue
+        with open(os.path.join(src_dir, name), "rb") as f:
+            data = f.read()
+        if ext == ".css":
+            data = minify_css(data.decode()).encode()
+        elif ext == ".js":
+            data = minify_js(data.decode()).encode()
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+        _write(os.path.join(out_dir, hashed), data)
+        sizes = [str(len(data))]
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0), ".br": _brotli(data)}
+        no_brotli |= variants[".br"] is None
+        for suffix, packed in variants.items():
+            # Variante gardée seulement si elle fait gagner quelque chose
+            if packed is not None and len(packed) < len(data):
+                _write(os.path.join(out_dir, hashed + suffix), packed)
+                sizes.append(f"{suffix[1:]} {len(packed)}")
+        manifest[name] = hashed
+        print(f"assets : {hashed:<28} {' / '.join(sizes)} o")
+    if no_brotli:
+        print("assets : ni module ni commande brotli — variantes .br non générées", file=sys.stderr)
+    _write(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=2).encode())
+    return 0
+
+
+def _write(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+class Assets:
+    def __init__(self, out_dir: str):
+        self._dir = out_dir
+        try:
+            with open(os.path.join(out_dir, MANIFEST)) as f:
+                self._urls = json.load(f)
+        except (OSError, ValueError):
+            self._urls = None
+        self._files = set((self._urls or {}).values())
+
+    def url(self, name: str) -> str:
+        if self._urls is None or name not in self._urls:
+            return f"/static/{name}"
+        return f"/assets/{self._urls[name]}"
+
+    def resolve(self, hashed: str, accept_encodings) -> tuple[str, str | None, str] | None:
+        """(chemin, Content-Encoding ou None, type MIME) du fichier à servir
+        pour `hashed`, variante précompressée comprise ; None si inconnu."""
+        if hashed not in self._files:
+            return None
+        path = os.path.join(self._dir, hashed)
+        mimetype = MIMETYPES[os.path.splitext(hashed)[1]]
+        for encoding, suffix in ENCODINGS:
+            if encoding in accept_encodings and os.path.exists(path + suffix):
+                return path + suffix, encoding, mimetype
+        return path, None, mimetype
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        raise SystemExit("usage : assets.py build <dossier static> <dossier de sortie>")
+    raise SystemExit(build(sys.argv[2], sys.argv[3]))
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Journal du premier démarrage, ménagé pour la carte SD
+Lancé par start.sh (vidage périodique) et retry-runtipi.sh (vidage unique) ;
+utilisé par setup.py et app.py (fichiers de la partition boot).
+
+Rien n'écrit plus directement sur la partition FAT : chaque source écrit
+dans son tampon en tmpfs (BUFFERS), puis le vidage recopie les lignes
+nouvelles vers /boot/firmware/tipi-setup.log en un seul write + fsync,
+toutes les FLUSH_INTERVAL s ou dès FLUSH_BYTES en attente. Les lignes sont
+regroupées par source dans un même lot.
+
+  portal    sortie de tipi-setup.service et de l'unité tipi-install
+            (start.sh, portail, sondes captives, superviseur)
+  hostapd   hostapd -f
+  dnsmasq   dnsmasq --log-facility
+
+Reprise sûre : la position recopiée de chaque tampon (OFFSETS_PATH, tmpfs)
+n'est enregistrée qu'après le fsync ; un vidage interrompu recopie deux fois
+les mêmes lignes au lieu d'en perdre. Au-delà de ROTATE_BYTES, le journal
+est compressé en tipi-setup.log.1.gz (ROTATE_KEEP archives) avant l'ajout.
+
+Les fichiers destinés à la partition boot (flag d'échec, erreur WiFi) sont
+déposés par put() en tmpfs (STAGE_DIR) et recopiés au tour suivant du
+vidage (remplacement atomique) : l'installation n'attend pas la carte.
+
+Verbosité par source : /boot/firmware/tipi-log.conf, éditable depuis
+n'importe quel OS (niveaux debug, info, warning, error) :
+  hostapd = debug
+  dnsmasq = warning
+  portal  = info
+hostapd et dnsmasq filtrent eux-mêmes (start.sh traduit le niveau en
+logger_stdout_level et en options dnsmasq) ; les lignes du portail sont
+filtrées au vidage d'après leur contenu.
+
+Usage :
+  bootlog.py run      vidage périodique, dernier vidage sur SIGTERM
+  bootlog.py flush    vidage unique
+"""
+
+import fcntl
+import gzip
+import json
+import os
+import re
+import shutil
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# ---------------------------------------------------------------------------
+# Racine du système de fichiers — TIPI_ROOT pointe vers une racine jetable
+# quand l'installation tourne dans le simulateur (bench/sim.py)
+# ---------------------------------------------------------------------------
+ROOT = os.environ.get("TIPI_ROOT", "/")
+
+
+def rooted(path: str) -> str:
+    return os.path.join(ROOT, path.lstrip("/"))
+
+
+BOOT_DIR       = rooted("/boot/firmware")
+BOOT_LOG_PATH  = os.path.join(BOOT_DIR, "tipi-setup.log")
+CONFIG_PATH    = os.path.join(BOOT_DIR, "tipi-log.conf")
+# Tampons en tmpfs, un par source (/run existe avant tout service : systemd
+# peut y ouvrir StandardOutput=append:)
+BUFFER_PATH    = rooted("/run/tipi-setup.log")
+BUFFERS        = {
+    "portal":  BUFFER_PATH,
+    "hostapd": rooted("/run/tipi-hostapd.log"),
+    "dnsmasq": rooted("/run/tipi-dnsmasq.log"),
+}
+STAGE_DIR      = rooted("/run/tipi-setup/boot")
+OFFSETS_PATH   = rooted("/run/tipi-setup/bootlog.json")
+LOCK_PATH      = rooted("/run/tipi-setup/bootlog.lock")
+
+CHECK_INTERVAL = 1                  # période de surveillance des tampons (s)
+FLUSH_INTERVAL = 30                 # délai maximal avant recopie sur la carte (s)
+FLUSH_BYTES    = 256 * 1024         # recopie anticipée au-delà de ce volume en attente
+ROTATE_BYTES   = 4 * 1024 * 1024    # taille du journal déclenchant la rotation
+ROTATE_KEEP    = 3                  # archives tipi-setup.log.N.gz conservées
+
+LEVELS         = ("debug", "info", "warning", "error")
+DEFAULT_LEVELS = {"hostapd": "warning", "dnsmasq": "info", "portal": "info"}
+# Sources qui appliquent elles-mêmes leur niveau (options passées par start.sh)
+_NATIVE        = ("hostapd", "dnsmasq")
+
+_ERROR_RE   = re.compile(r"erreur|error|échec|failed|fatal|traceback|exception", re.I)
+_WARNING_RE = re.compile(r"warn|attention|⚠", re.I)
+
+
+# ---------------------------------------------------------------------------
+# Verbosité
+# ---------------------------------------------------------------------------
+
+def levels() -> dict:
+    """Niveau de chaque source : tipi-log.conf, sinon DEFAULT_LEVELS."""
+    result = dict(DEFAULT_LEVELS)
+    try:
+        with open(CONFIG_PATH, encoding="utf-8-sig") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return result
+    for line in lines:
+        key, sep, value = line.split("#", 1)[0].partition("=")
+        key, value = key.strip(), value.strip().lower()
+        if sep and key in result and value in LEVELS:
+            result[key] = value
+    return result
+
+
+def _line_level(line: str) -> str:
+    if _ERROR_RE.search(line):
+        return "error"
+    if _WARNING_RE.search(line):
+        return "warning"
+    return "info"
+
+
+def _filter(source: str, lines: list[bytes], level: str) -> list[bytes]:
+    if source in _NATIVE:
+        prefix = f"[{source}] ".encode()
+        return [prefix + line for line in lines]
+    floor = LEVELS.index(level)
+    return [line for line in lines
+            if LEVELS.index(_line_level(line.decode(errors="replace"))) >= floor]
+
+
+# ---------------------------------------------------------------------------
+# Fichiers de la partition boot
+# ---------------------------------------------------------------------------
+
+def put(name: str, text: str):
+    """Dépose un fichier destiné à /boot/firmware ; recopié par le vidage."""
+    os.makedirs(STAGE_DIR, exist_ok=True)
+    tmp = os.path.join(STAGE_DIR, f".{name}.tmp")
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, os.path.join(STAGE_DIR, name))
+
+
+def exists(name: str) -> bool:
+    """Fichier présent sur la partition boot ou en attente de recopie."""
+    return os.path.exists(os.path.join(STAGE_DIR, name)) or os.path.exists(os.path.join(BOOT_DIR, name))
+
+
+def _write_boot_file(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _flush_staged():
+    try:
+        names = sorted(os.listdir(STAGE_DIR))
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith("."):
+            continue
+        # Revendiqué par renommage : un put() concurrent attend le tour suivant
+        staged  = os.path.join(STAGE_DIR, name)
+        claimed = os.path.join(STAGE_DIR, f".{name}.flushing")
+        try:
+            os.replace(staged, claimed)
+            with open(claimed, "rb") as f:
+                _write_boot_file(os.path.join(BOOT_DIR, name), f.read())
+        except OSError:
+            # Partition absente ou pleine : nouvel essai au tour suivant
+            if os.path.exists(claimed) and not os.path.exists(staged):
+                os.replace(claimed, staged)
+            continue
+        os.remove(claimed)
+
+
+# ---------------------------------------------------------------------------
+# Vidage des tampons
+# ---------------------------------------------------------------------------
+
+def _read_offsets() -> dict:
+    try:
+        with open(OFFSETS_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_offsets(offsets: dict):
+    tmp = OFFSETS_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(offsets, f)
+    os.replace(tmp, OFFSETS_PATH)
+
+
+def pending() -> int:
+    """Octets écrits dans les tampons et pas encore recopiés."""
+    offsets = _read_offsets()
+    total = 0
+    for source, path in BUFFERS.items():
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        pos = offsets.get(source)
+        total += st.st_size - (pos[1] if pos and pos[0] == st.st_ino else 0)
+    return total
+
+
+def _rotate():
+    for n in range(ROTATE_KEEP - 1, 0, -1):
+        older = f"{BOOT_LOG_PATH}.{n}.gz"
+        if os.path.exists(older):
+            os.replace(older, f"{BOOT_LOG_PATH}.{n + 1}.gz")
+    tmp = f"{BOOT_LOG_PATH}.1.gz.tmp"
+    with open(BOOT_LOG_PATH, "rb") as src, open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+            shutil.copyfileobj(src, gz, 1024 * 1024)
+        os.fsync(raw.fileno())
+    os.replace(tmp, f"{BOOT_LOG_PATH}.1.gz")
+    # Arrêt entre l'archive et la troncature : lignes en double, jamais perdues
+    with open(BOOT_LOG_PATH, "wb") as f:
+        os.fsync(f.fileno())
+
+
+@contextmanager
+def _locked():
+    # Vidage périodique (start.sh) et vidage unique (retry-runtipi.sh, reboot)
+    os.makedirs(os.path.dirname(LOCK_PATH), exist_ok=True)
+    with open(LOCK_PATH, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def flush(final: bool = False) -> int:
+    """Recopie les lignes complètes en attente (toutes si `final`) et les
+    fichiers déposés ; retourne le nombre d'octets ajoutés au journal."""
+    with _locked():
+        _flush_staged()
+        offsets = _read_offsets()
+        verbosity = levels()
+        batch = []
+        moved = {}
+        for source, path in BUFFERS.items():
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with f:
+                ino = os.fstat(f.fileno()).st_ino
+                pos = offsets.get(source)
+                # Tampon recréé (autre démarrage du service) : depuis le début
+                start = pos[1] if pos and pos[0] == ino else 0
+                f.seek(start)
+                data = f.read()
+            if not final:
+                data = data[:data.rfind(b"\n") + 1]
+            if not data:
+                continue
+            lines = data.splitlines()
+            batch.extend(_filter(source, lines, verbosity[source]))
+            moved[source] = (ino, start + len(data))
+        if not moved:
+            return 0
+        out = b"".join(line + b"\n" for line in batch)
+        if out:
+            try:
+                size = os.path.getsize(BOOT_LOG_PATH)
+            except FileNotFoundError:
+                size = 0
+            if size and size + len(out) > ROTATE_BYTES:
+                _rotate()
+            with open(BOOT_LOG_PATH, "ab") as f:
+                f.write(out)
+                os.fsync(f.fileno())
+        _write_offsets({**offsets, **moved})
+        return len(out)
+
+
+def run(stop: threading.Event):
+    """Vide les tampons toutes les FLUSH_INTERVAL s, ou dès FLUSH_BYTES en
+    attente ; les fichiers déposés partent au tour suivant."""
+    last = time.monotonic()
+    while not stop.wait(CHECK_INTERVAL):
+        waiting = pending()
+        due = waiting and time.monotonic() - last >= FLUSH_INTERVAL
+        try:
+            if due or waiting >= FLUSH_BYTES:
+                flush()
+                last = time.monotonic()
+            elif os.path.isdir(STAGE_DIR) and os.listdir(STAGE_DIR):
+                with _locked():
+                    _flush_staged()
+        except OSError as e:
+            print(f"[tipi-setup] bootlog : vidage impossible ({e})", file=sys.stderr, flush=True)
+    flush(final=True)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args == ["run"]:
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        run(stop)
+    elif args == ["flush"]:
+        flush(final=True)
+    else:
+        raise SystemExit("usage : bootlog.py run|flush")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Répondeur des sondes de portail captif (port 80)
+Lancé par start.sh avec le hotspot, à côté du portail Flask (port 8080).
+
+dnsmasq résout tous les noms vers le hotspot : les sondes de connectivité
+des téléphones et PC (/generate_204, /hotspot-detect.html, /connecttest.txt…)
+arrivent donc ici, sur le port 80. Chacune reçoit la même redirection 302
+vers le portail — une réponse qui n'est ni le 204 d'Android, ni le
+« Success » d'Apple, ni le texte NCSI de Windows : l'OS conclut au portail
+captif et ouvre sa fenêtre de connexion sur le portail.
+
+Une seule boucle asyncio, réponse préconstruite, aucune analyse HTTP au-delà
+de la méthode : les rafales de sondes ne touchent jamais le pool de threads
+de Flask.
+
+Usage : captive.py [adresse] [port]   (défaut : 10.42.0.1 80)
+"""
+
+import asyncio
+import signal
+import sys
+
+HOTSPOT_IP   = "10.42.0.1"
+PORTAL_URL   = f"http://{HOTSPOT_IP}:8080/"
+READ_TIMEOUT = 3      # lecture des en-têtes d'une sonde (s)
+MAX_HEADERS  = 8192   # au-delà, la connexion est abandonnée (octets)
+
+
+def _response(location: str) -> tuple[bytes, bytes]:
+    """(en-têtes, corps) de la redirection vers le portail."""
+    body = f'<html><body><a href="{location}">RuntipiOS</a></body></html>'.encode()
+    head = (
+        "HTTP/1.1 302 Found\r\n"
+        f"Location: {location}\r\n"
+        "Cache-Control: no-store\r\n"
+        "Content-Type: text/html\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode()
+    return head, body
+
+
+class ProbeResponder:
+    def __init__(self, location: str = PORTAL_URL):
+        self._head, body = _response(location)
+        self._full = self._head + body
+        self.served = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), READ_TIMEOUT)
+            writer.write(self._head if request.startswith(b"HEAD ") else self._full)
+            await writer.drain()
+            self.served += 1
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEADERS,
+                                          reuse_address=True)
+
+
+async def _serve(host: str, port: int):
+    server = await ProbeResponder().start(host, port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"Sondes captives sur {host}:{port} → {PORTAL_URL}", flush=True)
+    async with server:
+        await stop.wait()
+
+
+if __name__ == "__main__":
+    host = sys.argv[1] if len(sys.argv) > 1 else HOTSPOT_IP
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+    asyncio.run(_serve(host, port))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Journal de reprise du pipeline d'installation
+Utilisé par setup.py (et indirectement par retry-runtipi.sh via --resume).
+
+Chaque étape terminée est enregistrée avec l'empreinte de ses paramètres :
+une relance avec la même configuration saute le travail déjà fait, un
+paramètre modifié (autre fuseau, autre port SSH…) refait l'étape. Les
+empreintes d'étape sont des HMAC salés ; celles des secrets passent par
+scrypt (dérivation lente) : le sel est stocké dans le même fichier, un HMAC
+seul se retrouverait par force brute. Le mot de passe n'apparaît jamais en
+clair. La configuration, sans ses secrets, est conservée pour
+`setup.py --resume` ; runner.py supprime le journal après une installation
+réussie.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+# Champs de configuration jamais écrits sur disque
+SECRET_FIELDS = ("password", "confirm_password", "wifi_password")
+# Coût de scrypt pour les empreintes de secrets (16 Mio, ~0,1 s sur un Pi 4)
+SCRYPT_PARAMS = {"n": 2 ** 14, "r": 8, "p": 1, "dklen": 32, "maxmem": 64 * 1024 * 1024}
+
+
+class Journal:
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._data = json.load(f)
+        except (OSError, ValueError):
+            self._data = {}
+        self._data.setdefault("salt", secrets.token_hex(16))
+        self._data.setdefault("steps", {})
+        # Empreintes de secrets déjà calculées (scrypt est volontairement lent)
+        self._secret_fps: dict[bytes, str] = {}
+
+    # ------------------------------------------------------------------ #
+    #  Configuration                                                      #
+    # ------------------------------------------------------------------ #
+    @property
+    def config(self) -> dict | None:
+        return self._data.get("config")
+
+    def save_config(self, cfg: dict):
+        """Conserve la configuration ; chaque secret est remplacé par son empreinte."""
+        with self._lock:
+            saved = {k: v for k, v in cfg.items() if k not in SECRET_FIELDS}
+            for key in SECRET_FIELDS:
+                if key in cfg:
+                    saved[key + "_fp"] = self._secret_digest(cfg[key])
+            self._data["config"] = saved
+            self._write_locked()
+
+    def fingerprint(self, cfg: dict, key: str) -> str:
+        """Empreinte du secret `key` — depuis sa valeur, ou depuis la
+        configuration journalisée (reprise, valeur inconnue)."""
+        if key in cfg:
+            with self._lock:
+                return self._secret_digest(cfg[key])
+        return cfg.get(key + "_fp", "")
+
+    def _secret_digest(self, value) -> str:
+        # Appelé sous self._lock
+        payload = json.dumps(value).encode()
+        if payload not in self._secret_fps:
+            self._secret_fps[payload] = hashlib.scrypt(
+                payload, salt=self._data["salt"].encode(), **SCRYPT_PARAMS).hex()
+        return self._secret_fps[payload]
+
+    # ------------------------------------------------------------------ #
+    #  Étapes                                                             #
+    # ------------------------------------------------------------------ #
+    def _digest(self, inputs) -> str:
+        payload = json.dumps(inputs, sort_keys=True).encode()
+        return hmac.new(self._data["salt"].encode(), payload, hashlib.sha256).hexdigest()
+
+    def is_done(self, name: str, inputs: dict) -> bool:
+        with self._lock:
+            entry = self._data["steps"].get(name)
+            return bool(entry) and entry["inputs"] == self._digest(inputs)
+
+    def mark_done(self, name: str, inputs: dict, how: str = "run"):
+        with self._lock:
+            self._data["steps"][name] = {
+                "inputs": self._digest(inputs), "at": round(time.time(), 3), "how": how,
+            }
+            self._write_locked()
+
+    def done_steps(self) -> set[str]:
+        with self._lock:
+            return set(self._data["steps"])
+
+    def _write_locked(self):
+        """Écriture atomique et synchronisée : le journal survit à une coupure."""
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        tmp = self._path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path)
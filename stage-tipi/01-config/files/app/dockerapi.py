@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Client minimal de l'API Docker Engine
+Utilisé par setup.py pour savoir quand la pile Runtipi est prête.
+
+Parle HTTP directement sur le socket Unix du démon (/var/run/docker.sock, ou
+DOCKER_HOST=unix://… — le simulateur bench/ y branche un faux serveur). Suit
+le flux /events des containers Runtipi au lieu de sonder `docker ps` : la
+disponibilité est constatée dès que le dernier container passe « running »
+(et « healthy » s'il déclare un healthcheck).
+"""
+
+import http.client
+import json
+import os
+import socket
+import time
+import urllib.parse
+
+# Containers qui composent une installation Runtipi fonctionnelle
+RUNTIPI_CONTAINERS = ("runtipi", "runtipi-db", "runtipi-reverse-proxy")
+
+DEFAULT_SOCKET = "/var/run/docker.sock"
+API_TIMEOUT    = 10     # délai max d'une requête ponctuelle (s)
+
+
+class DockerError(Exception):
+    pass
+
+
+def _socket_path() -> str:
+    host = os.environ.get("DOCKER_HOST", "")
+    if host.startswith("unix://"):
+        return host[len("unix://"):]
+    return DEFAULT_SOCKET
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float | None):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+def _url(path: str, **params) -> str:
+    query = {k: json.dumps(v) if isinstance(v, dict) else v for k, v in params.items()}
+    return path + ("?" + urllib.parse.urlencode(query) if query else "")
+
+
+def _get(path: str, timeout: float | None = API_TIMEOUT):
+    """GET et retourne (connexion, réponse) — l'appelant ferme la connexion."""
+    conn = _UnixConnection(_socket_path(), timeout)
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+    except Exception:
+        conn.close()
+        raise
+    return conn, resp
+
+
+def get_json(path: str, **params):
+    conn, resp = _get(_url(path, **params))
+    try:
+        body = resp.read()
+        if resp.status == 404:
+            return None
+        if resp.status >= 400:
+            raise DockerError(f"{path}: HTTP {resp.status} {body[:200]!r}")
+        return json.loads(body)
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# État des containers
+# ---------------------------------------------------------------------------
+
+def container_state(name: str) -> str:
+    """"missing", "created", "running", "exited"… ou l'état du healthcheck
+    ("starting", "healthy", "unhealthy") quand le container en a un."""
+    info = get_json(f"/containers/{name}/json")
+    if info is None:
+        return "missing"
+    state = info.get("State", {})
+    status = state.get("Status", "unknown")
+    health = (state.get("Health") or {}).get("Status")
+    if status == "running" and health:
+        return health
+    return status
+
+
+def images_present(images) -> bool:
+    """True si toutes les images (nom:tag) sont déjà dans le stockage local."""
+    try:
+        return bool(images) and all(get_json(f"/images/{img}/json") is not None for img in images)
+    except (OSError, DockerError):
+        return False
+
+
+def _is_ready(state: str) -> bool:
+    return state in ("running", "healthy")
+
+
+def _read_events(conn, resp, deadline: float):
+    """Itère sur les objets JSON du flux /events jusqu'à l'échéance."""
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        conn.sock.settimeout(remaining)
+        try:
+            line = resp.readline()
+        except (TimeoutError, socket.timeout):
+            return
+        if not line:
+            raise DockerError("flux d'événements interrompu")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue   # ligne tronquée ou illisible : on attend la suivante
+        yield event
+
+
+def wait_ready(names=RUNTIPI_CONTAINERS, timeout: float = 180,
+               on_change=None) -> tuple[bool, dict[str, str]]:
+    """Attend que tous les containers `names` soient running (et healthy).
+
+    S'abonne au flux d'événements avant de lire l'état initial pour ne rien
+    manquer entre les deux. `on_change(name, state)` est appelé à chaque
+    transition. Retourne (prêt, {nom: état}).
+    """
+    deadline = time.monotonic() + timeout
+    states: dict[str, str] = {}
+
+    def refresh(name: str):
+        state = container_state(name)
+        if states.get(name) != state:
+            states[name] = state
+            if on_change:
+                on_change(name, state)
+
+    while time.monotonic() < deadline:
+        try:
+            filters = {"type": ["container"], "container": list(names)}
+            conn, resp = _get(_url("/events", filters=filters), timeout=None)
+        except OSError:
+            # Démon absent ou en redémarrage (l'installateur le relance)
+            time.sleep(1)
+            continue
+        try:
+            for name in names:
+                refresh(name)
+            if all(_is_ready(states[n]) for n in names):
+                return True, states
+            for event in _read_events(conn, resp, deadline):
+                name = (event.get("Actor", {}).get("Attributes") or {}).get("name")
+                if name in names:
+                    refresh(name)
+                    if all(_is_ready(states[n]) for n in names):
+                        return True, states
+        except (OSError, DockerError):
+            time.sleep(1)
+        finally:
+            conn.close()
+    return False, states
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Estimation du temps d'installation restant
+Utilisé par runner.py (estimation publiée dans l'état de l'installation).
+
+Durées attendues : table des durées passées de chaque étape — médiane des
+SAMPLES dernières installations réussies. La table livrée avec l'image
+(step-durations.json) sert de départ ; chaque installation met à jour sa
+copie locale.
+
+Temps restant : chemin critique du plan (les étapes indépendantes tournent
+en parallèle, cf. pipeline.py). Une étape en cours vaut sa durée attendue
+moins le temps déjà écoulé, corrigée en direct par sa progression :
+  - apt (phase install) : extrapolation du pourcentage dpkg ;
+  - Docker : octets restants au débit mesuré depuis le premier événement.
+Plus la progression avance, plus la mesure l'emporte sur la table.
+
+Usage (recaler la table livrée sur un rapport réel, partition boot d'un Pi) :
+  eta.py update step-durations.json tipi-install-report.json
+"""
+
+import json
+import os
+import statistics
+import sys
+
+SEED_TABLE    = os.path.join(os.path.dirname(os.path.abspath(__file__)), "step-durations.json")
+SAMPLES       = 5      # durées gardées par étape
+DEFAULT_STEP  = 5.0    # étape absente de la table (s)
+RUNNING_FLOOR = 5.0    # une étape en cours n'est jamais estimée terminée (s)
+
+
+# ---------------------------------------------------------------------------
+# Table des durées
+# ---------------------------------------------------------------------------
+def _read(path: str) -> dict:
+    try:
+        with open(path) as f:
+            table = json.load(f)
+        return table if isinstance(table.get("steps"), dict) else {}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def load_expected(*paths: str) -> dict[str, float]:
+    """Durée attendue de chaque étape, depuis la première table lisible."""
+    for path in paths:
+        table = _read(path)
+        if table:
+            return {name: statistics.median(samples)
+                    for name, samples in table["steps"].items() if samples}
+    return {}
+
+
+def update_table(path: str, report: dict, seed: str = SEED_TABLE):
+    """Ajoute les durées des étapes réussies de `report` (rapport
+    d'installation) à la table `path`, créée depuis `seed` au besoin.
+    Une installation marquée en échec (`install_failed`) n'est pas comptée."""
+    if report.get("install_failed"):
+        return
+    table = _read(path) or _read(seed) or {"version": 1, "steps": {}}
+    for name, info in report.get("steps", {}).items():
+        if info.get("status") == "ok" and info.get("duration") is not None:
+            samples = table["steps"].setdefault(name, [])
+            samples.append(round(info["duration"], 1))
+            del samples[:-SAMPLES]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(table, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Estimation en direct
+# ---------------------------------------------------------------------------
+class Estimator:
+    """Alimenté par les messages "timing" / "progress" de setup.py (horodatages
+    epoch) ; remaining() donne le temps restant en secondes."""
+
+    def __init__(self, expected: dict[str, float]):
+        self._expected = expected
+        self._steps: list[str] = []
+        self._after: dict[str, list] = {}
+        self._started: dict[str, float] = {}
+        self._finished: set = set()
+        self._progress: dict[str, dict] = {}
+
+    def plan(self, steps: list[str], after: dict | None = None):
+        self._steps = list(steps)
+        self._after = dict(after or {})
+
+    def start(self, step: str, t: float):
+        self._started[step] = t
+
+    def finish(self, step: str):
+        """Étape terminée, sautée ou déjà faite (cached)."""
+        self._finished.add(step)
+
+    def progress(self, step: str, event: dict, t: float):
+        state = self._progress.setdefault(step, {})
+        if event.get("kind") == "docker":
+            state.setdefault("first", (t, event.get("bytes", 0)))
+            state.update(kind="docker", t=t, bytes=event.get("bytes", 0),
+                         total=event.get("total", 0), percent=event.get("percent", 0))
+        else:
+            phase = event.get("phase")
+            percent = event.get("percent", 0) if phase == "install" else 0
+            # Nouvelle phase, ou nouvel appel d'apt dans la même étape (le
+            # pourcentage repart en arrière) : le débit se mesure depuis ici
+            if state.get("phase") != phase or percent < state.get("percent", 0):
+                state["phase_start"] = t
+            state.update(kind="apt", phase=phase, t=t, percent=percent)
+
+    def _step_remaining(self, step: str, now: float) -> float:
+        if step in self._finished:
+            return 0.0
+        expected = self._expected.get(step, DEFAULT_STEP)
+        if step not in self._started:
+            return expected
+        table = max(expected - (now - self._started[step]), 0.0)
+        state = self._progress.get(step, {})
+        percent = state.get("percent", 0)
+        live = None
+        # Au-delà de 100 % (extraction, démarrage des containers, fin de dpkg) :
+        # retour à la table
+        if not 0 < percent < 100:
+            pass
+        elif state.get("kind") == "docker":
+            t0, bytes0 = state["first"]
+            if state["t"] > t0 and state["bytes"] > bytes0:
+                rate = (state["bytes"] - bytes0) / (state["t"] - t0)
+                live = max(state["total"] - state["bytes"], 0) / rate
+        elif state.get("phase") == "install":
+            live = (state["t"] - state["phase_start"]) * (100 - percent) / percent
+        if live is not None:
+            weight = percent / 100
+            table = weight * live + (1 - weight) * table
+        return max(table, RUNNING_FLOOR)
+
+    def remaining(self, now: float) -> float | None:
+        if not self._steps:
+            return None
+        finish: dict[str, float] = {}
+
+        def end_of(step: str) -> float:
+            if step not in finish:
+                finish[step] = 0.0   # garde-fou contre un cycle
+                start = max((end_of(d) for d in self._after.get(step, ()) if d in self._steps),
+                            default=0.0)
+                finish[step] = start + self._step_remaining(step, now)
+            return finish[step]
+
+        return max(end_of(step) for step in self._steps)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "update":
+        raise SystemExit("usage : eta.py update <table.json> <tipi-install-report.json>")
+    with open(sys.argv[3]) as f:
+        update_table(sys.argv[2], json.load(f))
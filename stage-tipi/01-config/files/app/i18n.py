@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Catalogues de traduction compilés
+Utilisé par app.py (portail) et setup.py à la place de translations.py.
+
+translations.py reste la source éditée à la main. Au build de l'image,
+`python3 i18n.py build <dossier>` vérifie que chaque langue couvre toutes les
+clés de "en" (mêmes paramètres {…}) et écrit un catalogue JSON par langue,
+avec la liste des paramètres de chaque chaîne déjà extraite. À l'exécution,
+seul le catalogue de la langue demandée est chargé, à la première demande.
+
+Sans catalogues (arbre source, simulateur bench/), les catalogues sont
+compilés en mémoire depuis translations.py.
+"""
+
+import json
+import os
+import string
+import sys
+import threading
+
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogs")
+INDEX_FILE  = "index.json"
+
+
+class Catalog(dict):
+    """Traductions d'une langue : `T["clé"]` donne la chaîne brute,
+    `T("clé", n=3)` la chaîne rendue (utilisé tel quel comme `t()` Jinja)."""
+
+    def __init__(self, strings: dict[str, str], params: dict[str, list[str]]):
+        super().__init__(strings)
+        self._params = params
+
+    def __call__(self, key: str, **kw) -> str:
+        text = self.get(key, key)
+        # Chaînes sans paramètre : rendues telles quelles, sans str.format
+        return text.format_map(kw) if kw and key in self._params else text
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+_formatter = string.Formatter()
+
+
+def _fields(text: str) -> set[str]:
+    return {field for _, field, _, _ in _formatter.parse(text) if field is not None}
+
+
+def compile_catalog(strings: dict[str, str]) -> dict:
+    params = {}
+    for key, text in strings.items():
+        fields = _fields(text)
+        if fields:
+            params[key] = sorted(fields)
+    return {"strings": strings, "params": params}
+
+
+def check_coverage(translations: dict[str, dict[str, str]], labels: dict[str, str],
+                   default: str) -> list[str]:
+    """Compare chaque langue à la langue par défaut ; retourne les erreurs."""
+    if default not in translations:
+        return [f"langue par défaut absente : {default}"]
+    errors = []
+    for lang in sorted(set(translations) ^ set(labels)):
+        where = "LANG_LABELS" if lang not in labels else "TRANSLATIONS"
+        errors.append(f"{lang} : absente de {where}")
+    ref = translations[default]
+    for lang, strings in translations.items():
+        if lang == default:
+            continue
+        for key in sorted(ref.keys() - strings.keys()):
+            errors.append(f"{lang} : clé manquante {key}")
+        for key in sorted(strings.keys() - ref.keys()):
+            errors.append(f"{lang} : clé inconnue de {default} {key}")
+        for key in sorted(ref.keys() & strings.keys()):
+            if _fields(strings[key]) != _fields(ref[key]):
+                errors.append(f"{lang} : paramètres différents pour {key} "
+                              f"({sorted(_fields(strings[key]))} au lieu de {sorted(_fields(ref[key]))})")
+    return errors
+
+
+def build(out_dir: str) -> int:
+    import translations
+
+    errors = check_coverage(translations.TRANSLATIONS, translations.LANG_LABELS,
+                            translations.DEFAULT_LANG)
+    if errors:
+        for e in errors:
+            print(f"i18n : {e}", file=sys.stderr)
+        return 1
+    os.makedirs(out_dir, exist_ok=True)
+    for lang, strings in translations.TRANSLATIONS.items():
+        _write_json(os.path.join(out_dir, f"{lang}.json"), compile_catalog(strings))
+    _write_json(os.path.join(out_dir, INDEX_FILE),
+                {"default": translations.DEFAULT_LANG, "labels": translations.LANG_LABELS})
+    print(f"i18n : {len(translations.TRANSLATIONS)} catalogue(s) écrit(s) dans {out_dir}")
+    return 0
+
+
+def _write_json(path: str, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+
+# ---------------------------------------------------------------------------
+# Chargement paresseux
+# ---------------------------------------------------------------------------
+def _load_index() -> tuple[str, dict[str, str], bool]:
+    try:
+        with open(os.path.join(CATALOG_DIR, INDEX_FILE), encoding="utf-8") as f:
+            index = json.load(f)
+        return index["default"], index["labels"], True
+    except (OSError, ValueError, KeyError):
+        import translations
+        return translations.DEFAULT_LANG, translations.LANG_LABELS, False
+
+
+DEFAULT_LANG, LANG_LABELS, _COMPILED = _load_index()
+SUPPORTED_LANGS = list(LANG_LABELS)
+
+_catalogs: dict[str, Catalog] = {}
+_lock = threading.Lock()
+
+
+def _load(lang: str) -> Catalog:
+    if _COMPILED:
+        with open(os.path.join(CATALOG_DIR, f"{lang}.json"), encoding="utf-8") as f:
+            data = json.load(f)
+    else:
+        import translations
+        data = compile_catalog(translations.TRANSLATIONS[lang])
+    return Catalog(data["strings"], data["params"])
+
+
+def get_t(lang: str) -> Catalog:
+    """Catalogue de la langue donnée, avec fallback sur DEFAULT_LANG."""
+    if lang not in LANG_LABELS:
+        lang = DEFAULT_LANG
+    catalog = _catalogs.get(lang)
+    if catalog is None:
+        with _lock:
+            catalog = _catalogs.get(lang)
+            if catalog is None:
+                catalog = _catalogs[lang] = _load(lang)
+    return catalog
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "build":
+        raise SystemExit("usage : i18n.py build <dossier des catalogues>")
+    raise SystemExit(build(sys.argv[2]))
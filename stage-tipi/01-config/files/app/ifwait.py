@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Attente des transitions d'interface sur événement
+Utilisé par start.sh (apparition de wlan0, AP hostapd actif) et par
+setup.py (bascule hotspot → client WiFi).
+
+Chaque attente s'abonne d'abord à la source d'événements, puis lit l'état
+courant, puis attend — pas de fenêtre où l'événement passerait inaperçu, et
+pas de `sleep` calibré sur le pire cas :
+  - interface : rtnetlink (netstate) ;
+  - hostapd   : socket de contrôle, événement AP-ENABLED ;
+  - NetworkManager : `nmcli device monitor` ;
+  - fin d'un processus : pidfd.
+
+Usage (start.sh) :
+  ifwait.py link <iface> <timeout>
+  ifwait.py hostapd <iface> <timeout>
+  ifwait.py nm <iface> <état>[,<état>…] <timeout>
+Code de sortie 0 si l'état est atteint, 1 au timeout.
+"""
+
+import os
+import select
+import socket
+import subprocess
+import sys
+import time
+
+from netstate import get_state as get_netstate
+import relay
+
+HOSTAPD_CTRL_DIR = "/run/hostapd"
+
+
+# ---------------------------------------------------------------------------
+# Interface (rtnetlink)
+# ---------------------------------------------------------------------------
+def wait_link(iface: str, timeout: float) -> bool:
+    return get_netstate().wait_for_link(iface, timeout)
+
+
+# ---------------------------------------------------------------------------
+# hostapd — socket de contrôle (ctrl_interface de tipi-hostapd.conf)
+# ---------------------------------------------------------------------------
+def wait_hostapd(iface: str, timeout: float, ctrl_dir: str = HOSTAPD_CTRL_DIR) -> bool:
+    """True dès que l'AP émet (STATUS state=ENABLED ou événement AP-ENABLED)."""
+    deadline = time.monotonic() + timeout
+    local = f"/tmp/tipi-ifwait-{os.getpid()}"
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.bind(local)
+        sock.connect(os.path.join(ctrl_dir, iface))
+        sock.settimeout(max(deadline - time.monotonic(), 0.1))
+        sock.send(b"ATTACH")
+        # Après ATTACH, réponses et événements arrivent sur la même socket
+        sock.send(b"STATUS")
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            sock.settimeout(remaining)
+            msg = sock.recv(4096).decode(errors="replace")
+            if "state=ENABLED" in msg or "AP-ENABLED" in msg:
+                return True
+            if "AP-DISABLED" in msg or "INTERFACE-DISABLED" in msg:
+                return False
+    except OSError:
+        return False
+    finally:
+        sock.close()
+        try:
+            os.unlink(local)
+        except OSError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# NetworkManager
+# ---------------------------------------------------------------------------
+def _nm_state(iface: str) -> str:
+    """État NM du périphérique : "unmanaged", "disconnected", "connected"…"""
+    result = subprocess.run(["nmcli", "-g", "GENERAL.STATE", "device", "show", iface],
+                            capture_output=True, text=True)
+    # "30 (disconnected)" → "disconnected"
+    return result.stdout.strip().partition("(")[2].rstrip(")").strip()
+
+
+def wait_nm_state(iface: str, states: tuple[str, ...], timeout: float) -> bool:
+    """True dès que NetworkManager annonce l'un des `states` pour `iface`."""
+    try:
+        # Pipe binaire lu par blocs : plusieurs lignes écrites d'un coup par
+        # nmcli sont toutes vues (pas de tampon Python que select ignorerait)
+        proc = subprocess.Popen(["nmcli", "device", "monitor", iface],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+    except OSError:
+        return False
+    try:
+        # Une seule relecture, après l'abonnement : une transition antérieure
+        # au moniteur est vue ici, les suivantes arrivent sur le pipe
+        if _nm_state(iface) in states:
+            return True
+        fd = proc.stdout.fileno()
+        splitter = relay.Splitter(strip_ansi=False)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                return False
+            chunk = os.read(fd, relay.CHUNK_SIZE)
+            lines = splitter.feed(chunk) if chunk else splitter.finish()
+            # "wlan0: disconnected", "wlan0: connecting (prepare)"…
+            for line in lines:
+                if line.partition(":")[2].strip().split(" (")[0] in states:
+                    return True
+            if not chunk:
+                return False
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# ---------------------------------------------------------------------------
+# Processus
+# ---------------------------------------------------------------------------
+def open_pidfile(path: str) -> int | None:
+    """pidfd du processus nommé dans `path`, à ouvrir AVANT de le tuer."""
+    try:
+        with open(path) as f:
+            return os.pidfd_open(int(f.read().strip()))
+    except (OSError, ValueError):
+        return None
+
+
+def wait_exit(pidfds: list[int], timeout: float) -> bool:
+    """True quand tous les processus sont terminés ; ferme les pidfds."""
+    deadline = time.monotonic() + timeout
+    pending = list(pidfds)
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select(pending, [], [], remaining)
+            pending = [fd for fd in pending if fd not in ready]
+        return True
+    finally:
+        for fd in pidfds:
+            os.close(fd)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) == 3 and args[0] == "link":
+        ok = wait_link(args[1], float(args[2]))
+    elif len(args) == 3 and args[0] == "hostapd":
+        ok = wait_hostapd(args[1], float(args[2]))
+    elif len(args) == 4 and args[0] == "nm":
+        ok = wait_nm_state(args[1], tuple(args[2].split(",")), float(args[3]))
+    else:
+        raise SystemExit("usage : ifwait.py link|hostapd <iface> <timeout>\n"
+                         "        ifwait.py nm <iface> <état>[,<état>…] <timeout>")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Canal de messages typés entre setup.py et le portail
+Utilisé par pipeline.py (écriture, côté setup.py), runner.py (lecture) et
+app.py (rendu des messages).
+
+Une trame par ligne, décodée d'un seul json.loads :
+  {"v": 1, "msgs": [{"type": "step", "key": "hostname_step", "params": {}}, …]}
+
+Le superviseur (runner.py) passe à setup.py l'extrémité d'écriture d'un pipe
+dédié (numéro de fd dans TIPI_IPC_FD) : la sortie brute des commandes, sur
+stdout, ne peut plus être prise pour un message. Lancé à la main
+(retry-runtipi.sh, bench), setup.py écrit ses trames sur stdout.
+
+Types de messages :
+  step / done / error / log   message traduisible (key + params)
+  output                      lignes relayées d'une commande (lines)
+  timing                      mesure de temps (plan, start/end/skip d'étape, cmd_start/cmd_end)
+  progress                    progression agrégée d'apt ou des pulls Docker
+  result                      résultat de l'installation (ip)
+
+Les messages portent des clés de traduction : le portail les rend dans la
+langue de chaque lecteur, à l'affichage. Un paramètre peut lui-même être une
+clé (ref()), rendue dans la même langue.
+"""
+
+import json
+import os
+
+VERSION = 1
+ENV_FD  = "TIPI_IPC_FD"
+
+
+def ref(key: str, **params) -> dict:
+    """Paramètre traduit à l'affichage (ex. cause d'un échec)."""
+    return {"key": key, "params": params}
+
+
+def encode(msgs: list[dict]) -> bytes:
+    # default=str : exceptions et chemins passés tels quels en paramètre
+    frame = {"v": VERSION, "msgs": msgs}
+    return (json.dumps(frame, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode()
+
+
+def decode(line: str) -> list[dict] | None:
+    """Messages d'une trame ; None si la ligne n'est pas une trame de cette version."""
+    try:
+        frame = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(frame, dict) or frame.get("v") != VERSION or not isinstance(frame.get("msgs"), list):
+        return None
+    return frame["msgs"]
+
+
+def render(t, key: str, params: dict | None = None) -> str:
+    """Texte d'un message dans la langue du catalogue `t` (i18n.Catalog)."""
+    params = {name: render(t, value["key"], value.get("params"))
+              if isinstance(value, dict) and "key" in value else value
+              for name, value in (params or {}).items()}
+    return t(key, **params)
+
+
+class Writer:
+    """Extrémité d'écriture : le fd de TIPI_IPC_FD, sinon stdout."""
+
+    def __init__(self, fd: int | None = None):
+        if fd is None:
+            fd = int(os.environ.get(ENV_FD, 1))
+        self.fd = fd
+
+    def write(self, msgs: list[dict]):
+        data = memoryview(encode(msgs))
+        # Trame entière, même si le pipe n'accepte qu'une partie à la fois
+        while data:
+            data = data[os.write(self.fd, data):]
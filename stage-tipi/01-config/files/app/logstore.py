@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Journal de progression persistant
+Écrit par runner.py (superviseur de l'installation), lu par app.py pour les
+entrées affichées sur /progress.
+
+Toutes les entrées sont écrites dans un fichier JSON-lines append-only,
+accompagné d'un index d'offsets (8 octets par entrée) pour relire n'importe
+quel `from=N` sans tout garder en RAM. Les écritures ne sont pas tamponnées
+et l'index est écrit après les données : une entrée indexée est complète,
+pour un lecteur d'un autre processus comme après un crash de l'écrivain.
+
+Le lecteur est réveillé par inotify (index du journal, fichiers d'état de
+l'écrivain) et garde les entrées récentes dans un anneau de taille fixe : un
+portail qui redémarre relit l'historique sans rien demander au superviseur.
+Sans inotify, il stat l'index toutes les FOLLOW_INTERVAL s.
+"""
+
+import ctypes
+import json
+import os
+import select
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+_OFFSET = struct.Struct("<Q")
+
+FOLLOW_INTERVAL = 0.05   # période de suivi sans inotify (s)
+DONE_RECHECK    = 2      # journal immobile : relecture de la fin de l'écrivain (s)
+
+# inotify(7) — sys/inotify.h
+_IN_MODIFY      = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO    = 0x080
+_IN_CREATE      = 0x100
+_IN_DELETE      = 0x200
+_IN_EVENT       = struct.Struct("iIII")   # wd, mask, cookie, len (puis le nom)
+
+
+class _Watch:
+    """Noms des fichiers `paths` modifiés (inotify).
+
+    On surveille les répertoires, pas les fichiers : un fichier remplacé
+    (os.replace) ou recréé reste suivi. Les autres fichiers de ces
+    répertoires (données du journal, tables, offsets du vidage bootlog…) sont
+    ignorés sans réveiller l'appelant. Lève OSError si inotify manque.
+    """
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._names = {os.path.basename(p) for p in paths}
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+        for directory in sorted({os.path.dirname(p) for p in paths}):
+            os.makedirs(directory, exist_ok=True)
+            if self._add(self.fd, directory.encode(), mask) < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch {directory}")
+
+    def read(self, timeout: float) -> set[str]:
+        """Noms surveillés touchés depuis le dernier appel ; attend au plus
+        `timeout` s (ensemble vide à l'échéance)."""
+        deadline = time.monotonic() + timeout
+        names = set()
+        while not names:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.fd], [], [], remaining)[0]:
+                return names
+            while True:
+                try:
+                    data = os.read(self.fd, 65536)
+                except BlockingIOError:
+                    break
+                pos = 0
+                while pos < len(data):
+                    _, _, _, size = _IN_EVENT.unpack_from(data, pos)
+                    pos += _IN_EVENT.size
+                    name = data[pos:pos + size].rstrip(b"\0").decode(errors="replace")
+                    if name in self._names:
+                        names.add(name)
+                    pos += size
+        return names
+
+
+def remove(path: str):
+    """Supprime un journal (données et index) ; ses lecteurs repartent de zéro."""
+    for stale in (path, path + ".idx"):
+        try:
+            os.remove(stale)
+        except FileNotFoundError:
+            pass
+
+
+class ProgressLog:
+    """Écrivain : l'entrée N garde le numéro N pour toute la durée du journal."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Nouveau journal à chaque installation : nouveaux inodes, un lecteur
+        # qui suivait l'ancien repart de zéro
+        remove(path)
+        self._lock  = threading.Lock()
+        self._data  = open(path, "wb", buffering=0)
+        self._index = open(path + ".idx", "wb", buffering=0)
+        self._offset = 0
+        self._total  = 0
+
+    def append(self, entry: dict) -> int:
+        """Ajoute une entrée et retourne son numéro de séquence."""
+        return self.extend([entry])
+
+    def extend(self, entries: list[dict]) -> int:
+        """Ajoute une trame d'entrées d'un coup (un write pour les données, un
+        pour l'index) ; retourne le numéro de séquence de la première."""
+        data = bytearray()
+        offsets = bytearray()
+        with self._lock:
+            for entry in entries:
+                offsets += _OFFSET.pack(self._offset + len(data))
+                data += json.dumps(entry, ensure_ascii=False).encode() + b"\n"
+            self._data.write(data)
+            self._index.write(offsets)
+            self._offset += len(data)
+            seq = self._total
+            self._total += len(entries)
+            return seq
+
+    def close(self):
+        with self._lock:
+            self._data.close()
+            self._index.close()
+
+
+class ProgressReader:
+    """Lecteur qui suit le journal d'un autre processus.
+
+    `cond` est notifiée à chaque lot d'entrées lu et à la fin de
+    l'installation : les lecteurs (SSE, long-poll) s'y bloquent au lieu de
+    sonder. `is_done()` dit si l'écrivain a terminé ; elle n'est appelée
+    (hors verrou) que si l'un des `done_paths` (état, verrou de l'écrivain)
+    change, ou après DONE_RECHECK s sans nouvelle entrée — un écrivain mort
+    ne prévient personne.
+
+    `read_state()` (optionnelle) est relue avec is_done(), au même moment ;
+    `state` en garde la dernière valeur pour les requêtes, sans lecture de
+    fichier.
+
+    `generation` identifie le journal suivi (horodatage de sa première
+    entrée, "" tant qu'il est vide) : un client qui reprend à l'index N d'un
+    autre journal doit repartir de zéro.
+    """
+
+    def __init__(self, path: str, ring_size: int = 1000,
+                 is_done: Callable[[], bool] | None = None, done_paths: tuple[str, ...] = (),
+                 read_state: Callable[[], dict] | None = None, interval: float = FOLLOW_INTERVAL):
+        self.cond  = threading.Condition()
+        self._ring: deque = deque(maxlen=ring_size)
+        self._total = 0
+        self._done  = False
+        self._closed = False
+        self._generation = ""
+        self._path  = path
+        self._is_done = is_done
+        self._read_state = read_state
+        self._state: dict = {}
+        self._done_names = {os.path.basename(p) for p in done_paths}
+        self._done_paths = done_paths
+        self._interval = interval
+        self._ino = None
+        self._data = self._index = None
+        try:
+            self._watch = _Watch((path + ".idx", *done_paths))
+        except (OSError, AttributeError):
+            self._watch = None   # pas d'inotify : suivi par stat périodique
+        self._poll(check_done=True)
+        threading.Thread(target=self._follow, name="progress-follow", daemon=True).start()
+
+    # ------------------------------------------------------------------ #
+    #  Suivi                                                              #
+    # ------------------------------------------------------------------ #
+    def _follow(self):
+        index_name = os.path.basename(self._path) + ".idx"
+        mtimes = self._mtimes()
+        last_change = time.monotonic()
+        while not self.closed:
+            if self._watch is not None:
+                names = self._watch.read(DONE_RECHECK)
+                grown = index_name in names
+                check_done = bool(names & self._done_names)
+            else:
+                time.sleep(self._interval)
+                grown = True
+                previous, mtimes = mtimes, self._mtimes()
+                check_done = mtimes != previous
+            now = time.monotonic()
+            if grown and self._poll(check_done):
+                last_change = now
+            elif check_done or now - last_change >= DONE_RECHECK:
+                self._poll(check_done=True)
+                last_change = now
+
+    def _mtimes(self) -> list:
+        mtimes = []
+        for p in self._done_paths:
+            try:
+                mtimes.append(os.stat(p).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return mtimes
+
+    def _poll(self, check_done: bool) -> bool:
+        """Lit les nouvelles entrées ; True s'il y en avait."""
+        # Fin lue avant les entrées (les dernières écrites sont vues au même
+        # tour), et hors verrou : is_done() lit des fichiers
+        finished = check_done and self._is_done is not None and not self.done and self._is_done()
+        state = self._read_state() if check_done and self._read_state is not None else None
+        with self.cond:
+            if state is not None:
+                self._state = state
+            return self._poll_locked(finished)
+
+    def _poll_locked(self, finished: bool) -> bool:
+        total = self._total
+        try:
+            st = os.stat(self._path + ".idx")
+        except FileNotFoundError:
+            st = None
+        count = st.st_size // _OFFSET.size if st else 0
+        # Nouveau journal — y compris sur un inode réutilisé, plus court
+        if (st and st.st_ino) != self._ino or count < self._total:
+            self._reopen_locked(st)
+        if count and not self._generation:
+            self._generation = str(self._read_file_locked(0, 1)[0].get("ts", ""))
+        if count > self._total:
+            # Reprise (redémarrage du portail) : seule la fin va dans l'anneau
+            start = max(self._total, count - self._ring.maxlen)
+            self._ring.extend(self._read_file_locked(start, count))
+            self._total = count
+            self.cond.notify_all()
+        if finished:
+            self._done = True
+            self.cond.notify_all()
+        return self._total != total
+
+    def _reopen_locked(self, st):
+        for f in (self._data, self._index):
+            if f is not None:
+                f.close()
+        self._data = self._index = None
+        self._ring.clear()
+        self._total = 0
+        self._done = False
+        self._generation = ""
+        self._ino = st and st.st_ino
+        if st:
+            self._index = open(self._path + ".idx", "rb")
+            self._data  = open(self._path, "rb")
+
+    def close_readers(self):
+        """Arrêt du portail : débloque les lecteurs, qui doivent se terminer."""
+        with self.cond:
+            self._closed = True
+            self.cond.notify_all()
+
+    # ------------------------------------------------------------------ #
+    #  Lecture                                                            #
+    # ------------------------------------------------------------------ #
+    @property
+    def done(self) -> bool:
+        with self.cond:
+            return self._done
+
+    @property
+    def state(self) -> dict:
+        """Dernier état lu par read_state() ({} sans read_state)."""
+        with self.cond:
+            return self._state
+
+    @property
+    def generation(self) -> str:
+        with self.cond:
+            return self._generation
+
+    @property
+    def closed(self) -> bool:
+        with self.cond:
+            return self._closed
+
+    def __len__(self) -> int:
+        with self.cond:
+            return self._total
+
+    def read(self, since: int, limit: int = 500) -> list:
+        """Entrées [since, since+limit) — anneau si possible, sinon fichier."""
+        with self.cond:
+            since = max(since, 0)
+            end = min(self._total, since + limit)
+            if since >= end:
+                return []
+            ring_start = self._total - len(self._ring)
+            entries = []
+            if since < ring_start:
+                entries = self._read_file_locked(since, min(end, ring_start))
+                since = ring_start
+            for seq in range(since, end):
+                entries.append(self._ring[seq - ring_start])
+            return entries
+
+    def wait(self, since: int, timeout: float) -> bool:
+        """Bloque jusqu'à ce que l'entrée `since` existe ou que l'installation
+        soit finie. Retourne True si de nouvelles entrées sont disponibles."""
+        with self.cond:
+            self.cond.wait_for(lambda: self._total > since or self._done or self._closed, timeout)
+            return self._total > since
+
+    def _read_file_locked(self, start: int, end: int) -> list:
+        self._index.seek(start * _OFFSET.size)
+        (offset,) = _OFFSET.unpack(self._index.read(_OFFSET.size))
+        self._data.seek(offset)
+        return [json.loads(self._data.readline()) for _ in range(end - start)]
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — État réseau partagé (rtnetlink)
+Utilisé par app.py (portail) et setup.py (installation).
+
+Une socket NETLINK_ROUTE abonnée aux groupes lien/adresse/route IPv4 maintient
+en mémoire l'état des interfaces et des routes par défaut. Les lectures ne forkent rien, et les appelants
+peuvent attendre l'apparition d'une adresse sans boucle de polling.
+"""
+
+import errno
+import os
+import socket
+import struct
+import threading
+import time
+
+# ---------------------------------------------------------------------------
+# Constantes rtnetlink (linux/rtnetlink.h, linux/if_link.h, linux/if_addr.h)
+# ---------------------------------------------------------------------------
+NETLINK_ROUTE      = 0
+RTMGRP_LINK        = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE  = 0x40
+
+NLMSG_ERROR  = 2
+NLMSG_DONE   = 3
+RTM_NEWLINK  = 16
+RTM_DELLINK  = 17
+RTM_GETLINK  = 18
+RTM_NEWADDR  = 20
+RTM_DELADDR  = 21
+RTM_GETADDR  = 22
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+RTM_GETROUTE = 26
+
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP    = 0x300
+
+IFLA_IFNAME = 3
+IFA_ADDRESS = 1
+IFA_LOCAL   = 2
+RTA_OIF     = 4
+RTA_GATEWAY = 5
+RTA_TABLE   = 15
+
+RT_TABLE_MAIN = 254
+RTN_UNICAST   = 1
+
+IFF_UP       = 0x1
+IFF_LOWER_UP = 0x10000
+
+_NLMSG_HDR   = struct.Struct("=IHHII")      # len, type, flags, seq, pid
+_IFINFOMSG   = struct.Struct("=BxHiII")     # family, type, index, flags, change
+_IFADDRMSG   = struct.Struct("=BBBBI")      # family, prefixlen, flags, scope, index
+_RTMSG       = struct.Struct("=BBBBBBBBI")  # family, dst_len, src_len, tos, table, proto, scope, type, flags
+_RTATTR      = struct.Struct("=HH")         # len, type
+_RTGEN       = struct.Struct("=Bxxx")       # rtgenmsg (famille, alignée sur 4)
+
+
+def _align(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def _parse_attrs(data: bytes, offset: int) -> dict:
+    attrs = {}
+    while offset + _RTATTR.size <= len(data):
+        rta_len, rta_type = _RTATTR.unpack_from(data, offset)
+        if rta_len < _RTATTR.size:
+            break
+        attrs[rta_type] = data[offset + _RTATTR.size:offset + rta_len]
+        offset += _align(rta_len)
+    return attrs
+
+
+class NetState:
+    """Vue en mémoire des interfaces et de leurs adresses IPv4.
+
+    Un thread lit les événements du noyau et réveille les attentes via une
+    Condition. Si netlink est indisponible (hors Linux), les requêtes
+    retombent sur /sys/class/net et ne bloquent pas.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._links: dict[int, dict] = {}          # index -> {"name", "flags"}
+        self._addrs: dict[int, list[str]] = {}     # index -> [ip, ...] (ordre noyau)
+        self._default_routes: set = set()          # {(oif, passerelle)}
+        self._generation = 0                       # incrémenté à chaque changement
+        self._sock: socket.socket | None = None
+        self._started = False
+        self._seq = int(time.time())
+
+    # ------------------------------------------------------------------ #
+    #  Démarrage                                                          #
+    # ------------------------------------------------------------------ #
+    def start(self) -> bool:
+        """Ouvre la socket netlink et charge l'état initial. Idempotent."""
+        with self._cond:
+            if self._started:
+                return self._sock is not None
+            self._started = True
+            try:
+                sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+                sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE))
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            except (AttributeError, OSError):
+                return False
+            self._sock = sock
+            # Abonnement avant le dump : aucun événement ne peut être manqué
+            # entre la photo initiale et la réception des notifications.
+            self._dump(RTM_GETLINK, socket.AF_UNSPEC)
+            self._dump(RTM_GETADDR, socket.AF_INET)
+            self._dump(RTM_GETROUTE, socket.AF_INET)
+            threading.Thread(target=self._loop, name="netstate", daemon=True).start()
+            return True
+
+    def _dump(self, msg_type: int, family: int):
+        self._seq += 1
+        seq = self._seq
+        payload = _RTGEN.pack(family)
+        hdr = _NLMSG_HDR.pack(_NLMSG_HDR.size + len(payload), msg_type,
+                              NLM_F_REQUEST | NLM_F_DUMP, seq, 0)
+        self._sock.sendto(hdr + payload, (0, 0))
+        while True:
+            data = self._sock.recv(1 << 16)
+            if self._handle(data, dump_seq=seq):
+                return
+
+    # ------------------------------------------------------------------ #
+    #  Réception des messages                                             #
+    # ------------------------------------------------------------------ #
+    def _loop(self):
+        while True:
+            try:
+                data = self._sock.recv(1 << 16)
+            except OSError as e:
+                # ENOBUFS : des événements ont été perdus — on recharge tout
+                if e.errno == errno.ENOBUFS:
+                    with self._cond:
+                        self._links.clear()
+                        self._addrs.clear()
+                        self._default_routes.clear()
+                    self._resync()
+                    continue
+                return
+            with self._cond:
+                self._handle(data)
+
+    def _resync(self):
+        with self._cond:
+            self._dump(RTM_GETLINK, socket.AF_UNSPEC)
+            self._dump(RTM_GETADDR, socket.AF_INET)
+            self._dump(RTM_GETROUTE, socket.AF_INET)
+
+    def _handle(self, data: bytes, dump_seq: int | None = None) -> bool:
+        """Applique un datagramme netlink ; True si fin du dump `dump_seq`."""
+        changed = False
+        finished = False
+        offset = 0
+        while offset + _NLMSG_HDR.size <= len(data):
+            msg_len, msg_type, _, seq, _ = _NLMSG_HDR.unpack_from(data, offset)
+            if msg_len < _NLMSG_HDR.size:
+                break
+            body = offset + _NLMSG_HDR.size
+            if msg_type in (NLMSG_DONE, NLMSG_ERROR):
+                if dump_seq is not None and seq == dump_seq:
+                    finished = True
+            elif msg_type in (RTM_NEWLINK, RTM_DELLINK):
+                changed |= self._on_link(msg_type, data[body:offset + msg_len])
+            elif msg_type in (RTM_NEWADDR, RTM_DELADDR):
+                changed |= self._on_addr(msg_type, data[body:offset + msg_len])
+            elif msg_type in (RTM_NEWROUTE, RTM_DELROUTE):
+                changed |= self._on_route(msg_type, data[body:offset + msg_len])
+            offset += _align(msg_len)
+        if changed:
+            self._generation += 1
+            self._cond.notify_all()
+        return finished
+
+    def _on_link(self, msg_type: int, msg: bytes) -> bool:
+        _, _, index, flags, _ = _IFINFOMSG.unpack_from(msg)
+        if msg_type == RTM_DELLINK:
+            self._links.pop(index, None)
+            self._addrs.pop(index, None)
+            return True
+        attrs = _parse_attrs(msg, _IFINFOMSG.size)
+        name = attrs.get(IFLA_IFNAME, b"").split(b"\0", 1)[0].decode(errors="replace")
+        self._links[index] = {"name": name, "flags": flags}
+        return True
+
+    def _on_addr(self, msg_type: int, msg: bytes) -> bool:
+        family, _, _, _, index = _IFADDRMSG.unpack_from(msg)
+        if family != socket.AF_INET:
+            return False
+        attrs = _parse_attrs(msg, _IFADDRMSG.size)
+        raw = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS)
+        if not raw or len(raw) != 4:
+            return False
+        ip = socket.inet_ntoa(raw)
+        addrs = self._addrs.setdefault(index, [])
+        if msg_type == RTM_NEWADDR:
+            if ip not in addrs:
+                addrs.append(ip)
+        elif ip in addrs:
+            addrs.remove(ip)
+        return True
+
+    def _on_route(self, msg_type: int, msg: bytes) -> bool:
+        family, dst_len, _, _, table, _, _, rtype, _ = _RTMSG.unpack_from(msg)
+        if family != socket.AF_INET or dst_len != 0 or rtype != RTN_UNICAST:
+            return False
+        attrs = _parse_attrs(msg, _RTMSG.size)
+        if RTA_TABLE in attrs:
+            table = struct.unpack("=I", attrs[RTA_TABLE][:4])[0]
+        if table != RT_TABLE_MAIN:
+            return False
+        oif = struct.unpack("=i", attrs[RTA_OIF][:4])[0] if RTA_OIF in attrs else 0
+        gateway = socket.inet_ntoa(attrs[RTA_GATEWAY]) if len(attrs.get(RTA_GATEWAY, b"")) == 4 else None
+        key = (oif, gateway)
+        if msg_type == RTM_NEWROUTE:
+            self._default_routes.add(key)
+        else:
+            self._default_routes.discard(key)
+        return True
+
+    # ------------------------------------------------------------------ #
+    #  Requêtes (verrou tenu par l'appelant)                              #
+    # ------------------------------------------------------------------ #
+    def _index_locked(self, iface: str) -> int | None:
+        for index, link in self._links.items():
+            if link["name"] == iface:
+                return index
+        return None
+
+    def _ipv4_locked(self, iface: str) -> list[str]:
+        index = self._index_locked(iface)
+        return list(self._addrs.get(index, [])) if index is not None else []
+
+    def _first_ipv4_locked(self, ifaces, exclude: tuple) -> str | None:
+        for iface in ifaces:
+            for ip in self._ipv4_locked(iface):
+                if not ip.startswith(exclude):
+                    return ip
+        return None
+
+    # ------------------------------------------------------------------ #
+    #  API publique                                                       #
+    # ------------------------------------------------------------------ #
+    def exists(self, iface: str) -> bool:
+        if self._sock is None:
+            return os.path.exists(f"/sys/class/net/{iface}")
+        with self._cond:
+            return self._index_locked(iface) is not None
+
+    def carrier(self, iface: str) -> bool:
+        """True si l'interface est UP avec la porteuse (équivalent LOWER_UP)."""
+        if self._sock is None:
+            return _sysfs_read(iface, "carrier") == "1"
+        with self._cond:
+            index = self._index_locked(iface)
+            if index is None:
+                return False
+            flags = self._links[index]["flags"]
+            return bool(flags & IFF_UP and flags & IFF_LOWER_UP)
+
+    def ipv4(self, iface: str) -> list[str]:
+        if self._sock is None:
+            return []
+        with self._cond:
+            return self._ipv4_locked(iface)
+
+    def first_ipv4(self, ifaces=("eth0", "wlan0"), exclude: tuple = ()) -> str | None:
+        """Première IPv4 des interfaces données, hors préfixes exclus."""
+        if self._sock is None:
+            return None
+        with self._cond:
+            return self._first_ipv4_locked(ifaces, exclude)
+
+    def wait_for_ipv4(self, ifaces=("eth0", "wlan0"), exclude: tuple = (),
+                      timeout: float = 30) -> str | None:
+        """Bloque jusqu'à ce qu'une IPv4 éligible apparaisse (ou timeout)."""
+        if self._sock is None:
+            return None
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._first_ipv4_locked(ifaces, exclude) is not None, timeout,
+            )
+            return self._first_ipv4_locked(ifaces, exclude)
+
+    def default_route(self) -> tuple[str, str | None] | None:
+        """(interface, passerelle) d'une route IPv4 par défaut, ou None."""
+        if self._sock is None:
+            return None
+        with self._cond:
+            for oif, gateway in sorted(self._default_routes, key=lambda r: r[0]):
+                link = self._links.get(oif)
+                return (link["name"] if link else str(oif)), gateway
+            return None
+
+    @property
+    def generation(self) -> int:
+        """Compteur de changements ; à passer à wait_for_change()."""
+        with self._cond:
+            return self._generation
+
+    def poke(self):
+        """Signale un changement venu d'ailleurs (ex. NetworkManager)."""
+        with self._cond:
+            self._generation += 1
+            self._cond.notify_all()
+
+    def wait_for_change(self, generation: int, timeout: float) -> int:
+        """Bloque jusqu'à un changement postérieur à `generation` (ou timeout)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._generation != generation, timeout)
+            return self._generation
+
+    def wait_for_link(self, iface: str, timeout: float = 30) -> bool:
+        """Bloque jusqu'à l'apparition de l'interface (ou timeout)."""
+        if self._sock is None:
+            return self.exists(iface)
+        with self._cond:
+            return self._cond.wait_for(lambda: self._index_locked(iface) is not None, timeout)
+
+
+def _sysfs_read(iface: str, attr: str) -> str:
+    try:
+        with open(f"/sys/class/net/{iface}/{attr}") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+# ---------------------------------------------------------------------------
+# Instance partagée du processus
+# ---------------------------------------------------------------------------
+_state: NetState | None = None
+_state_lock = threading.Lock()
+
+
+def get_state() -> NetState:
+    """Retourne l'instance du processus, démarrée au premier appel."""
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = NetState()
+            _state.start()
+        return _state
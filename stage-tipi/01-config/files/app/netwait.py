@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Attentes réseau événementielles
+Utilisé par setup.py.
+
+wait_for_internet() se réveille sur les événements rtnetlink (route par défaut,
+adresses) et NetworkManager (`nmcli monitor`, un seul processus pour toute
+l'attente), puis confirme par une sonde DNS + TCP/TLS concurrente vers les
+hôtes dont l'installation a besoin.
+
+Les raisons d'attente sont des clés de traduction (ipc.ref), rendues dans la
+langue du lecteur par le portail.
+"""
+
+import os
+import socket
+import ssl
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ipc
+from netstate import get_state as get_netstate
+
+# Hôtes indispensables à l'installation : script Runtipi et binaires GitHub.
+# TIPI_PROBE_TARGETS (ex. "tcp://127.0.0.1:8443") remplace la liste — utilisé
+# par le simulateur bench/ pour rester hors réseau.
+PROBE_TARGETS = ("tls://setup.runtipi.io:443", "tls://github.com:443")
+PROBE_TIMEOUT = 5      # délai max d'une sonde (s)
+REPROBE_MAX   = 8      # sans événement réseau, re-sonde au plus toutes les N s
+
+
+def _probe_targets() -> list[tuple[str, str, int]]:
+    raw = os.environ.get("TIPI_PROBE_TARGETS")
+    targets = raw.split(",") if raw else PROBE_TARGETS
+    parsed = []
+    for target in targets:
+        scheme, _, hostport = target.strip().partition("://")
+        host, _, port = hostport.rpartition(":")
+        parsed.append((scheme, host, int(port)))
+    return parsed
+
+
+def _probe_one(scheme: str, host: str, port: int) -> dict | None:
+    """Résolution DNS puis connexion TCP (et poignée de main TLS). None si OK,
+    sinon la raison de l'échec (ipc.ref)."""
+    try:
+        infos = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        return ipc.ref("net_dns_fail", host=host, e=e.strerror or str(e))
+    last = None
+    for *_, addr in infos:
+        try:
+            with socket.create_connection(addr, timeout=PROBE_TIMEOUT) as sock:
+                if scheme == "tls":
+                    ctx = ssl.create_default_context()
+                    with ctx.wrap_socket(sock, server_hostname=host):
+                        pass
+            return None
+        except ssl.SSLError as e:
+            last = ipc.ref("net_tls_fail", host=host, e=e.reason or str(e))
+        except OSError as e:
+            last = ipc.ref("net_tcp_fail", host=host, port=port, e=e.strerror or str(e))
+    return last
+
+
+def probe() -> dict | None:
+    """Sonde tous les hôtes en parallèle ; None si tous répondent."""
+    targets = _probe_targets()
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        results = list(pool.map(lambda t: _probe_one(*t), targets))
+    failures = [r for r in results if r]
+    return failures[0] if failures else None
+
+
+class _NmMonitor:
+    """Relaye les changements d'état NetworkManager vers NetState.poke()."""
+
+    def __init__(self, net):
+        self._net = net
+        self._proc = None
+
+    def __enter__(self):
+        try:
+            self._proc = subprocess.Popen(
+                ["nmcli", "monitor"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+            )
+        except OSError:
+            return self
+        threading.Thread(target=self._read, name="nm-monitor", daemon=True).start()
+        return self
+
+    def _read(self):
+        for line in self._proc.stdout:
+            if "connectivity" in line.lower() or "state" in line.lower():
+                self._net.poke()
+
+    def __exit__(self, *exc):
+        if self._proc:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+
+
+def wait_for_internet(timeout: float = 60, on_wait=None) -> tuple[bool, dict | None]:
+    """Attend que la route par défaut, le DNS et les hôtes cibles soient joignables.
+
+    `on_wait(elapsed, reason)` est appelé quand la raison de l'attente change.
+    Retourne (True, None) ou (False, dernière raison d'échec).
+    """
+    net = get_netstate()
+    netlink = net.start()
+    start = time.monotonic()
+    deadline = start + timeout
+    reason = None
+    backoff = 1.0
+    with _NmMonitor(net):
+        while True:
+            generation = net.generation
+            if netlink and net.default_route() is None:
+                new_reason = ipc.ref("net_no_route")
+            else:
+                new_reason = probe()
+                if new_reason is None:
+                    return True, None
+            if new_reason != reason and on_wait:
+                on_wait(int(time.monotonic() - start), new_reason)
+            reason = new_reason
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False, reason
+            # Réveil sur événement réseau ; sinon re-sonde avec un backoff borné
+            # (le DNS peut devenir utilisable sans événement noyau).
+            if net.wait_for_change(generation, min(backoff, remaining)) != generation:
+                backoff = 1.0
+            else:
+                backoff = min(backoff * 2, REPROBE_MAX)
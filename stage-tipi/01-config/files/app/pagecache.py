@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Cache des pages rendues du portail
+Utilisé par app.py pour /configure (liste complète des fuseaux et locales).
+
+Une page est rendue une fois par clé (langue, état réseau…) puis servie
+depuis la mémoire, déjà compressée en gzip. Chaque variante porte un ETag
+fort : un navigateur qui revalide reçoit un 304 sans corps, ce qui compte
+sur le hotspot 2,4 GHz partagé par tous les téléphones.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from flask import Request, Response
+
+MIN_GZIP_SIZE = 1024   # en dessous, gzip ne fait rien gagner (octets)
+MAX_ENTRIES   = 32     # pages gardées en mémoire (LRU)
+
+
+class RenderedPage:
+    """Corps HTML d'une page, sa version gzip et leurs ETags."""
+
+    def __init__(self, html: str):
+        self.body = html.encode()
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.gzipped = None
+        if len(self.body) >= MIN_GZIP_SIZE:
+            # mtime=0 : même page → mêmes octets → même ETag après redémarrage
+            self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+
+    def response(self, request: Request) -> Response:
+        """Réponse adaptée au client : 304, gzip ou identité."""
+        use_gzip = self.gzipped is not None and "gzip" in request.accept_encodings
+        # Deux représentations distinctes → deux ETags forts distincts
+        etag = self.etag + ("-gz" if use_gzip else "")
+        if etag in request.if_none_match:
+            resp = Response(status=304)
+        else:
+            resp = Response(self.gzipped if use_gzip else self.body, mimetype="text/html")
+            if use_gzip:
+                resp.headers["Content-Encoding"] = "gzip"
+        resp.set_etag(etag)
+        # Toujours revalider : le contenu suit l'état réseau
+        resp.headers["Cache-Control"] = "no-cache"
+        resp.vary.add("Accept-Encoding")
+        resp.vary.add("Cookie")
+        return resp
+
+
+class PageCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self._max = max_entries
+        self._pages: OrderedDict[tuple, RenderedPage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, render: Callable[[], str]) -> RenderedPage:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                return page
+        # Rendu hors verrou : deux rendus concurrents de la même clé sont
+        # identiques, le second écrase simplement le premier
+        page = RenderedPage(render())
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self._max:
+                self._pages.popitem(last=False)
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Ordonnanceur du pipeline d'installation
+Utilisé par setup.py.
+
+Chaque étape déclare ses dépendances ; les étapes indépendantes tournent en
+parallèle dans un pool de threads. La sortie reste lisible : les messages d'une
+étape sont émis d'un seul bloc, dans l'ordre de déclaration. L'étape la plus
+ancienne encore en cours streame en direct, les suivantes sont tamponnées
+jusqu'à ce que leur tour vienne.
+
+La sortie est faite de messages typés (ipc.py), écrits par trames sur le
+canal du portail. Chaque étape émet des messages "timing" (start / end, avec
+la durée mesurée) ; timing() fait de même pour les sous-commandes.
+emit_progress() émet un message "progress", la progression agrégée d'apt ou
+d'un pull Docker.
+
+Avec un journal (checkpoint.Journal), une étape déclarant ses `inputs` est
+sautée si elle a déjà réussi avec les mêmes paramètres, ou si sa sonde
+`probe` constate que le système est déjà dans l'état voulu (événement
+"cached").
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable
+
+import ipc
+
+# Statuts d'une étape après run_steps()
+OK      = "ok"        # terminée (retour None ou True)
+FAILED  = "failed"    # a retourné False : ses dépendantes sont sautées
+                      # (statut rapporté aussi d'une étape ayant signalé une erreur)
+SKIPPED = "skipped"   # une dépendance a échoué
+ERROR   = "error"     # exception levée : plus aucune étape n'est lancée
+
+
+@dataclass
+class Step:
+    name: str
+    run: Callable[[], bool | None]
+    after: tuple[str, ...] = field(default_factory=tuple)
+    inputs: dict | None = None                   # None : jamais mise en cache
+    probe: Callable[[], bool] | None = None      # True : déjà satisfaite
+
+
+# ---------------------------------------------------------------------------
+# Sortie ordonnée
+# ---------------------------------------------------------------------------
+_local = threading.local()
+_writer = ipc.Writer()
+_writer_lock = threading.Lock()
+
+
+def _write(msgs: list[dict]):
+    with _writer_lock:
+        _writer.write(msgs)
+
+
+class _OrderedOutput:
+    """Sérialise la sortie des étapes selon leur ordre de déclaration."""
+
+    def __init__(self, count: int):
+        self._lock    = threading.Lock()
+        self._buffers = [[] for _ in range(count)]
+        self._closed  = [False] * count
+        self._head    = 0   # étape dont la sortie passe en direct
+
+    def write(self, index: int, msgs: list[dict]):
+        with self._lock:
+            if index == self._head:
+                _write(msgs)
+            else:
+                self._buffers[index].extend(msgs)
+
+    def close(self, index: int):
+        with self._lock:
+            self._closed[index] = True
+            while self._head < len(self._closed) and self._closed[self._head]:
+                self._head += 1
+                if self._head < len(self._buffers) and self._buffers[self._head]:
+                    _write(self._buffers[self._head])
+                    self._buffers[self._head] = []
+
+
+def emit(msg: dict):
+    """Écrit un message (ipc.py) depuis l'étape courante (ou hors pipeline)."""
+    if msg.get("type") == "error":
+        _local.had_error = True
+    channel = getattr(_local, "channel", None)
+    if channel is None:
+        _write([msg])
+    else:
+        output, index = channel
+        output.write(index, [msg])
+
+
+def emit_lines(lines: list[str]):
+    """Écrit une trame de lignes d'un seul message (sortie relayée d'une commande)."""
+    emit({"type": "output", "lines": lines})
+
+
+# ---------------------------------------------------------------------------
+# Mesures de temps
+# ---------------------------------------------------------------------------
+
+def current_step() -> str | None:
+    return getattr(_local, "step", None)
+
+
+def emit_timing(event: str, **fields):
+    """Émet un message "timing" (horodatage epoch inclus)."""
+    emit({"type": "timing", "event": event, "t": round(time.time(), 3), **fields})
+
+
+def emit_progress(kind: str, **fields):
+    """Émet un message "progress" (état agrégé d'apt ou d'un pull Docker)."""
+    emit({"type": "progress", "kind": kind, "step": current_step(), **fields})
+
+
+@contextmanager
+def timing(kind: str, name: str):
+    """Encadre une sous-commande d'événements `<kind>_start` / `<kind>_end`.
+
+    Le résultat (ex. code retour) peut être renseigné via le dict retourné.
+    """
+    step = current_step()
+    emit_timing(f"{kind}_start", step=step, name=name)
+    start = time.monotonic()
+    result: dict = {}
+    try:
+        yield result
+    finally:
+        emit_timing(f"{kind}_end", step=step, name=name,
+                    duration=round(time.monotonic() - start, 3), **result)
+
+
+# ---------------------------------------------------------------------------
+# Exécution
+# ---------------------------------------------------------------------------
+
+def _check(steps: list[Step]):
+    seen: set = set()
+    for s in steps:
+        for dep in s.after:
+            if dep not in seen:
+                raise ValueError(f"Étape '{s.name}' : dépendance '{dep}' inconnue ou déclarée après")
+        seen.add(s.name)
+
+
+def _satisfied(step: Step, journal) -> str | None:
+    """"journal" ou "probe" si l'étape n'a pas besoin d'être rejouée."""
+    if journal is None or step.inputs is None:
+        return None
+    if journal.is_done(step.name, step.inputs):
+        return "journal"
+    try:
+        satisfied = step.probe is not None and step.probe()
+    except Exception:
+        satisfied = False
+    if satisfied:
+        journal.mark_done(step.name, step.inputs, how="probe")
+        return "probe"
+    return None
+
+
+def run_steps(steps: list[Step], max_workers: int = 4, journal=None,
+              on_cached: Callable[[str, str], None] | None = None) -> dict[str, str]:
+    """Exécute le graphe d'étapes et retourne {nom: statut}.
+
+    Les étapes doivent être déclarées dans un ordre topologique (une
+    dépendance avant ses dépendantes). Si une étape lève une exception, les
+    étapes en cours se terminent puis l'exception est relancée.
+    `on_cached(nom, raison)` est appelé (dans la sortie de l'étape) quand une
+    étape est sautée grâce au journal ou à sa sonde.
+    """
+    _check(steps)
+    emit_timing("plan", steps=[s.name for s in steps],
+                after={s.name: list(s.after) for s in steps if s.after})
+    output  = _OrderedOutput(len(steps))
+    status: dict[str, str] = {}
+    pending = list(range(len(steps)))
+    running: dict = {}   # future -> index
+    failure: BaseException | None = None
+
+    def _run(index: int):
+        step = steps[index]
+        _local.channel = (output, index)
+        _local.step = step.name
+        _local.had_error = False
+        try:
+            how = _satisfied(step, journal)
+            if how:
+                emit_timing("cached", step=step.name, how=how)
+                if on_cached:
+                    on_cached(step.name, how)
+                return None
+            emit_timing("start", step=step.name)
+            start = time.monotonic()
+            result = ERROR
+            try:
+                ret = step.run()
+                # Erreur signalée sans retour False (ex. runtipi → flag d'échec) :
+                # ses dépendantes tournent, mais sa durée n'est pas un succès
+                result = FAILED if ret is False or _local.had_error else OK
+            finally:
+                emit_timing("end", step=step.name, status=result,
+                            duration=round(time.monotonic() - start, 3))
+            # Une étape qui a signalé une erreur (même non fatale) sera rejouée
+            if result == OK and journal is not None and step.inputs is not None:
+                journal.mark_done(step.name, step.inputs)
+            return ret
+        finally:
+            _local.channel = None
+            _local.step = None
+            output.close(index)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="step") as pool:
+        while pending or running:
+            if failure is None:
+                for index in list(pending):
+                    deps = [status.get(d) for d in steps[index].after]
+                    if any(d in (FAILED, SKIPPED, ERROR) for d in deps):
+                        status[steps[index].name] = SKIPPED
+                        emit_timing("skip", step=steps[index].name)
+                        pending.remove(index)
+                        output.close(index)
+                    elif all(d == OK for d in deps):
+                        pending.remove(index)
+                        running[pool.submit(_run, index)] = index
+            else:
+                for index in pending:
+                    status[steps[index].name] = SKIPPED
+                    emit_timing("skip", step=steps[index].name)
+                    output.close(index)
+                pending = []
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = steps[running.pop(future)].name
+                try:
+                    status[name] = FAILED if future.result() is False else OK
+                except Exception as e:
+                    status[name] = ERROR
+                    failure = failure or e
+
+    if failure is not None:
+        raise failure
+    return status
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Progression structurée d'apt-get et des pulls Docker
+Utilisé par setup.py (apt_update, apt_upgrade, installateur Runtipi).
+
+Plutôt que de relayer chaque ligne « Get: », « Unpacking », « Setting up »
+ou « Downloading [==>  ] » vers le portail, setup.py les écrit dans le
+journal brut et n'émet que l'état agrégé (messages "progress", cf. ipc.py) :
+  - apt : lignes machine d'APT::Status-Fd (dlstatus / pmstatus / pmerror),
+    pourcentage global et nombre de paquets ;
+  - Docker : lignes de couche des pulls (docker pull, docker compose pull),
+    octets téléchargés / attendus, toutes couches confondues.
+event() ne renvoie un état que s'il a changé (pourcentage entier, nombre de
+paquets ou de couches) : au plus une centaine d'événements par phase.
+"""
+
+import re
+
+# ---------------------------------------------------------------------------
+# apt — APT::Status-Fd
+# ---------------------------------------------------------------------------
+# "pmstatus:libc6:arm64:42.8571:Installed libc6 (arm64)" : le nom du paquet
+# peut contenir ":" (architecture), le pourcentage est le premier champ numérique
+_APT_STATUS_RE   = re.compile(r"^(dlstatus|pmstatus|pmerror|pmconffile|media-change):(.*?):(\d+(?:\.\d+)?):(.*)$")
+_APT_FILE_RE     = re.compile(r"Retrieving file (\d+) of (\d+)")
+_APT_SUMMARY_RE  = re.compile(r"^(\d+) upgraded, (\d+) newly installed")
+# Lignes de la sortie texte encore affichées dans le portail
+_APT_SHOWN       = ("E:", "W:", "Err:")
+
+
+class AptProgress:
+    def __init__(self):
+        self.phase: str | None = None     # "download" puis "install"
+        self.percent = 0.0
+        self.done = 0
+        self.total: int | None = None
+        self._packages: int | None = None  # paquets annoncés par le résumé d'apt-get
+        self._installed: set = set()
+        self._sent = None
+
+    def feed_output(self, lines: list[str]) -> list[str]:
+        """Sortie texte d'apt-get ; retourne les lignes à afficher (erreurs, avertissements)."""
+        shown = []
+        for line in lines:
+            if line.startswith(_APT_SHOWN):
+                shown.append(line)
+            elif self._packages is None:
+                m = _APT_SUMMARY_RE.match(line)
+                if m:
+                    self._packages = int(m.group(1)) + int(m.group(2))
+        return shown
+
+    def feed_status(self, line: str) -> str | None:
+        """Ligne d'APT::Status-Fd ; retourne le message d'une erreur dpkg (pmerror)."""
+        m = _APT_STATUS_RE.match(line)
+        if not m:
+            return None
+        kind, package, percent, message = m.groups()
+        if kind == "dlstatus":
+            self.phase = "download"
+            self.percent = float(percent)
+            files = _APT_FILE_RE.search(message)
+            if files:
+                self.done, self.total = int(files.group(1)) - 1, int(files.group(2))
+        elif kind == "pmstatus":
+            if self.phase != "install":
+                self.phase, self.done, self.total = "install", 0, self._packages
+            self.percent = float(percent)
+            if message.startswith("Installed "):
+                self._installed.add(package)
+                self.done = len(self._installed)
+        elif kind == "pmerror":
+            return f"{package}: {message}"
+        return None
+
+    def event(self) -> dict | None:
+        """État courant s'il a changé depuis le dernier appel, sinon None."""
+        if self.phase is None:
+            return None
+        state = {"phase": self.phase, "percent": int(self.percent),
+                 "done": self.done, "total": self.total}
+        if state == self._sent:
+            return None
+        self._sent = state
+        return state
+
+
+# ---------------------------------------------------------------------------
+# Docker — couches des pulls
+# ---------------------------------------------------------------------------
+# "a1b2c3d4e5f6: Downloading [===>   ] 12.2MB/95.4MB" (docker pull)
+# " ✔ a1b2c3d4e5f6 Pull complete" (docker compose pull)
+_LAYER_RE = re.compile(
+    r"^\W*([0-9a-f]{12})[:\s]\s*(Pulling fs layer|Waiting|Downloading|Verifying Checksum|"
+    r"Download complete|Extracting|Pull complete|Already exists)"
+    r"(?:.*?([\d.]+\s*[kMG]?B)/([\d.]+\s*[kMG]?B))?"
+)
+_DOWNLOADED = ("Verifying Checksum", "Download complete", "Extracting", "Pull complete")
+# Unités décimales, comme l'affichage de Docker (go-units HumanSize)
+_UNITS = {"B": 1, "kB": 1e3, "MB": 1e6, "GB": 1e9}
+
+
+def _size(text: str) -> int:
+    text = text.replace(" ", "")
+    unit = text.lstrip("0123456789.")
+    return int(float(text[:-len(unit)]) * _UNITS.get(unit, 1))
+
+
+class DockerPull:
+    def __init__(self):
+        self._layers: dict[str, list] = {}   # id → [octets reçus, octets attendus, terminée]
+        self._sent = None
+
+    def feed(self, line: str) -> bool:
+        """True si `line` est une ligne de couche (absorbée dans l'état)."""
+        m = _LAYER_RE.match(line)
+        if not m:
+            return False
+        layer_id, status, current, total = m.groups()
+        layer = self._layers.setdefault(layer_id, [0, 0, False])
+        if status == "Downloading" and total:
+            layer[1] = _size(total)
+            layer[0] = min(_size(current), layer[1])
+        elif status in _DOWNLOADED:
+            layer[0] = layer[1]
+            layer[2] = True
+        elif status == "Already exists":
+            layer[2] = True
+        return True
+
+    def event(self) -> dict | None:
+        if not self._layers:
+            return None
+        received = sum(layer[0] for layer in self._layers.values())
+        expected = sum(layer[1] for layer in self._layers.values())
+        state = {
+            "layers":  len(self._layers),
+            "done":    sum(layer[2] for layer in self._layers.values()),
+            "bytes":   received,
+            "total":   expected,
+            "percent": int(received * 100 / expected) if expected else 0,
+        }
+        key = (state["layers"], state["done"], state["percent"])
+        if key == self._sent:
+            return None
+        self._sent = key
+        return state
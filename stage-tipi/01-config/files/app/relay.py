@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Relais de sortie des sous-processus
+Utilisé par setup.py (run_cmd, installateur Runtipi) et par runner.py (lecture
+de la sortie de setup.py).
+
+Au lieu d'un readline() sur un pipe texte puis d'une écriture par ligne :
+  - lecture binaire par blocs de CHUNK_SIZE (un appel système pour des
+    centaines de lignes pendant apt-get upgrade ou un docker pull) ;
+  - codes ANSI retirés une fois par bloc, sur les lignes complètes ;
+  - lignes regroupées en trames : une trame part au plus FLUSH_INTERVAL
+    après sa première ligne, dès MAX_FRAME_LINES lignes, et à la fin du flux.
+L'appelant écrit donc une trame d'un coup (un write + un flush) et les
+messages step / done qui suivent la commande restent dans l'ordre.
+streams() lit plusieurs fds à la fois (sortie d'apt-get et son
+APT::Status-Fd) et produit des trames {nom: lignes}.
+
+\\r sépare les lignes comme \\n (barres de progression de docker, curl),
+comme le faisait le mode texte de Python.
+"""
+
+import os
+import re
+import select
+import time
+
+CHUNK_SIZE      = 65536
+FLUSH_INTERVAL  = 0.1    # délai max entre une ligne lue et son envoi (s)
+MAX_FRAME_LINES = 512
+
+# Couleurs et déplacements du curseur (mêmes séquences que setup.py avant relais)
+ANSI_RE = re.compile(rb"\x1b\[[0-9;]*[mGKHFABCDJr]")
+
+
+class Splitter:
+    """Découpe les blocs lus sur un fd en lignes complètes, non vides
+    (aussi utilisé par ifwait.py sur la sortie de nmcli)."""
+
+    def __init__(self, strip_ansi: bool):
+        self._strip = strip_ansi
+        self._pending = b""   # fin de bloc sans retour à la ligne
+
+    def feed(self, chunk: bytes) -> list[str]:
+        data = self._pending + chunk
+        cut = max(data.rfind(b"\n"), data.rfind(b"\r")) + 1
+        self._pending = data[cut:]
+        return self._lines(data[:cut]) if cut else []
+
+    def finish(self) -> list[str]:
+        data, self._pending = self._pending, b""
+        return self._lines(data) if data else []
+
+    def _lines(self, data: bytes) -> list[str]:
+        if self._strip:
+            data = ANSI_RE.sub(b"", data)
+        text = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n").decode(errors="replace")
+        return [line for line in (raw.rstrip() for raw in text.split("\n")) if line]
+
+
+def streams(fds: dict, interval: float = FLUSH_INTERVAL, strip_ansi: bool = True):
+    """Itère sur les trames {nom: lignes} lues sur plusieurs fds ({fd: nom})
+    jusqu'à EOF de tous. Une trame regroupe les lignes de tous les fds.
+
+    `interval` à 0 : une trame par lecture, sans attente (flux déjà tramé).
+    """
+    names = dict(fds)
+    splitters = {fd: Splitter(strip_ansi) for fd in names}
+    frame: dict = {}
+    count = 0
+    deadline = None
+    while names:
+        timeout = max(deadline - time.monotonic(), 0) if count and interval else None
+        ready, _, _ = select.select(list(names), [], [], timeout)
+        if not ready:
+            yield frame
+            frame, count, deadline = {}, 0, None
+            continue
+        for fd in ready:
+            chunk = os.read(fd, CHUNK_SIZE)
+            if chunk:
+                lines = splitters[fd].feed(chunk)
+            else:
+                lines = splitters.pop(fd).finish()
+            if lines:
+                frame.setdefault(names[fd], []).extend(lines)
+                count += len(lines)
+            if not chunk:
+                del names[fd]
+        if not count:
+            continue
+        if not interval or count >= MAX_FRAME_LINES or not names:
+            yield frame
+            frame, count, deadline = {}, 0, None
+        elif deadline is None:
+            deadline = time.monotonic() + interval
+
+
+def batches(fd: int, interval: float = FLUSH_INTERVAL, strip_ansi: bool = True):
+    """Itère sur les trames (listes de lignes non vides) lues sur `fd` jusqu'à EOF."""
+    for frame in streams({fd: None}, interval, strip_ansi):
+        yield frame[None]
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Superviseur de l'installation
+Lancé par app.py (launch()) dans une unité systemd transitoire, hors du
+cgroup du portail : un crash ou un redémarrage du portail (Restart=on-failure)
+n'interrompt pas l'installation.
+
+Le superviseur lance setup.py, lit ses messages (ipc.py) et écrit :
+  - le journal de progression (logstore.ProgressLog, persistant) ;
+  - l'état public de l'installation (STATE_PATH, tmpfs) : statut, infos
+    affichées par /progress (sans secret), dernière estimation du temps
+    restant ;
+  - le rapport d'installation et la table des durées (eta.py).
+Le portail ne fait que lire le journal et l'état : il peut redémarrer, se
+rattacher et rejouer l'historique à tout moment.
+
+Une seule installation à la fois : le superviseur garde un verrou (flock sur
+LOCK_PATH) toute sa vie ; un verrou libre alors que l'état dit "running"
+signale un superviseur mort.
+
+Statuts : starting (écrit par le portail) → running → done.
+
+Usage :
+  runner.py <config.json>
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import bootlog
+import eta
+import ipc
+import logstore
+import relay
+from logstore import ProgressLog
+
+APP_DIR      = os.path.dirname(os.path.abspath(__file__))
+SETUP_SCRIPT = os.path.join(APP_DIR, "setup.py")
+UNIT         = "tipi-install"
+
+# ---------------------------------------------------------------------------
+# Racine du système de fichiers — TIPI_ROOT pointe vers une racine jetable
+# quand l'installation tourne dans le simulateur (bench/sim.py)
+# ---------------------------------------------------------------------------
+ROOT = os.environ.get("TIPI_ROOT", "/")
+
+
+def rooted(path: str) -> str:
+    return os.path.join(ROOT, path.lstrip("/"))
+
+
+CONFIG_PATH         = rooted("/tmp/tipi-config.json")   # supprimé par setup.py dès lecture
+PROGRESS_LOG_PATH   = rooted("/var/lib/tipi-setup/progress.jsonl")
+INSTALL_REPORT_PATH = rooted("/boot/firmware/tipi-install-report.json")
+STATE_PATH          = rooted("/run/tipi-setup/install-state.json")
+LOCK_PATH           = rooted("/run/tipi-setup/install.lock")
+# Durées passées des étapes (estimation du temps restant), mises à jour après
+# chaque installation ; table livrée avec l'image en repli
+ETA_TABLE_PATH      = rooted("/var/lib/tipi-setup/step-durations.json")
+# Journal de reprise de setup.py (checkpoint.py) : empreintes des secrets,
+# inutile une fois l'installation réussie
+JOURNAL_PATH        = rooted("/var/lib/tipi-setup/checkpoints.json")
+ETA_SNAPSHOT_EVERY  = 2      # période de publication de l'estimation dans l'état (s)
+# Délai laissé au superviseur pour prendre le verrou après launch() (s) ;
+# au-delà, un verrou libre signale un superviseur mort au démarrage
+START_GRACE         = 15
+# Champs de la config recopiés dans l'état (affichage de /progress)
+PUBLIC_FIELDS       = ("hostname", "ssh_port", "static_ip", "lang")
+
+# Type de message (ipc.py) → niveau de l'entrée affichée
+_MESSAGE_LEVELS = {"step": "step", "done": "success", "error": "error", "log": "log"}
+
+
+# ---------------------------------------------------------------------------
+# État public
+# ---------------------------------------------------------------------------
+_state_lock = threading.Lock()
+
+
+def read_state() -> dict:
+    """État de l'installation ({} si aucune n'a été lancée depuis le démarrage)."""
+    try:
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_state(state: dict):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp = f"{STATE_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, STATE_PATH)
+
+
+def _update_state(**fields):
+    with _state_lock:
+        _write_state({**read_state(), **fields})
+
+
+def alive() -> bool:
+    """True si un superviseur tient le verrou d'installation."""
+    try:
+        fd = os.open(LOCK_PATH, os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        return False
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+
+
+def finished() -> bool:
+    """Installation terminée — ou superviseur mort en cours de route, ou
+    jamais démarré (verrou toujours libre START_GRACE s après launch())."""
+    state = read_state()
+    status = state.get("status")
+    if not status:
+        return False
+    if status == "done":
+        return True
+    if alive():
+        return False
+    return status != "starting" or time.time() - state.get("started_at", 0) > START_GRACE
+
+
+def can_launch() -> bool:
+    """Aucune installation depuis le démarrage, ou superviseur mort avant
+    d'avoir lancé setup.py : une nouvelle soumission peut (re)lancer."""
+    state = read_state()
+    return not state or (state.get("status") == "starting" and finished())
+
+
+# ---------------------------------------------------------------------------
+# Lancement (côté portail)
+# ---------------------------------------------------------------------------
+
+def _systemd() -> bool:
+    # Simulateur : pas de systemd sur la racine jetable, simple processus détaché
+    return ROOT == "/" and os.path.isdir("/run/systemd/system") and shutil.which("systemd-run") is not None
+
+
+def launch(config: dict):
+    """Écrit la config (secrets compris, mode 600) et démarre le superviseur
+    dans sa propre unité. Lève OSError si le lancement a échoué."""
+    os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True)
+    fd = os.open(CONFIG_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(config, f)
+    # Journal d'une tentative précédente (redémarrage ou coupure en cours
+    # d'installation) : jamais montré comme celui de la nouvelle
+    logstore.remove(PROGRESS_LOG_PATH)
+    _write_state({"status": "starting", "started_at": time.time(),
+                  **{k: config.get(k, "") for k in PUBLIC_FIELDS}})
+    cmd = [sys.executable, os.path.abspath(__file__), CONFIG_PATH]
+    try:
+        if _systemd():
+            r = subprocess.run(
+                ["systemd-run", f"--unit={UNIT}", "--collect", "--quiet",
+                 "-p", f"StandardOutput=append:{bootlog.BUFFER_PATH}",
+                 "-p", f"StandardError=append:{bootlog.BUFFER_PATH}",
+                 *cmd],
+                capture_output=True, text=True,
+            )
+            if r.returncode != 0:
+                raise OSError(r.stderr.strip() or f"systemd-run : code {r.returncode}")
+        else:
+            subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, start_new_session=True)
+    except OSError:
+        os.remove(STATE_PATH)
+        raise
+
+
+# ---------------------------------------------------------------------------
+# Rapport et estimation
+# ---------------------------------------------------------------------------
+
+def _record_timing(report: dict, ev: dict) -> dict | None:
+    """Intègre un message "timing" au rapport d'installation.
+
+    Retourne les champs d'une entrée "timing" à afficher (début/fin d'étape),
+    ou None pour les événements de sous-commande.
+    """
+    kind = ev.get("event", "")
+    steps = report["steps"]
+    if kind == "plan":
+        for name in ev.get("steps", []):
+            steps.setdefault(name, {"status": "pending", "commands": []})
+    elif kind == "start":
+        info = steps.setdefault(ev.get("step"), {"commands": []})
+        info.update(status="running", start=ev.get("t"))
+        return {"event": "start", "step": ev.get("step")}
+    elif kind == "end":
+        info = steps.setdefault(ev.get("step"), {"commands": []})
+        info.update(status=ev.get("status"), end=ev.get("t"), duration=ev.get("duration"))
+        return {"event": "end", "step": ev.get("step"), "elapsed": ev.get("duration")}
+    elif kind == "skip":
+        steps.setdefault(ev.get("step"), {"commands": []})["status"] = "skipped"
+    elif kind == "cached":
+        steps.setdefault(ev.get("step"), {"commands": []}).update(status="cached", how=ev.get("how"))
+    elif kind.endswith("_end") and ev.get("step") in steps:
+        cmd = {k: v for k, v in ev.items() if k not in ("event", "step", "t")}
+        cmd["kind"] = kind[:-len("_end")]
+        cmd["end"] = ev.get("t")
+        steps[ev["step"]]["commands"].append(cmd)
+    return None
+
+
+def _write_install_report(report: dict):
+    """Écrit le rapport JSON sur la partition boot (lisible depuis n'importe quel OS)."""
+    try:
+        with open("/proc/device-tree/model") as f:
+            report["device"] = f.read().strip("\x00\n ")
+    except OSError:
+        pass
+    report["kernel"] = os.uname().release
+    tmp = INSTALL_REPORT_PATH + ".tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp, INSTALL_REPORT_PATH)
+    except Exception:
+        pass
+
+
+class _Eta:
+    """Estimator partagé entre la lecture des messages et la publication périodique."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estimator = eta.Estimator(eta.load_expected(ETA_TABLE_PATH, eta.SEED_TABLE))
+
+    def timing(self, ev: dict):
+        kind = ev.get("event")
+        with self._lock:
+            if kind == "plan":
+                self._estimator.plan(ev.get("steps", []), ev.get("after"))
+            elif kind == "start":
+                self._estimator.start(ev.get("step"), ev.get("t") or time.time())
+            elif kind in ("end", "skip", "cached"):
+                self._estimator.finish(ev.get("step"))
+
+    def progress(self, ev: dict, t: float):
+        with self._lock:
+            self._estimator.progress(ev.get("step"), ev, t)
+
+    def publish(self, stop: threading.Event):
+        while not stop.wait(ETA_SNAPSHOT_EVERY):
+            now = time.time()
+            with self._lock:
+                remaining = self._estimator.remaining(now)
+            if remaining is not None:
+                _update_state(eta={"remaining": round(remaining, 1), "t": round(now, 3)})
+
+
+# ---------------------------------------------------------------------------
+# Supervision
+# ---------------------------------------------------------------------------
+
+def _entry(level: str, ts: float, key: str | None = None, params: dict | None = None, **extra) -> dict:
+    if key is None:
+        return {"msg": extra.pop("msg", ""), "level": level, "ts": ts, **extra}
+    return {"msg": "", "level": level, "ts": ts, "key": key, "params": params or {}, **extra}
+
+
+def _run_setup(config_path: str, log: ProgressLog, estimate: _Eta) -> tuple[int | None, str | None]:
+    """Lance setup.py et relaie ses messages ; retourne (code retour, IP finale)."""
+    # Canal des messages (ipc.py) séparé de stdout : une sortie de commande
+    # ne peut pas passer pour un message
+    ipc_r, ipc_w = os.pipe()
+    try:
+        process = subprocess.Popen(
+            [sys.executable, SETUP_SCRIPT, config_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            pass_fds=(ipc_w,),
+            env={**os.environ, ipc.ENV_FD: str(ipc_w)},
+        )
+    except Exception as e:
+        os.close(ipc_r)
+        log.append(_entry("error", time.time(), "setup_launch_error", {"e": str(e)}))
+        return None, None
+    finally:
+        os.close(ipc_w)
+
+    report = {"version": 1, "started_at": time.time(), "steps": {}}
+    final_ip = None
+    # setup.py écrit déjà par trames : chaque lecture est ajoutée telle quelle
+    # au journal, en un seul ajout
+    for frame in relay.streams({process.stdout.fileno(): "raw", ipc_r: "ipc"},
+                               interval=0, strip_ansi=False):
+        ts = round(time.time(), 3)
+        entries = [_entry("log", ts, msg=line) for line in frame.get("raw", ())]
+        for line in frame.get("ipc", ()):
+            msgs = ipc.decode(line)
+            if msgs is None:
+                entries.append(_entry("log", ts, msg=line))
+                continue
+            for msg in msgs:
+                kind = msg.get("type")
+                ev = {k: v for k, v in msg.items() if k != "type"}
+                if kind in _MESSAGE_LEVELS:
+                    entries.append(_entry(_MESSAGE_LEVELS[kind], ts, ev.get("key", ""), ev.get("params")))
+                elif kind == "output":
+                    entries.extend(_entry("log", ts, msg=text) for text in ev.get("lines", ()))
+                elif kind == "timing":
+                    shown = _record_timing(report, ev)
+                    estimate.timing(ev)
+                    if shown:
+                        entries.append(_entry("timing", ts, msg=shown["step"], **shown))
+                elif kind == "progress":
+                    entries.append(_entry("progress", ts, **ev))
+                    estimate.progress(ev, ts)
+                elif kind == "result":
+                    final_ip = ev.get("ip") or final_ip
+        if entries:
+            log.extend(entries)
+
+    os.close(ipc_r)
+    process.stdout.close()
+    process.wait()
+
+    report["finished_at"] = time.time()
+    report["duration"]    = round(report["finished_at"] - report["started_at"], 3)
+    report["returncode"]  = process.returncode
+    # Flag déposé par setup.py (Runtipi, internet) : durées des tentatives
+    # ratées hors de la table
+    report["install_failed"] = bootlog.exists("tipi-install-failed.flag")
+    _write_install_report(report)
+    if process.returncode == 0:
+        try:
+            eta.update_table(ETA_TABLE_PATH, report)
+        except OSError:
+            pass
+    return process.returncode, final_ip
+
+
+def _cleanup(returncode: int):
+    # On désactive le service (ne se relancera plus au prochain boot)
+    subprocess.run(["systemctl", "disable", "tipi-setup.service"], capture_output=True)
+    # Arrêter hostapd/dnsmasq si toujours actifs (cas sans WiFi configuré)
+    subprocess.run(["pkill", "-f", "tipi-hostapd.conf"], capture_output=True)
+    subprocess.run(["pkill", "-f", "tipi-dnsmasq"], capture_output=True)
+    try:
+        os.remove(rooted("/var/lib/tipi-setup/.not-configured"))
+    except FileNotFoundError:
+        pass
+    # Le journal ne sert qu'à la reprise (retry-runtipi.sh, flag d'échec)
+    if returncode == 0 and not bootlog.exists("tipi-install-failed.flag"):
+        try:
+            os.remove(JOURNAL_PATH)
+        except FileNotFoundError:
+            pass
+
+
+def supervise(config_path: str) -> int:
+    os.makedirs(os.path.dirname(LOCK_PATH), exist_ok=True)
+    lock = os.open(LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return 0   # une installation tourne déjà
+
+    log = None
+    returncode = None
+    stop = threading.Event()
+    # Tout échec après le verrou (config illisible, journal impossible à
+    # créer…) finit en statut "done" : le portail ne l'attend pas
+    try:
+        with open(config_path) as f:
+            config = json.load(f)
+        log = ProgressLog(PROGRESS_LOG_PATH)
+        _update_state(status="running", pid=os.getpid())
+        estimate = _Eta()
+        threading.Thread(target=estimate.publish, args=(stop,), daemon=True).start()
+
+        log.append(_entry("step", time.time(), "setup_starting"))
+        returncode, final_ip = _run_setup(config_path, log, estimate)
+        if returncode is not None:
+            _cleanup(returncode)
+        if returncode == 0:
+            log.append(_entry("final", time.time(), "setup_complete", ip=final_ip,
+                              hostname=config.get("hostname", "runtipios"),
+                              ssh_port=config.get("ssh_port", "22")))
+        elif returncode is not None:
+            log.append(_entry("error", time.time(), "setup_error"))
+    except Exception as e:
+        print(f"[tipi-setup] superviseur : {e}", file=sys.stderr, flush=True)
+        try:
+            if log is None:
+                log = ProgressLog(PROGRESS_LOG_PATH)
+            log.append(_entry("error", time.time(), msg=f"Erreur inattendue du superviseur : {e}"))
+        except OSError:
+            pass
+    finally:
+        stop.set()
+        if log is not None:
+            log.close()
+        _update_state(status="done", returncode=returncode, eta=None)
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        raise SystemExit("usage : runner.py <config.json>")
+    sys.exit(supervise(sys.argv[1]))
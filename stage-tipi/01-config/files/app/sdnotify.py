@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Notifications systemd (sd_notify) et chronologie du démarrage
+Utilisé par server.py (portail prêt, watchdog, arrêt).
+
+tipi-setup.service est de type `notify` : systemd ne considère le service
+démarré qu'au READY=1 envoyé une fois le port 8080 en écoute, et le
+redémarre si le watchdog (WatchdogSec) n'est plus nourri. start.sh lance le
+portail par `exec` : c'est le PID principal du service, seul autorisé à
+notifier (NotifyAccess=main, défaut de systemd).
+
+Hors systemd (pas de NOTIFY_SOCKET : simulateur bench/, lancement manuel),
+tout est sans effet.
+
+timeline() écrit dans le log la même ligne que la fonction timeline de
+start.sh — « [tipi-setup] timeline <phase> <uptime>s » — relue par
+bench/boottime.py pour suivre le délai mise sous tension → portail.
+"""
+
+import os
+import socket
+import time
+
+
+def notify(*fields: str) -> bool:
+    """Envoie `READY=1`, `WATCHDOG=1`, `STATUS=…`… à systemd ; False hors systemd."""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]   # socket de l'espace de noms abstrait
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto("\n".join(fields).encode(), address)
+        return True
+    except OSError:
+        return False
+
+
+def watchdog_interval() -> float | None:
+    """Période de ping du watchdog (moitié de WatchdogSec), None si inactif."""
+    usec = os.environ.get("WATCHDOG_USEC")
+    pid = os.environ.get("WATCHDOG_PID")
+    if not usec or (pid and pid != str(os.getpid())):
+        return None
+    try:
+        return int(usec) / 2e6
+    except ValueError:
+        return None
+
+
+class Watchdog:
+    """Ping WATCHDOG=1 au plus toutes les `watchdog_interval()` secondes.
+
+    `ping()` est appelé depuis la boucle d'acceptation du serveur : si elle
+    se fige, systemd ne reçoit plus rien et redémarre le service.
+    """
+
+    def __init__(self):
+        self.interval = watchdog_interval()
+        self._last = 0.0
+
+    def ping(self):
+        if self.interval is None:
+            return
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            notify("WATCHDOG=1")
+
+
+# ---------------------------------------------------------------------------
+# Chronologie du démarrage
+# ---------------------------------------------------------------------------
+def uptime() -> float:
+    """Secondes depuis le démarrage du noyau (/proc/uptime)."""
+    try:
+        with open("/proc/uptime") as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return time.monotonic()
+
+
+def timeline(phase: str) -> float:
+    up = uptime()
+    print(f"[tipi-setup] timeline {phase} {up:.2f}s", flush=True)
+    return up
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+RuntipiOS — Serveur HTTP du portail
+Utilisé par app.py à la place du serveur de développement Flask.
+
+Serveur WSGI (werkzeug, déjà présent avec Flask) à pool de threads borné :
+  - WORKERS threads servent toutes les connexions ; au-delà, réponse 503
+    immédiate plutôt qu'un thread de plus (les sondes captives des clients du
+    hotspot ne peuvent plus faire gonfler le processus) ;
+  - HTTP/1.1 (réponses chunked pour le SSE) ; une connexion muette est
+    fermée après REQUEST_TIMEOUT. werkzeug ferme la connexion après chaque
+    réponse (il vide le corps de requête en lisant la socket) : pas de
+    keep-alive, mais un client lent ne bloque jamais un thread longtemps ;
+  - SIGTERM / SIGINT : arrêt des acceptations, requêtes en cours terminées
+    pendant au plus SHUTDOWN_GRACE secondes, puis sortie ;
+  - systemd (sdnotify) : READY=1 dès le port en écoute, WATCHDOG=1 depuis la
+    boucle d'acceptation, STOPPING=1 au signal d'arrêt.
+Les flux longs (SSE, long-poll) sont bornés côté app.py pour libérer les
+threads régulièrement.
+"""
+
+import queue
+import signal
+import threading
+import time
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+import sdnotify
+
+WORKERS           = 24   # connexions servies simultanément
+REQUEST_TIMEOUT   = 5    # lecture de la requête, connexion muette (s)
+SHUTDOWN_GRACE    = 5    # attente max des requêtes en cours à l'arrêt (s)
+
+_BUSY_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Retry-After: 1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+)
+
+
+class _Handler(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = REQUEST_TIMEOUT
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Serveur WSGI dont chaque connexion est confiée à un pool de threads fixe."""
+
+    multithread = True
+
+    def __init__(self, host: str, port: int, app, workers: int = WORKERS):
+        super().__init__(host, port, app, handler=_Handler)
+        self._queue: queue.Queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._active = 0
+        self._idle = threading.Condition()
+        self._watchdog = sdnotify.Watchdog()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"http-{i}", daemon=True).start()
+
+    def service_actions(self):
+        # Appelé par serve_forever à chaque tour de boucle (≤ 0,5 s)
+        self._watchdog.ping()
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.sendall(_BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        with self._idle:
+            self._active += 1
+        self._queue.put((request, client_address))
+
+    def _worker(self):
+        while True:
+            request, client_address = self._queue.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self._slots.release()
+                with self._idle:
+                    self._active -= 1
+                    self._idle.notify_all()
+
+    def drain(self, grace: float) -> bool:
+        """Attend la fin des connexions en cours ; True si toutes ont fini."""
+        deadline = time.monotonic() + grace
+        with self._idle:
+            while self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+
+def serve(app, host: str = "0.0.0.0", port: int = 8080, workers: int = WORKERS,
+          on_shutdown=None):
+    """Sert `app` jusqu'à SIGTERM/SIGINT, puis s'arrête proprement.
+
+    `on_shutdown()` est appelé dès le signal reçu (ex. fermer les flux SSE).
+    """
+    server = PooledWSGIServer(host, port, app, workers)
+
+    def _stop(signum, frame):
+        sdnotify.notify("STOPPING=1")
+        if on_shutdown:
+            on_shutdown()
+        # shutdown() attend la fin de serve_forever : hors du thread principal
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    # Le constructeur a fait bind() + listen() : les connexions sont déjà acceptées
+    print(f" * Portail sur http://{host}:{port} ({workers} connexions max)", flush=True)
+    sdnotify.timeline("portal-ready")
+    sdnotify.notify("READY=1", f"STATUS=Portail en écoute sur le port {port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        server.drain(SHUTDOWN_GRACE)
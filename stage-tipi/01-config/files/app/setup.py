@@ -1,31 +1,54 @@
 #!/usr/bin/env python3
 """
 RuntipiOS — Script d'installation système
-Lancé par app.py via subprocess. Toutes les sorties sont capturées et
-relayées en temps réel vers le portail web.
-
-Protocole de sortie :
-  TIPI_STEP:<message>   → étape en cours (badge coloré)
-  TIPI_DONE:<message>   → étape réussie (badge vert)
-  TIPI_ERROR:<message>  → erreur non fatale (badge rouge)
-  TIPI_IP:<adresse>     → IP finale de Runtipi
-  <autre>               → log brut (affiché en gris)
+Lancé par runner.py (superviseur de l'installation) via subprocess. Toutes
+les sorties sont capturées et relayées en temps réel vers le portail web.
+
+Protocole : trames JSON de messages typés (ipc.py) sur le fd TIPI_IPC_FD
+passé par le superviseur, ou sur stdout lancé à la main :
+  step / done / error / log  → étape en cours, réussie, erreur non fatale, log
+                               (clé de traduction + paramètres)
+  output                     → lignes relayées d'une commande
+  timing                     → mesure de temps (plan, start/end/skip d'étape, cmd_start/cmd_end)
+  progress                   → progression agrégée d'apt (%, paquets) ou des pulls Docker (octets)
+  result                     → IP finale de Runtipi
+Tout ce qui arrive sur stdout hors trames est affiché comme log brut.
+
+La sortie ligne à ligne d'apt-get et les lignes de couche Docker ne passent
+pas par le portail : elles vont dans le journal brut (RAW_LOG_PATH).
+
+Usage :
+  setup.py <config.json>   installation complète (lancée par runner.py)
+  setup.py --resume        reprise depuis le journal (retry-runtipi.sh) : les
+                           étapes déjà faites sont sautées
 """
 
+import hashlib
 import json
 import os
 import pwd
+import random
 import re
+import socket
 import subprocess
 import sys
+import tarfile
 import time
+from collections import deque
+
+import bootlog
+import dockerapi
+import netwait
+from checkpoint import Journal
+import ifwait
+import ipc
+from netstate import get_state as get_netstate
+import pipeline
+import progress
+import relay
+from pipeline import Step, emit, emit_lines, emit_progress, run_steps, timing
+from i18n import Catalog, get_t
 
-from translations import get_t
-
-# ---------------------------------------------------------------------------
-# Nettoyage des codes ANSI (couleurs terminal) dans les sorties subprocess
-# ---------------------------------------------------------------------------
-_ANSI_RE = re.compile(r'\x1b\[[0-9;]*[mGKHFABCDJr]')
 _EXCLUDED_PREFIXES = ("10.42.", "169.254.")
 
 # ---------------------------------------------------------------------------
@@ -37,40 +60,104 @@ _DOCKER_FATAL_RE = re.compile(
 )
 
 # ---------------------------------------------------------------------------
-# Traductions — initialisées dans main() après lecture de la config
+# Racine du système de fichiers — TIPI_ROOT pointe vers une racine jetable
+# quand le pipeline tourne dans le simulateur (bench/sim.py)
 # ---------------------------------------------------------------------------
-T: dict = {}
+ROOT = os.environ.get("TIPI_ROOT", "/")
+
+
+def rooted(path: str) -> str:
+    return os.path.join(ROOT, path.lstrip("/"))
+
+
+# Sortie texte complète d'apt-get et de l'installateur Runtipi (le portail
+# n'en reçoit que la progression agrégée)
+RAW_LOG_PATH = rooted("/var/lib/tipi-setup/commands.log")
 
 # ---------------------------------------------------------------------------
-# Helpers de log
+# Traductions — initialisées dans main() après lecture de la config ; seuls
+# les fichiers écrits par setup.py (erreur WiFi) en ont besoin, le portail
+# traduit lui-même les messages
 # ---------------------------------------------------------------------------
+T: Catalog = Catalog({}, {})   # vide (clés brutes) jusqu'à main()
 
-def step(msg: str):  print(f"TIPI_STEP:{msg}",  flush=True)
-def done(msg: str):  print(f"TIPI_DONE:{msg}",  flush=True)
-def err(msg: str):   print(f"TIPI_ERROR:{msg}", flush=True)
-def out(msg: str):   print(msg,                 flush=True)
-
+# ---------------------------------------------------------------------------
+# Helpers de log
+# ---------------------------------------------------------------------------
 
-def run_cmd(cmd: list, env=None, check=True) -> subprocess.CompletedProcess:
-    """Exécute une commande et streame sa sortie ligne par ligne."""
-    proc = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        env=env,
-    )
-    for line in iter(proc.stdout.readline, ""):
-        line = line.rstrip()
-        if line:
-            out(line)
-    proc.wait()
+# Messages traduits par le portail, dans la langue de chaque lecteur :
+# clé de translations.py + paramètres (ipc.ref() pour un paramètre traduit)
+def step(key: str, **params):  emit({"type": "step",  "key": key, "params": params})
+def done(key: str, **params):  emit({"type": "done",  "key": key, "params": params})
+def err(key: str, **params):   emit({"type": "error", "key": key, "params": params})
+def out(key: str, **params):   emit({"type": "log",   "key": key, "params": params})
+
+
+def run_cmd(cmd: list, env=None, check=True, cwd=None) -> subprocess.CompletedProcess:
+    """Exécute une commande et streame sa sortie par trames (relay)."""
+    with timing("cmd", " ".join(cmd[:2])) as result:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            env=env,
+            cwd=cwd,
+        )
+        for lines in relay.batches(proc.stdout.fileno()):
+            emit_lines(lines)
+        proc.stdout.close()
+        proc.wait()
+        result["rc"] = proc.returncode
     if check and proc.returncode != 0:
         raise subprocess.CalledProcessError(proc.returncode, cmd)
     return proc
 
 
+def _open_raw_log(cmd: list):
+    os.makedirs(os.path.dirname(RAW_LOG_PATH), exist_ok=True)
+    raw = open(RAW_LOG_PATH, "a", encoding="utf-8")
+    raw.write(f"$ {' '.join(cmd)}\n")
+    return raw
+
+
+def run_apt(args: list) -> int:
+    """apt-get avec APT::Status-Fd : texte vers le journal brut, progression
+    (message "progress") et erreurs vers le portail. Retourne le code de sortie."""
+    # Sortie en anglais quelle que soit la locale choisie : résumé analysable
+    env = {**os.environ, "DEBIAN_FRONTEND": "noninteractive", "LC_ALL": "C.UTF-8"}
+    status_r, status_w = os.pipe()
+    cmd = ["apt-get", *args, "-o", f"APT::Status-Fd={status_w}"]
+    apt = progress.AptProgress()
+    try:
+        with timing("cmd", " ".join(cmd[:2])) as result, _open_raw_log(cmd) as raw:
+            try:
+                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        bufsize=0, env=env, pass_fds=(status_w,))
+            finally:
+                os.close(status_w)
+            for frame in relay.streams({proc.stdout.fileno(): "out", status_r: "status"}):
+                shown = []
+                if "out" in frame:
+                    raw.write("".join(line + "\n" for line in frame["out"]))
+                    shown += apt.feed_output(frame["out"])
+                for line in frame.get("status", ()):
+                    error = apt.feed_status(line)
+                    if error:
+                        shown.append(error)
+                if shown:
+                    emit_lines(shown)
+                state = apt.event()
+                if state:
+                    emit_progress("apt", **state)
+            proc.stdout.close()
+            proc.wait()
+            result["rc"] = proc.returncode
+    finally:
+        os.close(status_r)
+    return proc.returncode
+
+
 def validate_ip(ip: str) -> bool:
     pattern = re.compile(r"^(\d{1,3}\.){3}\d{1,3}(/\d{1,2})?$")
     if not pattern.match(ip):
@@ -83,31 +170,31 @@ def validate_ip(ip: str) -> bool:
 # ---------------------------------------------------------------------------
 
 def configure_hostname(hostname: str):
-    step(T["hostname_step"])
+    step("hostname_step")
     subprocess.run(["hostnamectl", "set-hostname", hostname], check=True)
 
-    with open("/etc/hosts", "r") as f:
+    with open(rooted("/etc/hosts"), "r") as f:
         hosts = f.read()
     if "127.0.1.1" in hosts:
         hosts = re.sub(r"127\.0\.1\.1\s+\S+", f"127.0.1.1\t{hostname}", hosts)
     else:
         hosts += f"\n127.0.1.1\t{hostname}\n"
-    with open("/etc/hosts", "w") as f:
+    with open(rooted("/etc/hosts"), "w") as f:
         f.write(hosts)
 
-    done(T["hostname_done"].format(hostname=hostname))
+    done("hostname_done", hostname=hostname)
 
 
 def configure_timezone(timezone: str):
-    step(T["timezone_step"].format(timezone=timezone))
+    step("timezone_step", timezone=timezone)
     subprocess.run(["timedatectl", "set-timezone", timezone], check=True)
-    done(T["timezone_done"].format(timezone=timezone))
+    done("timezone_done", timezone=timezone)
 
 
 def configure_locale(locale: str):
-    step(T["locale_step"].format(locale=locale))
+    step("locale_step", locale=locale)
     try:
-        locale_gen_path = "/etc/locale.gen"
+        locale_gen_path = rooted("/etc/locale.gen")
         with open(locale_gen_path, "r") as f:
             content = f.read()
         content = content.replace(f"# {locale} ", f"{locale} ")
@@ -115,13 +202,13 @@ def configure_locale(locale: str):
             f.write(content)
         run_cmd(["locale-gen"])
         run_cmd(["update-locale", f"LANG={locale}"])
-        done(T["locale_done"].format(locale=locale))
+        done("locale_done", locale=locale)
     except Exception as e:
-        err(T["locale_err"].format(e=e))
+        err("locale_err", e=e)
 
 
 def create_user(username: str, password: str):
-    step(T["user_step"].format(username=username))
+    step("user_step", username=username)
 
     result = subprocess.run(["id", username], capture_output=True)
     if result.returncode != 0:
@@ -140,7 +227,7 @@ def create_user(username: str, password: str):
     if proc.returncode != 0:
         raise RuntimeError(f"chpasswd a échoué : {stderr.decode()}")
 
-    done(T["user_done"].format(username=username))
+    done("user_done", username=username)
 
 
 def remove_build_user(keep_username: str):
@@ -157,10 +244,10 @@ def remove_build_user(keep_username: str):
 def add_ssh_key(username: str, ssh_key: str):
     if not ssh_key:
         return
-    step(T["sshkey_step"])
+    step("sshkey_step")
     try:
         pw = pwd.getpwnam(username)
-        ssh_dir = f"/home/{username}/.ssh"
+        ssh_dir = rooted(f"/home/{username}/.ssh")
         auth_keys = f"{ssh_dir}/authorized_keys"
 
         os.makedirs(ssh_dir, mode=0o700, exist_ok=True)
@@ -169,15 +256,15 @@ def add_ssh_key(username: str, ssh_key: str):
         os.chmod(auth_keys, 0o600)
         os.chown(ssh_dir, pw.pw_uid, pw.pw_gid)
         os.chown(auth_keys, pw.pw_uid, pw.pw_gid)
-        done(T["sshkey_done"])
+        done("sshkey_done")
     except Exception as e:
-        err(T["sshkey_err"].format(e=e))
+        err("sshkey_err", e=e)
 
 
 def configure_ssh(ssh_port: str, disable_password_auth: bool, ssh_key: str):
-    step(T["ssh_step"].format(ssh_port=ssh_port))
+    step("ssh_step", ssh_port=ssh_port)
     try:
-        with open("/etc/ssh/sshd_config", "r") as f:
+        with open(rooted("/etc/ssh/sshd_config"), "r") as f:
             sshd = f.read()
 
         if re.search(r"^#?Port\s+\d+", sshd, re.MULTILINE):
@@ -195,31 +282,31 @@ def configure_ssh(ssh_port: str, disable_password_auth: bool, ssh_key: str):
 
         sshd = re.sub(r"^#?PermitRootLogin\s+[\w-]+", "PermitRootLogin no", sshd, flags=re.MULTILINE)
 
-        with open("/etc/ssh/sshd_config", "w") as f:
+        with open(rooted("/etc/ssh/sshd_config"), "w") as f:
             f.write(sshd)
 
         subprocess.run(["ssh-keygen", "-A"], check=False)
 
         test = subprocess.run(["sshd", "-t"], capture_output=True, text=True)
         if test.returncode != 0:
-            err(T["ssh_invalid"].format(stderr=test.stderr.strip()))
+            err("ssh_invalid", stderr=test.stderr.strip())
             return
 
         subprocess.run(["systemctl", "enable", "ssh"], check=True)
         subprocess.run(["systemctl", "restart", "ssh"], check=True)
-        done(T["ssh_done"].format(ssh_port=ssh_port))
+        done("ssh_done", ssh_port=ssh_port)
     except Exception as e:
-        err(T["ssh_err"].format(e=e))
+        err("ssh_err", e=e)
 
 
 def configure_static_ip(static_ip: str, static_gw: str, static_dns: str):
     if not static_ip or not static_gw:
         return
     if not validate_ip(static_ip) or not validate_ip(static_gw):
-        err(T["staticip_invalid"])
+        err("staticip_invalid")
         return
 
-    step(T["staticip_step"].format(static_ip=static_ip))
+    step("staticip_step", static_ip=static_ip)
     try:
         result = subprocess.run(
             ["nmcli", "-t", "-f", "NAME,DEVICE", "con", "show", "--active"],
@@ -236,7 +323,7 @@ def configure_static_ip(static_ip: str, static_gw: str, static_dns: str):
                 break
 
         if not eth_con:
-            err(T["staticip_nociface"])
+            err("staticip_nociface")
             return
 
         ip_cidr = static_ip if "/" in static_ip else f"{static_ip}/24"
@@ -245,56 +332,111 @@ def configure_static_ip(static_ip: str, static_gw: str, static_dns: str):
         subprocess.run(["nmcli", "con", "mod", eth_con, "ipv4.dns", static_dns], check=True)
         subprocess.run(["nmcli", "con", "mod", eth_con, "ipv4.method", "manual"], check=True)
         subprocess.run(["nmcli", "con", "up", eth_con], check=True)
-        done(T["staticip_done"].format(static_ip=static_ip))
+        done("staticip_done", static_ip=static_ip)
     except Exception as e:
-        err(T["staticip_err"].format(e=e))
+        err("staticip_err", e=e)
 
 
-def system_update():
-    step(T["update_step"])
-    env = {**os.environ, "DEBIAN_FRONTEND": "noninteractive"}
-    r = run_cmd(["apt-get", "update", "-y"], env=env, check=False)
-    if r.returncode != 0:
-        err(T["update_warn"].format(rc=r.returncode))
+def apt_update():
+    step("update_step")
+    rc = run_apt(["update", "-y"])
+    if rc != 0:
+        err("update_warn", rc=rc)
     else:
-        done(T["update_done"])
+        done("update_done")
 
-    step(T["upgrade_step"])
-    r = run_cmd([
-        "apt-get", "upgrade", "-y",
+
+def apt_upgrade():
+    step("upgrade_step")
+    rc = run_apt([
+        "upgrade", "-y",
         "-o", "Dpkg::Options::=--force-confdef",
         "-o", "Dpkg::Options::=--force-confold",
-    ], env=env, check=False)
-    if r.returncode != 0:
-        err(T["upgrade_warn"].format(rc=r.returncode))
+    ])
+    if rc != 0:
+        err("upgrade_warn", rc=rc)
     else:
-        done(T["upgrade_done"])
+        done("upgrade_done")
+
+
+# ---------------------------------------------------------------------------
+# Sondes « déjà fait » — une étape dont la sonde répond True est sautée
+# (et inscrite au journal). Elles ne forkent rien : fichiers et socket Docker.
+# ---------------------------------------------------------------------------
+
+def hostname_satisfied(hostname: str) -> bool:
+    with open(rooted("/etc/hosts")) as f:
+        hosts = f.read()
+    return socket.gethostname() == hostname and re.search(
+        rf"^127\.0\.1\.1\s+{re.escape(hostname)}\s*$", hosts, re.MULTILINE) is not None
+
+
+def timezone_satisfied(timezone: str) -> bool:
+    return os.path.realpath(rooted("/etc/localtime")).endswith("/zoneinfo/" + timezone)
+
+
+def locale_satisfied(locale: str) -> bool:
+    with open(rooted("/etc/locale.gen")) as f:
+        generated = re.search(rf"^{re.escape(locale)}\s", f.read(), re.MULTILINE)
+    with open(rooted("/etc/default/locale")) as f:
+        return bool(generated) and f"LANG={locale}" in f.read()
+
+
+def ssh_key_satisfied(username: str, ssh_key: str) -> bool:
+    if not ssh_key:
+        return False   # rien à faire : l'étape est muette
+    with open(rooted(f"/home/{username}/.ssh/authorized_keys")) as f:
+        return ssh_key.strip() in f.read().splitlines()
+
+
+def runtipi_satisfied() -> bool:
+    return all(dockerapi.container_state(n) in ("running", "healthy")
+               for n in dockerapi.RUNTIPI_CONTAINERS)
 
 
 def _write_wifi_error(ssid: str, msg: str):
-    """Write WiFi error to /boot/firmware so it's readable from any OS."""
+    """Write WiFi error to /boot/firmware so it's readable from any OS
+    (staged in tmpfs, copied by bootlog.py)."""
     try:
-        with open("/boot/firmware/tipi-wifi-error.txt", "w") as f:
-            f.write(f"RuntipiOS — WiFi connection error\n")
-            f.write(f"SSID : {ssid}\n")
-            f.write(f"Error: {msg}\n")
+        bootlog.put("tipi-wifi-error.txt",
+                    f"RuntipiOS — WiFi connection error\n"
+                    f"SSID : {ssid}\n"
+                    f"Error: {msg}\n")
     except Exception:
         pass
 
 
+def _wifi_failed(ssid: str, key: str, **params):
+    """Erreur WiFi : message vers le portail et fichier sur la partition boot."""
+    err(key, **params)
+    _write_wifi_error(ssid, T(key, **params))
+
+
+# Hotspot lancé par start.sh
+HOTSPOT_PIDFILES     = (rooted("/run/tipi-hostapd.pid"), rooted("/run/tipi-dnsmasq.pid"))
+WIFI_RELEASE_TIMEOUT = 5    # arrêt effectif de hostapd / dnsmasq (s)
+WIFI_MANAGED_TIMEOUT = 10   # reprise de wlan0 par NetworkManager (s)
+
+
 def connect_wifi(wifi_ssid: str, wifi_password: str):
-    """Connecte wlan0 au WiFi choisi — appelé EN DERNIER (coupe le hotspot)."""
+    """Connecte wlan0 au WiFi choisi — après toutes les étapes locales
+    (coupe le hotspot, donc le portail) ; seules l'IP fixe et les étapes
+    réseau viennent après."""
     if not wifi_ssid:
         return
-    step(T["wifi_step"].format(wifi_ssid=wifi_ssid))
+    step("wifi_step", wifi_ssid=wifi_ssid)
     try:
+        # pidfds ouverts avant pkill : on attend la fin réelle des processus
+        pidfds = [fd for fd in map(ifwait.open_pidfile, HOTSPOT_PIDFILES) if fd is not None]
         subprocess.run(["pkill", "-f", "tipi-hostapd.conf"], capture_output=True)
         subprocess.run(["pkill", "-f", "tipi-dnsmasq"], capture_output=True)
         subprocess.run(["pkill", "hostapd"], capture_output=True)
-        time.sleep(1)
+        ifwait.wait_exit(pidfds, WIFI_RELEASE_TIMEOUT)
         subprocess.run(["nmcli", "dev", "set", "wlan0", "managed", "yes"],
                        capture_output=True)
-        time.sleep(2)
+        # Prête dès que NetworkManager la déclare disponible ; au timeout,
+        # `nmcli con up` ci-dessous attend de toute façon l'activation
+        ifwait.wait_nm_state("wlan0", ("disconnected", "connected"), WIFI_MANAGED_TIMEOUT)
 
         subprocess.run(["nmcli", "con", "delete", "tipi-wifi"],
                        capture_output=True)
@@ -320,9 +462,7 @@ def connect_wifi(wifi_ssid: str, wifi_password: str):
 
         result = subprocess.run(add_cmd, capture_output=True, text=True)
         if result.returncode != 0:
-            msg = T["wifi_profile_err"].format(e=(result.stderr or result.stdout).strip())
-            err(msg)
-            _write_wifi_error(wifi_ssid, msg)
+            _wifi_failed(wifi_ssid, "wifi_profile_err", e=(result.stderr or result.stdout).strip())
             return
 
         result = subprocess.run(
@@ -330,131 +470,293 @@ def connect_wifi(wifi_ssid: str, wifi_password: str):
             capture_output=True, text=True, timeout=40,
         )
         if result.returncode == 0:
-            done(T["wifi_done"].format(wifi_ssid=wifi_ssid))
+            done("wifi_done", wifi_ssid=wifi_ssid)
         else:
-            msg = T["wifi_fail"].format(e=(result.stderr or result.stdout).strip())
-            err(msg)
-            _write_wifi_error(wifi_ssid, msg)
+            _wifi_failed(wifi_ssid, "wifi_fail", e=(result.stderr or result.stdout).strip())
     except subprocess.TimeoutExpired:
-        msg = T["wifi_timeout"]
-        err(msg)
-        _write_wifi_error(wifi_ssid, msg)
+        _wifi_failed(wifi_ssid, "wifi_timeout")
     except Exception as e:
-        msg = T["wifi_err"].format(e=e)
-        err(msg)
-        _write_wifi_error(wifi_ssid, msg)
+        _wifi_failed(wifi_ssid, "wifi_err", e=e)
+
+
+def _wait_for_internet(max_wait: int = 60) -> bool:
+    step("internet_check")
+    ok, reason = netwait.wait_for_internet(
+        max_wait,
+        on_wait=lambda s, why: out("internet_wait", s=s, reason=why),
+    )
+    if ok:
+        done("internet_ok")
+        return True
+    err("internet_fail", s=max_wait, reason=reason)
+    return False
+
+
+# ---------------------------------------------------------------------------
+# Bundle hors ligne — écrit au build par 00-run.sh quand TIPI_OFFLINE=1 :
+#   manifest.json, install.sh (installateur épinglé), runtipi-cli.tar.gz,
+#   runtipi-images.tar.gz (docker save compressé)
+# ---------------------------------------------------------------------------
+OFFLINE_DIR = rooted("/opt/tipi-setup/offline")
 
 
-def _runtipi_service_running() -> bool:
-    """Vérifie que Runtipi tourne via Docker (pas de service systemd dédié)."""
+def offline_manifest() -> dict | None:
     try:
-        result = subprocess.run(
-            ["docker", "ps", "--filter", "name=runtipi", "--format", "{{.Names}}"],
-            capture_output=True, text=True, timeout=15,
-        )
-        return bool(result.stdout.strip())
-    except Exception:
-        return False
+        with open(os.path.join(OFFLINE_DIR, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
 
-def _wait_for_internet(max_wait: int = 60) -> bool:
-    step(T["internet_check"])
-    for i in range(max_wait):
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Installateur en ligne — téléchargé une fois, vérifié, mis en cache hors de
+# /opt/tipi-setup (supprimé au reboot) pour les tentatives suivantes et
+# retry-runtipi.sh. Le fichier .sha256 est au format `sha256sum -c`.
+# ---------------------------------------------------------------------------
+INSTALLER_URL   = "https://setup.runtipi.io"
+INSTALLER_CACHE = rooted("/var/lib/tipi-setup/runtipi-install.sh")
+
+
+class InstallFailure(Exception):
+    """Échec d'une tentative, avec sa classe (clé de RETRY_POLICY)."""
+
+    def __init__(self, cause: str, detail: str = ""):
+        super().__init__(detail or cause)
+        self.cause = cause
+
+
+def _cached_installer() -> str | None:
+    try:
+        with open(INSTALLER_CACHE + ".sha256") as f:
+            expected = f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+    if os.path.exists(INSTALLER_CACHE) and _sha256(INSTALLER_CACHE) == expected:
+        return INSTALLER_CACHE
+    return None
+
+
+def fetch_installer() -> str:
+    """Chemin du script d'installation, téléchargé seulement s'il n'est pas en cache."""
+    cached = _cached_installer()
+    if cached:
+        out("runtipi_installer_cached")
+        return cached
+    with timing("cmd", "curl installer") as result:
         r = subprocess.run(
-            ["getent", "hosts", "setup.runtipi.io"],
+            ["curl", "-fsSL", "--max-time", "120", INSTALLER_URL],
             capture_output=True,
         )
-        if r.returncode == 0:
-            done(T["internet_ok"])
-            return True
-        if i > 0 and i % 10 == 0:
-            out(f"{T['internet_wait'].format(s=i)}")
-        time.sleep(1)
-    err(T["internet_fail"])
-    return False
+        result["rc"] = r.returncode
+    if r.returncode != 0:
+        detail = r.stderr.decode(errors="replace").strip()
+        raise InstallFailure(_CURL_CAUSES.get(r.returncode) or classify_failure([detail]), detail)
+    # Un portail captif renvoie du HTML avec un code 200 : ne pas le mettre en cache
+    if not r.stdout.startswith(b"#!"):
+        raise InstallFailure("network", "unexpected installer content")
+    os.makedirs(os.path.dirname(INSTALLER_CACHE), exist_ok=True)
+    tmp = INSTALLER_CACHE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(r.stdout)
+    os.replace(tmp, INSTALLER_CACHE)
+    with open(INSTALLER_CACHE + ".sha256", "w") as f:
+        f.write(f"{hashlib.sha256(r.stdout).hexdigest()}  {INSTALLER_CACHE}\n")
+    return INSTALLER_CACHE
+
+
+def _installer_cmd(manifest: dict | None) -> list:
+    """Commande de l'installateur : script épinglé du bundle s'il est intact,
+    sinon le script en ligne (cache)."""
+    if manifest:
+        script = os.path.join(OFFLINE_DIR, manifest["installer"])
+        if os.path.exists(script) and _sha256(script) == manifest.get("installer_sha256"):
+            return ["bash", script, "--version", manifest["version"]]
+    return ["bash", fetch_installer()]
+
+
+# ---------------------------------------------------------------------------
+# Classes d'échec et politique de relance
+# ---------------------------------------------------------------------------
+_FAILURE_PATTERNS = (
+    ("disk",    re.compile(r"no space left on device", re.IGNORECASE)),
+    ("dns",     re.compile(r"could not resolve|name resolution|no such host|server misbehaving", re.IGNORECASE)),
+    ("tls",     re.compile(r"TLS handshake|SSL|certificate", re.IGNORECASE)),
+    ("denied",  re.compile(r"pull access denied|unauthorized", re.IGNORECASE)),
+    ("network", re.compile(r"timed? ?out|connection (reset|refused)|failed to (connect|copy)|"
+                           r"unexpected EOF|network is unreachable|toomanyrequests", re.IGNORECASE)),
+)
+
+# Codes retour de curl : 6 résolution, 7 connexion, 28 délai, 35/60 TLS,
+# 23 écriture locale, 52/56 réception
+_CURL_CAUSES = {6: "dns", 7: "network", 28: "network", 35: "tls", 60: "tls",
+                23: "disk", 52: "network", 56: "network"}
+
+# classe → (relancer ?, délai de base en s) ; délai 0 = relance immédiate,
+# sinon backoff exponentiel borné avec jitter
+RETRY_POLICY = {
+    "dns":       (True, 5),
+    "tls":       (True, 5),
+    "network":   (True, 5),
+    "not_ready": (True, 10),
+    "script":    (True, 0),
+    "disk":      (False, 0),   # relancer ne libérera pas d'espace
+    "denied":    (False, 0),
+}
+RETRY_MAX_DELAY = 60
+
+
+def classify_failure(lines) -> str:
+    """Classe d'échec d'après la sortie (la cause la plus spécifique gagne)."""
+    for cause, pattern in _FAILURE_PATTERNS:
+        if any(pattern.search(line) for line in lines):
+            return cause
+    return "script"
+
+
+def retry_delay(cause: str, attempt: int) -> float | None:
+    """Délai avant la tentative suivante, ou None s'il ne faut pas relancer."""
+    retry, base = RETRY_POLICY.get(cause, (True, 0))
+    if not retry:
+        return None
+    if not base:
+        return 0.0
+    delay = min(base * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+    return random.uniform(delay / 2, delay)
+
+
+def _wait_runtipi_ready() -> bool:
+    # Runtipi peut mettre jusqu'à 3 minutes pour démarrer ses containers
+    out("runtipi_check_start")
+    with timing("wait", "runtipi-ready") as result:
+        ready, states = dockerapi.wait_ready(
+            timeout=180,
+            on_change=lambda name, state: out("runtipi_container", name=name, state=state),
+        )
+        result["ready"] = ready
+    if not ready:
+        pending = [f"{n} ({s})" for n, s in states.items() if s not in ("running", "healthy")]
+        err("runtipi_inactive", containers=", ".join(pending) or "?")
+    return ready
+
+
+def install_runtipi_offline(manifest: dict) -> bool:
+    """Charge les images du bundle et démarre la pile sans aucun pull réseau."""
+    out("runtipi_offline", version=manifest["version"])
+    try:
+        if dockerapi.images_present(manifest.get("images", [])):
+            out("runtipi_images_present")
+        else:
+            run_cmd(["docker", "load", "-i", os.path.join(OFFLINE_DIR, manifest["images_archive"])])
+        runtipi_dir = rooted("/opt/runtipi")
+        os.makedirs(runtipi_dir, exist_ok=True)
+        with tarfile.open(os.path.join(OFFLINE_DIR, manifest["cli"])) as tar:
+            tar.extractall(runtipi_dir, filter="data")
+        cli = os.path.join(runtipi_dir, "runtipi-cli")
+        os.chmod(cli, 0o755)
+        # Images déjà présentes localement : compose ne tire rien (pull_policy « missing »)
+        run_cmd([cli, "start"], cwd=runtipi_dir)
+    except Exception as e:
+        err("runtipi_err", e=e)
+        return False
+    return _wait_runtipi_ready()
+
+
+def _run_installer(manifest: dict | None):
+    """Une tentative complète : installateur puis attente des containers.
+    Lève InstallFailure avec la classe de l'échec."""
+    installer = _installer_cmd(manifest)
+    with timing("cmd", "runtipi-installer") as result:
+        bash = subprocess.Popen(
+            installer,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            cwd=rooted("/opt"),  # convention Linux pour les logiciels tiers (cohérent avec le script Proxmox officiel)
+        )
+        tail = deque(maxlen=40)   # dernières lignes, pour classer un échec
+        docker_errors = []
+        pull = progress.DockerPull()
+        with _open_raw_log(installer) as raw:
+            for lines in relay.batches(bash.stdout.fileno()):
+                raw.write("".join(line + "\n" for line in lines))
+                # Lignes de couche : seulement l'état agrégé vers le portail
+                shown = [line for line in lines if not pull.feed(line)]
+                if shown:
+                    emit_lines(shown)
+                state = pull.event()
+                if state:
+                    emit_progress("docker", **state)
+                tail.extend(lines)
+                docker_errors.extend(line for line in lines if _DOCKER_FATAL_RE.search(line))
+        bash.stdout.close()
+        bash.wait()
+        result["rc"] = bash.returncode
+
+    if bash.returncode != 0:
+        err("runtipi_fail", code=bash.returncode)
+        raise InstallFailure(classify_failure(docker_errors or tail))
+
+    # bash a retourné 0, mais vérifier que les containers tournent vraiment
+    if not _wait_runtipi_ready():
+        raise InstallFailure(classify_failure(docker_errors) if docker_errors else "not_ready")
+
+    if docker_errors:
+        out("runtipi_docker_warn", n=len(docker_errors))
 
 
 def install_runtipi(max_attempts: int = 3) -> bool:
-    step(T["runtipi_step"])
+    step("runtipi_step")
+    manifest = offline_manifest()
+    if manifest:
+        if install_runtipi_offline(manifest):
+            done("runtipi_done")
+            return True
+        out("runtipi_offline_fail")
     for attempt in range(1, max_attempts + 1):
-        if attempt > 1:
-            out(T["runtipi_retry"].format(attempt=attempt, total=max_attempts))
-            time.sleep(30)
         try:
-            curl = subprocess.Popen(
-                ["curl", "-L", "--max-time", "120", "https://setup.runtipi.io"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-            bash = subprocess.Popen(
-                ["bash"],
-                stdin=curl.stdout,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                cwd="/opt",  # convention Linux pour les logiciels tiers (cohérent avec le script Proxmox officiel)
-            )
-            curl.stdout.close()
-
-            docker_errors = []
-            for line in iter(bash.stdout.readline, ""):
-                line = _ANSI_RE.sub("", line).rstrip()
-                if line:
-                    out(line)
-                    if _DOCKER_FATAL_RE.search(line):
-                        docker_errors.append(line)
-
-            bash.wait()
-            curl.wait()
-
-            if bash.returncode != 0:
-                err(T["runtipi_fail"].format(code=bash.returncode))
-                continue
-
-            # bash a retourné 0, mais vérifier que les containers tournent vraiment
-            # Runtipi peut mettre jusqu'à 3 minutes pour démarrer ses containers
-            out(T["runtipi_check_start"])
-            for _ in range(18):  # 18 × 10s = 3 minutes max
-                time.sleep(10)
-                if _runtipi_service_running():
-                    break
-            if not _runtipi_service_running():
-                err(T["runtipi_inactive"])
-                continue
-
-            if docker_errors:
-                out(T["runtipi_docker_warn"].format(n=len(docker_errors)))
-
-            done(T["runtipi_done"])
+            _run_installer(manifest)
+            done("runtipi_done")
             return True
-
+        except InstallFailure as e:
+            cause = e.cause
+            if str(e) != cause:
+                err("runtipi_err", e=e)
         except Exception as e:
-            err(T["runtipi_err"].format(e=e))
+            cause = "script"
+            err("runtipi_err", e=e)
+        if attempt == max_attempts:
+            break
+        delay = retry_delay(cause, attempt)
+        reason = ipc.ref("runtipi_cause_" + cause)
+        if delay is None:
+            err("runtipi_no_retry", cause=reason)
+            break
+        out("runtipi_retry", attempt=attempt + 1, total=max_attempts,
+            cause=reason, delay=round(delay))
+        time.sleep(delay)
 
     return False
 
 
 def get_final_ip(max_wait: int = 30) -> str | None:
-    for _ in range(max_wait):
-        for iface in ["eth0", "wlan0"]:
-            try:
-                r = subprocess.run(
-                    ["ip", "-4", "addr", "show", iface],
-                    capture_output=True, text=True,
-                )
-                m = re.search(r"inet\s+(\d+\.\d+\.\d+\.\d+)", r.stdout)
-                if m and not m.group(1).startswith(_EXCLUDED_PREFIXES):
-                    return m.group(1)
-            except Exception:
-                pass
-        time.sleep(1)
-    return None
+    """Attend (événements netlink) la première IP routable sur eth0/wlan0."""
+    return get_netstate().wait_for_ipv4(
+        ("eth0", "wlan0"), exclude=_EXCLUDED_PREFIXES, timeout=max_wait,
+    )
 
 
 def configure_cockpit(enabled: bool):
     if enabled:
-        step(T["cockpit_step"])
+        step("cockpit_step")
         # Le socket et le service sont masqués au build — il faut d'abord
         # lever le masque avant de pouvoir les activer.
         subprocess.run(["systemctl", "unmask", "cockpit.socket", "cockpit.service"],
@@ -462,41 +764,52 @@ def configure_cockpit(enabled: bool):
         r = subprocess.run(["systemctl", "enable", "--now", "cockpit.socket"],
                            capture_output=True, text=True)
         if r.returncode != 0:
-            err(f"Cockpit : activation échouée — {(r.stderr or r.stdout).strip()}")
+            err("cockpit_err", e=(r.stderr or r.stdout).strip())
         else:
-            done(T["cockpit_done"])
+            done("cockpit_done")
     else:
         r1 = subprocess.run(["systemctl", "disable", "--now", "cockpit.socket"],
                             capture_output=True, text=True)
         r2 = subprocess.run(["systemctl", "mask", "cockpit.socket", "cockpit.service"],
                             capture_output=True, text=True)
         if r1.returncode != 0 or r2.returncode != 0:
-            err("Cockpit : désactivation incomplète — vérifier manuellement")
+            err("cockpit_disable_warn")
 
 
 # ---------------------------------------------------------------------------
 # Point d'entrée
 # ---------------------------------------------------------------------------
 
+JOURNAL_PATH = rooted("/var/lib/tipi-setup/checkpoints.json")
+
+
 def main():
     global T
     if len(sys.argv) != 2:
-        print("Usage: setup.py <config.json>", file=sys.stderr)
+        print("Usage: setup.py <config.json> | --resume", file=sys.stderr)
         sys.exit(1)
 
-    config_path = sys.argv[1]
-    try:
-        with open(config_path) as f:
-            cfg = json.load(f)
-    except Exception as e:
-        # T pas encore initialisé ici, message en anglais par défaut
-        print(f"TIPI_ERROR:Cannot read configuration: {e}", flush=True)
-        sys.exit(1)
-    finally:
+    journal = Journal(JOURNAL_PATH)
+    resume = sys.argv[1] == "--resume"
+    if resume:
+        cfg = journal.config
+        if cfg is None:
+            err("resume_no_journal")
+            sys.exit(1)
+    else:
+        config_path = sys.argv[1]
         try:
-            os.remove(config_path)
-        except Exception:
-            pass
+            with open(config_path) as f:
+                cfg = json.load(f)
+        except Exception as e:
+            err("config_unreadable", e=e)
+            sys.exit(1)
+        finally:
+            try:
+                os.remove(config_path)
+            except Exception:
+                pass
+        journal.save_config(cfg)
 
     # Initialiser les traductions dès que la langue est connue
     T = get_t(cfg.get("lang", "en"))
@@ -516,47 +829,100 @@ def main():
     wifi_password         = cfg.get("wifi_password", "").strip()
     cockpit_enabled       = bool(cfg.get("cockpit_enabled", False))
 
+    # Les secrets ne sont jamais journalisés : les étapes qui en dépendent
+    # sont identifiées par leur empreinte (conservée pour --resume)
+    user_inputs = {"username": username, "password": journal.fingerprint(cfg, "password")}
+    wifi_inputs = {"ssid": wifi_ssid, "password": journal.fingerprint(cfg, "wifi_password")}
+
     # Validation minimale
-    if not username or not password:
-        err(T["config_missing"])
+    if resume:
+        step("resume_start")
+        for name, inputs, needed in (("user", user_inputs, True), ("wifi", wifi_inputs, bool(wifi_ssid))):
+            if needed and not journal.is_done(name, inputs):
+                err("resume_impossible", step=name)
+                sys.exit(1)
+    elif not username or not password:
+        err("config_missing")
         sys.exit(1)
 
-    # --- Pipeline d'installation ---
-    if wifi_ssid:
-        step("⚠️ " + T["wifi_hotspot_warn"])
-    configure_hostname(hostname)
-    configure_timezone(timezone)
-    configure_locale(locale)
-    create_user(username, password)
-    remove_build_user(username)
-    add_ssh_key(username, ssh_key)
-    configure_ssh(ssh_port, disable_password_auth, ssh_key)
-    connect_wifi(wifi_ssid, wifi_password)
-    configure_static_ip(static_ip, static_gw, static_dns)
-    if not _wait_for_internet():
-        try:
-            with open("/boot/firmware/tipi-install-failed.flag", "w") as f:
-                f.write("1")
-        except Exception:
-            pass
-        err(T["runtipi_retry_boot"].format(hostname=hostname))
-        done(T["config_done"])
-        return
-    system_update()
-    if not install_runtipi():
+    def _mark_install_failed():
+        # Déposé en tmpfs, recopié sur la partition boot par bootlog.py
         try:
-            with open("/boot/firmware/tipi-install-failed.flag", "w") as f:
-                f.write("1")
+            bootlog.put("tipi-install-failed.flag", "1")
         except Exception:
             pass
-        err(T["runtipi_retry_boot"].format(hostname=hostname))
+        err("runtipi_retry_boot", hostname=hostname)
+
+    # Bundle hors ligne : Runtipi démarre sans attendre internet ni apt
+    offline = offline_manifest() is not None
+
+    def internet():
+        if not _wait_for_internet():
+            if not offline:
+                _mark_install_failed()
+            return False
 
-    configure_cockpit(cockpit_enabled)
+    def runtipi():
+        if not install_runtipi():
+            _mark_install_failed()
+
+    # --- Pipeline d'installation ---
+    # Chaque étape ne dépend que de ce dont elle a réellement besoin : hostname,
+    # fuseau, locale-gen et comptes avancent en parallèle. La bascule WiFi puis
+    # l'IP fixe coupent le hotspot (et le portail) : elles attendent toutes les
+    # étapes locales, comme dans l'ordre séquentiel d'origine. L'upgrade attend
+    # la locale (triggers dpkg de `locales`) et SSH (conffiles sshd_config).
+    # Hors ligne, l'upgrade passe après Runtipi pour ne pas redémarrer dockerd
+    # pendant le démarrage de la pile.
+    if wifi_ssid:
+        step("wifi_hotspot_warn")
+    # Chaque étape déclare ses paramètres (`inputs`) : une relance avec la même
+    # configuration saute ce qui a déjà réussi. `internet` n'est jamais mise en
+    # cache — elle constate l'état présent du réseau.
+    status = run_steps([
+        Step("hostname",    lambda: configure_hostname(hostname),
+             inputs={"hostname": hostname}, probe=lambda: hostname_satisfied(hostname)),
+        Step("timezone",    lambda: configure_timezone(timezone),
+             inputs={"timezone": timezone}, probe=lambda: timezone_satisfied(timezone)),
+        Step("locale",      lambda: configure_locale(locale),
+             inputs={"locale": locale}, probe=lambda: locale_satisfied(locale)),
+        Step("user",        lambda: create_user(username, password),
+             inputs=user_inputs),
+        Step("build_user",  lambda: remove_build_user(username),
+             after=("user",), inputs={"keep": username}),
+        Step("ssh_key",     lambda: add_ssh_key(username, ssh_key),
+             after=("user",), inputs={"username": username, "key": ssh_key},
+             probe=lambda: ssh_key_satisfied(username, ssh_key)),
+        Step("ssh",         lambda: configure_ssh(ssh_port, disable_password_auth, ssh_key),
+             after=("ssh_key",),
+             inputs={"port": ssh_port, "no_password": disable_password_auth, "key": bool(ssh_key)}),
+        Step("wifi",        lambda: connect_wifi(wifi_ssid, wifi_password),
+             after=("hostname", "timezone", "locale", "build_user", "ssh"),
+             inputs=wifi_inputs),
+        Step("static_ip",   lambda: configure_static_ip(static_ip, static_gw, static_dns),
+             after=("wifi",), inputs={"ip": static_ip, "gw": static_gw, "dns": static_dns}),
+        Step("internet",    internet,    after=("static_ip",)),
+        Step("apt_update",  apt_update,  after=("internet",), inputs={}),
+        *([
+            Step("runtipi",     runtipi,     after=("static_ip", "locale", "ssh"),
+                 inputs={}, probe=runtipi_satisfied),
+            Step("apt_upgrade", apt_upgrade, after=("apt_update", "runtipi"), inputs={}),
+        ] if offline else [
+            Step("apt_upgrade", apt_upgrade, after=("apt_update", "locale", "ssh"), inputs={}),
+            Step("runtipi",     runtipi,     after=("apt_upgrade",),
+                 inputs={}, probe=runtipi_satisfied),
+        ]),
+        Step("cockpit",     lambda: configure_cockpit(cockpit_enabled),
+             inputs={"enabled": cockpit_enabled}),
+    ], journal=journal, on_cached=lambda name, how: done("step_cached", step=name))
+    if status["runtipi"] == pipeline.SKIPPED:
+        done("config_done")
+        return
 
     final_ip = get_final_ip()
     if final_ip:
-        print(f"TIPI_IP:{final_ip}", flush=True)
-    done(T["config_done"])
+        emit({"type": "result", "ip": final_ip})
+    done("config_done")
 
 
 if __name__ == "__main__":
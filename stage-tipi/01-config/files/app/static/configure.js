@@ -0,0 +1,147 @@
+// RuntipiOS — configure.html (I18N est défini en ligne par le template)
+
+function toggle(id) {
+  const el = document.getElementById(id);
+  el.type = el.type === "password" ? "text" : "password";
+}
+
+// Scan WiFi et affichage de la liste cliquable
+async function scanWifi() {
+  const btn = document.getElementById("scan-btn");
+  const status = document.getElementById("scan-status");
+  const results = document.getElementById("wifi-results");
+  const input = document.getElementById("wifi_ssid");
+  btn.disabled = true;
+  btn.textContent = "\u23f3 …";
+  status.textContent = I18N.scanning;
+  results.style.display = "none";
+  results.innerHTML = "";
+  try {
+    // Réponse immédiate depuis le cache du portail (rescan partagé si trop ancien)
+    const res = await fetch("/wifi/rescan");
+    const networks = (await res.json()).networks;
+    if (networks.length === 0) {
+      status.textContent = I18N.scan_error;
+    } else {
+      networks.forEach(n => {
+        const row = document.createElement("div");
+        row.style.cssText = "padding:0.55rem 0.75rem;cursor:pointer;font-size:0.85rem;border-bottom:1px solid var(--border);display:flex;justify-content:space-between;align-items:center;color:var(--text)";
+        row.innerHTML = `<span>${n.ssid}</span><span style="color:var(--muted);font-size:0.75rem">${n.signal}%${n.has_password ? " \ud83d\udd12" : ""}</span>`;
+        row.addEventListener("click", () => {
+          input.value = n.ssid;
+          results.style.display = "none";
+          document.getElementById("wifi-warning").style.display = "";
+          document.getElementById("mdns-hostname").textContent =
+            document.querySelector("input[name='hostname']").value.trim() || "runtipios";
+        });
+        row.addEventListener("mouseover", () => row.style.background = "var(--border)");
+        row.addEventListener("mouseout",  () => row.style.background = "");
+        results.appendChild(row);
+      });
+      results.style.display = "";
+      status.textContent = I18N.found.replace("{n}", networks.length);
+    }
+  } catch(e) {
+    status.textContent = I18N.scan_error;
+  }
+  btn.disabled = false;
+  btn.textContent = "\ud83d\udd0d";
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  // Afficher l'alerte WiFi dès qu'un SSID est saisi
+  const wifiSsid = document.getElementById("wifi_ssid");
+  const wifiWarning = document.getElementById("wifi-warning");
+  wifiSsid.addEventListener("input", () => {
+    wifiWarning.style.display = wifiSsid.value.trim() ? "" : "none";
+  });
+
+  // Mettre à jour le hostname mDNS dans l'alerte selon la valeur saisie
+  const hostnameInput = document.querySelector("input[name='hostname']");
+  const mdnsSpan = document.getElementById("mdns-hostname");
+  if (hostnameInput && mdnsSpan) {
+    hostnameInput.addEventListener("input", () => {
+      mdnsSpan.textContent = hostnameInput.value.trim() || "runtipios";
+    });
+  }
+
+  // Modale de confirmation avant soumission
+  const form   = document.querySelector("form");
+  const dialog = document.getElementById("confirm-dialog");
+
+  form.addEventListener("submit", (e) => {
+    e.preventDefault();
+
+    document.getElementById("dlg-title").textContent   = I18N.dlg_title;
+    document.getElementById("dlg-warning").textContent = "⚠️ " + I18N.dlg_warning;
+    document.getElementById("dlg-cancel").textContent  = I18N.dlg_cancel;
+    document.getElementById("dlg-confirm").textContent = "✅ " + I18N.dlg_confirm;
+
+    const hostname = form.querySelector("[name='hostname']").value.trim()  || "runtipios";
+    const username  = form.querySelector("[name='username']").value.trim();
+    const sshPort   = form.querySelector("[name='ssh_port']").value.trim()  || "22";
+    const staticIp  = form.querySelector("[name='static_ip']").value.trim();
+    const staticGw  = form.querySelector("[name='static_gw']").value.trim();
+    const staticDns = form.querySelector("[name='static_dns']").value.trim();
+    const wifiSsid  = form.querySelector("[name='wifi_ssid']").value.trim();
+    const cockpit   = form.querySelector("[name='cockpit_enabled']")?.checked;
+
+    const rows = [
+      [I18N.dlg_hostname, hostname],
+      [I18N.dlg_user,     username],
+      [I18N.dlg_port,     sshPort],
+      [I18N.dlg_ip,       staticIp || I18N.dlg_dhcp],
+      ...(staticIp ? [
+        [I18N.dlg_gw,  staticGw  || "—"],
+        [I18N.dlg_dns, staticDns || "8.8.8.8"],
+      ] : []),
+      [I18N.dlg_wifi,     wifiSsid || I18N.dlg_ethernet],
+      [I18N.dlg_cockpit,  cockpit ? I18N.dlg_enabled : I18N.dlg_disabled],
+    ];
+
+    const tbody = document.getElementById("dlg-table");
+    tbody.innerHTML = "";
+    rows.forEach(([k, v]) => {
+      const tr = document.createElement("tr");
+      const td1 = document.createElement("td");
+      td1.style.cssText = "padding:0.35rem 1rem 0.35rem 0;color:var(--muted);white-space:nowrap";
+      td1.textContent = k;
+      const td2 = document.createElement("td");
+      td2.style.cssText = "padding:0.35rem 0;font-weight:600";
+      td2.textContent = v;
+      tr.appendChild(td1);
+      tr.appendChild(td2);
+      tbody.appendChild(tr);
+    });
+
+    dialog.showModal();
+  });
+
+  document.getElementById("dlg-cancel").addEventListener("click", () => dialog.close());
+  document.getElementById("dlg-confirm").addEventListener("click", () => {
+    dialog.close();
+    const btn = document.getElementById("submit-btn");
+    btn.disabled = true;
+    btn.textContent = I18N.launching;
+    form.submit();
+  });
+  dialog.addEventListener("click", (e) => { if (e.target === dialog) dialog.close(); });
+
+  // Validation des mots de passe côté client
+  const pwd2 = document.getElementById("pwd2");
+  pwd2.addEventListener("input", () => {
+    const pwd1 = document.getElementById("pwd1").value;
+    if (pwd2.value && pwd2.value !== pwd1) {
+      pwd2.setCustomValidity(I18N.pwd_mismatch);
+    } else {
+      pwd2.setCustomValidity("");
+    }
+  });
+
+  // Désactiver "désactiver mdp" si aucune clé SSH
+  const sshKey = document.getElementById("ssh_key");
+  const disablePass = document.getElementById("disable_pass");
+  sshKey.addEventListener("input", () => {
+    if (!sshKey.value.trim()) disablePass.checked = false;
+  });
+});
@@ -0,0 +1,264 @@
+// RuntipiOS — progress.html (I18N et STATIC_IP sont définis en ligne par le template)
+
+const STEPS = [
+  "hostname", "timezone", "locale", "utilisateur", "ssh", "ip",
+  "apt update", "apt upgrade", "runtipi"
+];
+let stepCount = 0;
+let nextIdx   = 0;
+let journal   = "";     // journal suivi (gen côté serveur) ; autre journal → page rechargée
+let failCount = 0;
+let finished  = false;
+let source    = null;   // EventSource actif (null en mode long-poll)
+let timedStep = null;   // étape dont on attend la ligne "step" (événement timing start)
+const stepLines = {};   // nom d'étape → ligne du log, pour afficher sa durée
+const progressLines = {};  // "étape/kind" → barre de progression apt ou Docker
+
+const logEl      = document.getElementById("log-container");
+const barEl      = document.getElementById("progress-bar");
+const spinner    = document.getElementById("spinner");
+const spinnerMsg = spinner.innerHTML;
+const etaEl      = document.getElementById("eta");
+let etaDeadline  = null;   // Date.now() de fin estimée ; décompté localement
+let firstEntry   = true;
+
+function appendLog(msg, level) {
+  if (firstEntry) { logEl.innerHTML = ""; firstEntry = false; }
+  const line = document.createElement("div");
+  line.className = "log-" + level;
+  const prefix = { step:"▶ ", success:"✔ ", error:"✖ ", final:"★ ", log:"  " }[level] || "  ";
+  line.textContent = prefix + msg;
+  logEl.appendChild(line);
+  logEl.scrollTop = logEl.scrollHeight;
+  return line;
+}
+
+function formatElapsed(s) {
+  return s >= 60 ? `${Math.floor(s / 60)} min ${Math.round(s % 60)} s` : `${s.toFixed(1)} s`;
+}
+
+// Événements timing : start associe l'étape à sa prochaine ligne "step",
+// end affiche la durée mesurée par setup.py en face de cette ligne.
+function handleTiming(entry) {
+  if (entry.event === "start") {
+    timedStep = entry.step;
+  } else if (entry.event === "end") {
+    if (timedStep === entry.step) timedStep = null;
+    const line = stepLines[entry.step];
+    if (line && entry.elapsed != null) {
+      const span = document.createElement("span");
+      span.className = "log-elapsed";
+      span.textContent = " — " + formatElapsed(entry.elapsed);
+      line.appendChild(span);
+    }
+  }
+}
+
+function fill(template, values) {
+  return template.replace(/\{(\w+)\}/g, (_, k) => values[k]);
+}
+
+// Entrées progress (messages "progress" de setup.py) : une barre par étape et par source,
+// mise à jour sur place au lieu de milliers de lignes de log
+function handleProgress(entry) {
+  const key = `${entry.step}/${entry.kind}`;
+  let p = progressLines[key];
+  if (!p) {
+    if (firstEntry) { logEl.innerHTML = ""; firstEntry = false; }
+    const line  = document.createElement("div");
+    const label = document.createElement("span");
+    const track = document.createElement("div");
+    const bar   = document.createElement("div");
+    line.className  = "log-progress";
+    track.className = "log-progress-track";
+    track.appendChild(bar);
+    line.append(label, track);
+    logEl.appendChild(line);
+    p = progressLines[key] = { label, bar };
+  }
+  let text;
+  if (entry.kind === "docker") {
+    text = fill(I18N.progress_docker, {
+      mb: (entry.bytes / 1e6).toFixed(1), total_mb: (entry.total / 1e6).toFixed(1),
+      done: entry.done, layers: entry.layers,
+    });
+  } else {
+    const tpl = entry.phase === "download" ? I18N.progress_apt_download : I18N.progress_apt_install;
+    text = fill(tpl, { percent: entry.percent });
+    if (entry.total) text += ` — ${entry.done}/${entry.total}`;
+  }
+  p.label.textContent = text;
+  p.bar.style.width = entry.percent + "%";
+  logEl.scrollTop = logEl.scrollHeight;
+}
+
+function updateProgress() {
+  const pct = Math.min(95, Math.round((stepCount / (STEPS.length + 1)) * 100));
+  barEl.style.width = pct + "%";
+}
+
+// Temps restant estimé par le portail (secondes), décompté entre deux envois
+function setEta(seconds) {
+  etaDeadline = seconds == null || finished ? null : Date.now() + seconds * 1000;
+  renderEta();
+}
+
+function renderEta() {
+  if (etaDeadline === null) { etaEl.style.display = "none"; return; }
+  const rem = Math.max(0, (etaDeadline - Date.now()) / 1000);
+  const time = rem >= 60 ? `${Math.round(rem / 60)} min` : "< 1 min";
+  etaEl.textContent = fill(I18N.eta_remaining, { time });
+  etaEl.style.display = "";
+}
+setInterval(renderEta, 1000);
+
+function redirectToProgress(origin) {
+  if (!origin || window.location.origin === origin) return false;
+  window.location.replace(`${origin}/progress`);
+  return true;
+}
+
+function stopStreaming() {
+  finished = true;
+  setEta(null);
+  if (source) { source.close(); source = null; }
+}
+
+function handleFinal(data) {
+  stopStreaming();
+  barEl.style.width = "100%";
+  spinner.style.display = "none";
+
+  const card  = document.getElementById("result-card");
+  const links = document.getElementById("result-links");
+  card.style.display = "";
+
+  const ip       = data.ip;
+  const hostname = data.hostname;
+  let html = "";
+  if (ip) {
+    html += `<a href="http://${ip}" target="_blank" style="color:#6ee7b7">http://${ip}</a>`;
+  }
+  if (hostname) {
+    html += (ip ? " &nbsp;|&nbsp; " : "") +
+      `<a href="http://${hostname}.local" target="_blank" style="color:#6ee7b7">http://${hostname}.local</a>`;
+  }
+  links.innerHTML = html || I18N.fallback_links;
+}
+
+function handleDone() {
+  // setup terminé mais pas d'entrée "final" (erreur) — on arrête
+  stopStreaming();
+  spinner.style.display = "none";
+}
+
+// Nouvelle installation depuis les entrées affichées : la page repart de
+// zéro ; retourne false si elle est rechargée
+function followJournal(gen) {
+  if (gen === journal) return true;
+  if (nextIdx > 0) {
+    stopStreaming();
+    location.reload();
+    return false;
+  }
+  journal = gen;
+  return true;
+}
+
+// Applique l'entrée d'index `idx` du journal `gen` ; ignore les doublons après une reprise
+function handleEntry(gen, idx, entry) {
+  if (finished || !followJournal(gen) || idx < nextIdx) return;
+  nextIdx = idx + 1;
+  if (entry.level === "final") {
+    appendLog(entry.msg, "final");
+    handleFinal(entry);
+    return;
+  }
+  if (entry.level === "timing") { handleTiming(entry); return; }
+  if (entry.level === "progress") { handleProgress(entry); return; }
+  const line = appendLog(entry.msg, entry.level);
+  if (entry.level === "step") {
+    stepCount++; updateProgress();
+    if (timedStep) { stepLines[timedStep] = line; timedStep = null; }
+  }
+}
+
+function onConnected() {
+  // Connexion rétablie après interruption
+  if (failCount > 0) {
+    failCount = 0;
+    spinner.innerHTML = spinnerMsg;
+  }
+}
+
+// Flux SSE : EventSource renvoie Last-Event-ID à chaque reconnexion
+function startStream() {
+  source = new EventSource(`/progress/stream?from=${nextIdx}&gen=${encodeURIComponent(journal)}`);
+  source.onopen = onConnected;
+  source.onmessage = (ev) => {
+    onConnected();
+    // id : « gen:index »
+    const cut = ev.lastEventId.lastIndexOf(":");
+    handleEntry(ev.lastEventId.slice(0, cut), parseInt(ev.lastEventId.slice(cut + 1), 10), JSON.parse(ev.data));
+  };
+  source.addEventListener("done", handleDone);
+  source.addEventListener("eta", (ev) => setEta(JSON.parse(ev.data).eta));
+  source.onerror = () => {
+    if (finished) return;
+    onFail();
+    // Flux refusé définitivement (proxy, réponse non-SSE) → long-poll
+    if (source && source.readyState === EventSource.CLOSED) { source = null; longPoll(); }
+  };
+}
+
+// Repli long-poll : la requête reste ouverte jusqu'à la prochaine entrée
+async function longPoll() {
+  while (!finished) {
+    try {
+      const ctrl = new AbortController();
+      const t = setTimeout(() => ctrl.abort(), 30000);
+      const resp = await fetch(`/progress/log?from=${nextIdx}&gen=${encodeURIComponent(journal)}&wait=20`,
+                               { signal: ctrl.signal });
+      clearTimeout(t);
+      if (!resp.ok) throw new Error(resp.status);
+      onConnected();
+      const data = await resp.json();
+      if (!followJournal(data.gen)) return;
+      const base = nextIdx;
+      data.entries.forEach((entry, i) => handleEntry(data.gen, base + i, entry));
+      setEta(data.eta);
+      if (data.done && nextIdx >= data.total && !finished) handleDone();
+    } catch (_) {
+      onFail();
+      await new Promise(r => setTimeout(r, 1000));
+    }
+  }
+}
+
+function onFail() {
+  failCount++;
+  if (failCount === 5) spinner.innerHTML = `<span class="spin">⟳</span> ${I18N.reconnecting}`;
+  if (failCount === 8) {
+    const targetOrigin = STATIC_IP ? `http://${STATIC_IP}:8080` : "http://tipisetup.local:8080";
+    if (redirectToProgress(targetOrigin)) return;
+    if (STATIC_IP) {
+      spinner.innerHTML = `<span class="spin">⟳</span> ${I18N.reconnect_static_ip}`;
+    } else {
+      spinner.innerHTML = `<span class="spin">⟳</span> ${I18N.reconnecting}`;
+    }
+    failCount = 0;  // repart de zéro sur la nouvelle URL
+  }
+}
+
+async function doReboot() {
+  const btn = document.getElementById("reboot-btn");
+  const msg = document.getElementById("reboot-msg");
+  btn.disabled = true;
+  btn.textContent = "⏳ " + I18N.btn_rebooting;
+  try { await fetch("/reboot", { method: "POST" }); } catch (_) {}
+  btn.style.display = "none";
+  msg.style.display = "";
+}
+
+if (window.EventSource) startStream();
+else longPoll();
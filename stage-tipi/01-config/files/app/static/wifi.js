@@ -0,0 +1,89 @@
+// RuntipiOS — wifi.html (I18N est défini en ligne par le template)
+
+let selectedSsid = "";
+let selectedHasPwd = false;
+
+function selectNetwork(ssid, hasPwd) {
+  selectedSsid = ssid;
+  selectedHasPwd = hasPwd;
+  document.querySelectorAll(".network-item").forEach(el => el.classList.remove("selected"));
+  event.currentTarget.classList.add("selected");
+  document.getElementById("sel-ssid").value = ssid;
+  document.getElementById("pwd-field").style.display = hasPwd ? "" : "none";
+  document.getElementById("connect-form").style.display = "";
+  if (hasPwd) document.getElementById("pwd").focus();
+}
+
+function togglePwd() {
+  const p = document.getElementById("pwd");
+  p.type = p.type === "password" ? "text" : "password";
+}
+
+async function connect() {
+  const btn = document.getElementById("connect-btn");
+  btn.disabled = true;
+  btn.textContent = I18N.connecting;
+  clearAlert();
+
+  const resp = await fetch("/wifi/connect", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ssid: selectedSsid, password: document.getElementById("pwd").value })
+  });
+  const data = await resp.json();
+
+  if (data.success) {
+    showAlert(I18N.connected.replace("{ssid}", selectedSsid), "success");
+    setTimeout(() => window.location.href = "/configure", 1500);
+  } else {
+    showAlert(I18N.connect_fail.replace("{e}", data.error || I18N.unknown_error), "error");
+    btn.disabled = false;
+    btn.textContent = I18N.connecting.split("\u2026")[0];
+  }
+}
+
+async function rescan() {
+  const btn = document.getElementById("rescan-btn");
+  btn.disabled = true;
+  btn.textContent = I18N.scanning_short;
+  // force=1 : rejoint le rescan partagé plutôt que d'en lancer un nouveau
+  const resp = await fetch("/wifi/rescan?force=1");
+  const scan = await resp.json();
+  const nets = scan.networks;
+  const list = document.getElementById("network-list");
+  if (scan.age !== null) {
+    document.getElementById("scan-age").textContent = I18N.scan_age.replace("{s}", Math.round(scan.age));
+  }
+  if (nets.length === 0) {
+    list.innerHTML = `<p style="color:var(--muted);font-size:0.85rem;text-align:center;padding:1rem 0">${I18N.no_networks}</p>`;
+  } else {
+    list.innerHTML = nets.map(n => `
+      <button class="network-item" onclick="selectNetwork('${n.ssid.replace(/'/g,"\\'")}', ${n.has_password})" title="${n.ssid}">
+        <div class="net-info">
+          <span class="net-ssid">${n.ssid}</span>
+          ${n.security && n.security !== '--' ? `<span class="net-tag">🔒 ${n.security}</span>` : ''}
+        </div>
+        <div class="signal-bars">
+          <div class="bar ${n.signal >= 25 ? 'on' : ''}"></div>
+          <div class="bar ${n.signal >= 50 ? 'on' : ''}"></div>
+          <div class="bar ${n.signal >= 75 ? 'on' : ''}"></div>
+          <div class="bar ${n.signal >= 90 ? 'on' : ''}"></div>
+        </div>
+      </button>`).join("");
+  }
+  btn.disabled = false;
+  btn.textContent = "↺ " + I18N.btn_rescan;
+}
+
+function showAlert(msg, type) {
+  document.getElementById("alert-box").innerHTML =
+    `<div class="alert alert-${type}">${msg}</div>`;
+}
+function clearAlert() {
+  document.getElementById("alert-box").innerHTML = "";
+}
+
+// Soumettre avec Entrée
+document.addEventListener("keydown", e => {
+  if (e.key === "Enter" && selectedSsid) connect();
+});
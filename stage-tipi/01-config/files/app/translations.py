@@ -1,13 +1,15 @@
 ﻿#!/usr/bin/env python3
 """
 RuntipiOS — Shared translation file
-Used by app.py (Flask portal) and setup.py (installation logs).
+Source of the catalogs compiled by i18n.py, which app.py (Flask portal) and
+setup.py (installation logs) load at runtime.
 
 Adding a language:
   1. Copy the "en" block and rename it with the language code (e.g. "it")
   2. Translate all values
   3. Add the code to LANG_LABELS with its emoji + abbreviation
-  That's it — templates and setup.py will pick it up automatically.
+  That's it — the image build compiles it and checks that every "en" key is
+  translated (`python3 i18n.py build /tmp/catalogs` to check locally).
 """
 
 TRANSLATIONS: dict[str, dict[str, str]] = {
@@ -114,6 +116,10 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "reconnecting":          "Reconnecting…",
         "log_waiting":          "Waiting to start…",
         "fallback_links":       "Access Runtipi via the IP address of your Raspberry Pi",
+        "progress_apt_download": "Downloading: {percent}%",
+        "progress_apt_install": "Installing packages: {percent}%",
+        "progress_docker":      "Docker images: {mb} / {total_mb} MB — {done}/{layers} layers",
+        "eta_remaining":        "Estimated time remaining: {time}",
 
         # wifi.html
         "page_wifi_title":      "WiFi connection",
@@ -121,6 +127,7 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "wifi_subtitle":        "Select your network and enter the password.",
         "wifi_no_networks":     "No networks detected.",
         "btn_rescan":           "Refresh",
+        "wifi_scan_age":        "Last scan {s} s ago",
         "label_selected_net":   "Selected network",
         "label_wifi_password":  "WiFi password",
         "btn_connect":          "Connect",
@@ -174,25 +181,49 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "wifi_err":             "WiFi: {e}",
         "internet_check":        "Checking internet connectivity…",
         "internet_ok":           "Internet connection available",
-        "internet_wait":         "Waiting for internet… ({s}s)",
-        "internet_fail":         "No internet connection after 60 s — aborting Runtipi installation",
+        "internet_wait":         "Waiting for internet… ({s}s — {reason})",
+        "internet_fail":         "No internet connection after {s} s ({reason}) — aborting Runtipi installation",
+        "net_no_route":          "no default route",
+        "net_dns_fail":          "DNS {host}: {e}",
+        "net_tcp_fail":          "TCP {host}:{port}: {e}",
+        "net_tls_fail":          "TLS {host}: {e}",
         "runtipi_step":         "Installing Runtipi (Docker included — please wait)…",
         "runtipi_done":         "Runtipi installed and started successfully!",
         "runtipi_fail":         "Runtipi: installation failed (code {code})",
         "runtipi_err":          "Runtipi installation: {e}",
-        "runtipi_retry":        "Network error — retrying {attempt}/{total}…",
+        "runtipi_retry":        "{cause} — attempt {attempt}/{total} in {delay} s…",
+        "runtipi_no_retry":     "{cause} — retrying would not help, giving up.",
+        "runtipi_installer_cached": "Using the cached Runtipi installer.",
+        "runtipi_cause_dns":       "DNS resolution failed",
+        "runtipi_cause_tls":       "TLS handshake failed",
+        "runtipi_cause_network":   "Network error",
+        "runtipi_cause_not_ready": "Containers not ready",
+        "runtipi_cause_script":    "Install script failed",
+        "runtipi_cause_disk":      "Disk full",
+        "runtipi_cause_denied":    "Image access denied",
+        "runtipi_offline":      "Installing Runtipi {version} from the images bundled in the system image…",
+        "runtipi_offline_fail": "Offline installation failed — falling back to the online installer.",
+        "runtipi_images_present": "Runtipi images already present — skipping docker load.",
         "runtipi_check_start":  "Checking Runtipi containers startup (up to 3 min)…",
-        "runtipi_inactive":     "Runtipi installed but service inactive — retrying.",
+        "runtipi_container":    "Container {name}: {state}",
+        "runtipi_inactive":     "Runtipi installed but containers not ready: {containers} — retrying.",
         "runtipi_docker_warn":  "Warning: {n} Docker error(s) ignored by the install script.",
         "runtipi_retry_boot":   "Runtipi installation failed. It will retry automatically in the background after reboot — wait 5–10 min then open http://{hostname}.local or your Pi's IP address.",
         "config_read_err":      "Cannot read configuration: {e}",
         "config_missing":       "Username or password missing",
-        "wifi_hotspot_warn":    "Hotspot disconnecting — the browser will reconnect automatically. If the page remains unavailable, open http://tipisetup.local:8080",
+        "config_unreadable":    "Cannot read the configuration: {e}",
+        "resume_no_journal":    "No checkpoint journal to resume from",
+        "step_cached":          "Already done — skipped: {step}",
+        "resume_start":         "Resuming the installation from the checkpoint journal…",
+        "resume_impossible":    "Cannot resume: step '{step}' never completed and needs the secrets entered in the portal.",
+        "wifi_hotspot_warn":    "⚠️ Hotspot disconnecting — the browser will reconnect automatically. If the page remains unavailable, open http://tipisetup.local:8080",
         "config_done":          "Configuration complete!",
         "label_cockpit":        "Enable Cockpit (web management interface — port 9090)",
         "hint_cockpit":         "Accessible at <code>http://&lt;hostname&gt;.local:9090</code> or <code>http://&lt;ip&gt;:9090</code> after reboot. Login with your SSH credentials.",
         "cockpit_step":         "Activating Cockpit…",
         "cockpit_done":         "Cockpit enabled — accessible on port 9090 after reboot",
+        "cockpit_err":          "Cockpit: activation failed — {e}",
+        "cockpit_disable_warn": "Cockpit: incomplete deactivation — check manually",
     },
     # =========================================================================
     "fr": {
@@ -285,12 +316,17 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "reconnecting":          "Reconnexion…",
         "log_waiting":          "En attente du démarrage…",
         "fallback_links":       "Accédez à Runtipi via l'adresse IP de votre Raspberry Pi",
+        "progress_apt_download": "Téléchargement : {percent} %",
+        "progress_apt_install": "Installation des paquets : {percent} %",
+        "progress_docker":      "Images Docker : {mb} / {total_mb} Mo — {done}/{layers} couches",
+        "eta_remaining":        "Temps restant estimé : {time}",
 
         "page_wifi_title":      "Connexion WiFi",
         "wifi_h2":              "Connexion au réseau WiFi",
         "wifi_subtitle":        "Sélectionnez votre réseau et saisissez le mot de passe.",
         "wifi_no_networks":     "Aucun réseau détecté.",
         "btn_rescan":           "Actualiser",
+        "wifi_scan_age":        "Dernier scan il y a {s} s",
         "label_selected_net":   "Réseau sélectionné",
         "label_wifi_password":  "Mot de passe WiFi",
         "btn_connect":          "Se connecter",
@@ -342,25 +378,49 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "wifi_err":             "WiFi : {e}",
         "internet_check":        "Vérification de la connectivité internet…",
         "internet_ok":           "Connexion internet disponible",
-        "internet_wait":         "En attente d'internet… ({s}s)",
-        "internet_fail":         "Pas de connexion internet après 60 s — installation de Runtipi annulée",
+        "internet_wait":         "En attente d'internet… ({s}s — {reason})",
+        "internet_fail":         "Pas de connexion internet après {s} s ({reason}) — installation de Runtipi annulée",
+        "net_no_route":          "pas de route par défaut",
+        "net_dns_fail":          "DNS {host} : {e}",
+        "net_tcp_fail":          "TCP {host}:{port} : {e}",
+        "net_tls_fail":          "TLS {host} : {e}",
         "runtipi_step":         "Installation de Runtipi (Docker inclus — patience)…",
         "runtipi_done":         "Runtipi installé et démarré avec succès !",
         "runtipi_fail":         "Runtipi : installation échouée (code {code})",
         "runtipi_err":          "Installation Runtipi : {e}",
-        "runtipi_retry":        "Erreur réseau — nouvelle tentative {attempt}/{total}…",
+        "runtipi_retry":        "{cause} — tentative {attempt}/{total} dans {delay} s…",
+        "runtipi_no_retry":     "{cause} — une nouvelle tentative n'y changerait rien, abandon.",
+        "runtipi_installer_cached": "Utilisation de l'installateur Runtipi en cache.",
+        "runtipi_cause_dns":       "Échec de la résolution DNS",
+        "runtipi_cause_tls":       "Échec de la négociation TLS",
+        "runtipi_cause_network":   "Erreur réseau",
+        "runtipi_cause_not_ready": "Containers non prêts",
+        "runtipi_cause_script":    "Échec du script d'installation",
+        "runtipi_cause_disk":      "Disque plein",
+        "runtipi_cause_denied":    "Accès à l'image refusé",
+        "runtipi_offline":      "Installation de Runtipi {version} depuis les images embarquées dans l'image système…",
+        "runtipi_offline_fail": "Échec de l'installation hors ligne — repli sur l'installateur en ligne.",
+        "runtipi_images_present": "Images Runtipi déjà présentes — docker load ignoré.",
         "runtipi_check_start":  "Vérification du démarrage des containers Runtipi (jusqu'à 3 min)…",
-        "runtipi_inactive":     "Runtipi installé mais service inactif — nouvelle tentative.",
+        "runtipi_container":    "Container {name} : {state}",
+        "runtipi_inactive":     "Runtipi installé mais containers non prêts : {containers} — nouvelle tentative.",
         "runtipi_docker_warn":  "Avertissement : {n} erreur(s) Docker ignorée(s) par le script d'installation.",
         "runtipi_retry_boot":   "Échec de l'installation de Runtipi. Une nouvelle tentative se fera automatiquement en arrière-plan au prochain démarrage — patientez 5–10 min puis ouvrez http://{hostname}.local ou l'adresse IP de votre Pi.",
         "config_read_err":      "Lecture de la configuration impossible : {e}",
         "config_missing":       "Nom d'utilisateur ou mot de passe manquant",
-        "wifi_hotspot_warn":    "Le hotspot se déconnecte — le navigateur se reconnectera automatiquement. Si la page reste inaccessible, ouvrez http://tipisetup.local:8080",
+        "config_unreadable":    "Lecture de la configuration impossible : {e}",
+        "resume_no_journal":    "Aucun journal de reprise",
+        "step_cached":          "Déjà fait — étape sautée : {step}",
+        "resume_start":         "Reprise de l'installation depuis le journal…",
+        "resume_impossible":    "Reprise impossible : l'étape « {step} » n'a jamais abouti et nécessite les secrets saisis dans le portail.",
+        "wifi_hotspot_warn":    "⚠️ Le hotspot se déconnecte — le navigateur se reconnectera automatiquement. Si la page reste inaccessible, ouvrez http://tipisetup.local:8080",
         "config_done":          "Configuration terminée !",
         "label_cockpit":        "Activer Cockpit (interface web de gestion — port 9090)",
         "hint_cockpit":         "Accessible via <code>http://&lt;hostname&gt;.local:9090</code> ou <code>http://&lt;ip&gt;:9090</code> après redémarrage. Identifiants SSH.",
         "cockpit_step":         "Activation de Cockpit…",
         "cockpit_done":         "Cockpit activé — accessible sur le port 9090 après redémarrage",
+        "cockpit_err":          "Cockpit : activation échouée — {e}",
+        "cockpit_disable_warn": "Cockpit : désactivation incomplète — vérifier manuellement",
     },
     # =========================================================================
     "de": {
@@ -453,12 +513,17 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "reconnecting":          "Verbindung wird wiederhergestellt…",
         "log_waiting":          "Warte auf Start…",
         "fallback_links":       "Zugriff auf Runtipi über die IP-Adresse des Raspberry Pi",
+        "progress_apt_download": "Herunterladen: {percent} %",
+        "progress_apt_install": "Pakete werden installiert: {percent} %",
+        "progress_docker":      "Docker-Images: {mb} / {total_mb} MB — {done}/{layers} Schichten",
+        "eta_remaining":        "Geschätzte Restzeit: {time}",
 
         "page_wifi_title":      "WLAN-Verbindung",
         "wifi_h2":              "Mit WLAN verbinden",
         "wifi_subtitle":        "Wählen Sie Ihr Netzwerk und geben Sie das Passwort ein.",
         "wifi_no_networks":     "Keine Netzwerke gefunden.",
         "btn_rescan":           "Aktualisieren",
+        "wifi_scan_age":        "Letzter Scan vor {s} s",
         "label_selected_net":   "Ausgewähltes Netzwerk",
         "label_wifi_password":  "WLAN-Passwort",
         "btn_connect":          "Verbinden",
@@ -510,25 +575,49 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "wifi_err":             "WLAN: {e}",
         "internet_check":        "Internetverbindung wird geprüft…",
         "internet_ok":           "Internetverbindung verfügbar",
-        "internet_wait":         "Warte auf Internet… ({s}s)",
-        "internet_fail":         "Keine Internetverbindung nach 60 s — Runtipi-Installation abgebrochen",
+        "internet_wait":         "Warte auf Internet… ({s}s — {reason})",
+        "internet_fail":         "Keine Internetverbindung nach {s} s ({reason}) — Runtipi-Installation abgebrochen",
+        "net_no_route":          "keine Standardroute",
+        "net_dns_fail":          "DNS {host}: {e}",
+        "net_tcp_fail":          "TCP {host}:{port}: {e}",
+        "net_tls_fail":          "TLS {host}: {e}",
         "runtipi_step":         "Runtipi wird installiert (Docker inklusive — bitte warten)…",
         "runtipi_done":         "Runtipi erfolgreich installiert und gestartet!",
         "runtipi_fail":         "Runtipi: Installation fehlgeschlagen (Code {code})",
         "runtipi_err":          "Runtipi-Installation: {e}",
-        "runtipi_retry":        "Netzwerkfehler — Versuch {attempt}/{total}…",
+        "runtipi_retry":        "{cause} — Versuch {attempt}/{total} in {delay} s…",
+        "runtipi_no_retry":     "{cause} — ein neuer Versuch würde nichts ändern, Abbruch.",
+        "runtipi_installer_cached": "Zwischengespeicherter Runtipi-Installer wird verwendet.",
+        "runtipi_cause_dns":       "DNS-Auflösung fehlgeschlagen",
+        "runtipi_cause_tls":       "TLS-Handshake fehlgeschlagen",
+        "runtipi_cause_network":   "Netzwerkfehler",
+        "runtipi_cause_not_ready": "Container nicht bereit",
+        "runtipi_cause_script":    "Installationsskript fehlgeschlagen",
+        "runtipi_cause_disk":      "Speicher voll",
+        "runtipi_cause_denied":    "Zugriff auf Image verweigert",
+        "runtipi_offline":      "Runtipi {version} wird aus den im System-Image enthaltenen Images installiert…",
+        "runtipi_offline_fail": "Offline-Installation fehlgeschlagen — Rückfall auf den Online-Installer.",
+        "runtipi_images_present": "Runtipi-Images bereits vorhanden — docker load übersprungen.",
         "runtipi_check_start":  "Runtipi-Container-Start wird überprüft (bis zu 3 Min.)…",
-        "runtipi_inactive":     "Runtipi installiert, aber Dienst inaktiv — erneuter Versuch.",
+        "runtipi_container":    "Container {name}: {state}",
+        "runtipi_inactive":     "Runtipi installiert, aber Container nicht bereit: {containers} — erneuter Versuch.",
         "runtipi_docker_warn":  "Warnung: {n} Docker-Fehler vom Installationsskript ignoriert.",
         "runtipi_retry_boot":   "Runtipi-Installation fehlgeschlagen. Ein automatischer Neuversuch erfolgt im Hintergrund nach dem Neustart — warten Sie 5–10 Min, dann öffnen Sie http://{hostname}.local oder die IP-Adresse Ihres Pi.",
         "config_read_err":      "Konfiguration kann nicht gelesen werden: {e}",
         "config_missing":       "Benutzername oder Passwort fehlt",
-        "wifi_hotspot_warn":    "Hotspot wird getrennt — der Browser verbindet sich automatisch neu. Falls die Seite nicht erreichbar bleibt, öffnen Sie http://tipisetup.local:8080",
+        "config_unreadable":    "Konfiguration kann nicht gelesen werden: {e}",
+        "resume_no_journal":    "Kein Checkpoint-Journal zum Fortsetzen vorhanden",
+        "step_cached":          "Bereits erledigt — übersprungen: {step}",
+        "resume_start":         "Installation wird aus dem Checkpoint-Journal fortgesetzt…",
+        "resume_impossible":    "Fortsetzen nicht möglich: Schritt „{step}“ wurde nie abgeschlossen und benötigt die im Portal eingegebenen Geheimnisse.",
+        "wifi_hotspot_warn":    "⚠️ Hotspot wird getrennt — der Browser verbindet sich automatisch neu. Falls die Seite nicht erreichbar bleibt, öffnen Sie http://tipisetup.local:8080",
         "config_done":          "Konfiguration abgeschlossen!",
         "label_cockpit":        "Cockpit aktivieren (Web-Verwaltungsoberfläche — Port 9090)",
         "hint_cockpit":         "Erreichbar unter <code>http://&lt;hostname&gt;.local:9090</code> oder <code>http://&lt;ip&gt;:9090</code> nach dem Neustart. SSH-Anmeldedaten verwenden.",
         "cockpit_step":         "Cockpit wird aktiviert…",
         "cockpit_done":         "Cockpit aktiviert — nach dem Neustart auf Port 9090 erreichbar",
+        "cockpit_err":          "Cockpit: Aktivierung fehlgeschlagen — {e}",
+        "cockpit_disable_warn": "Cockpit: Deaktivierung unvollständig — bitte manuell prüfen",
     },
 
     # =========================================================================
@@ -624,12 +713,17 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "reconnecting":          "Reconectando…",
         "log_waiting":          "Esperando inicio…",
         "fallback_links":       "Acceda a Runtipi mediante la dirección IP de su Raspberry Pi",
+        "progress_apt_download": "Descargando: {percent} %",
+        "progress_apt_install": "Instalando paquetes: {percent} %",
+        "progress_docker":      "Imágenes Docker: {mb} / {total_mb} MB — {done}/{layers} capas",
+        "eta_remaining":        "Tiempo restante estimado: {time}",
 
         "page_wifi_title":      "Conexión WiFi",
         "wifi_h2":              "Conectar a WiFi",
         "wifi_subtitle":        "Seleccione su red e introduzca la contraseña.",
         "wifi_no_networks":     "No se detectaron redes.",
         "btn_rescan":           "Actualizar",
+        "wifi_scan_age":        "Último escaneo hace {s} s",
         "label_selected_net":   "Red seleccionada",
         "label_wifi_password":  "Contraseña WiFi",
         "btn_connect":          "Conectar",
@@ -681,33 +775,51 @@ TRANSLATIONS: dict[str, dict[str, str]] = {
         "wifi_err":             "WiFi: {e}",
         "internet_check":        "Verificando conectividad a internet…",
         "internet_ok":           "Conexión a internet disponible",
-        "internet_wait":         "Esperando internet… ({s}s)",
-        "internet_fail":         "Sin conexión a internet tras 60 s — instalación de Runtipi cancelada",
+        "internet_wait":         "Esperando internet… ({s}s — {reason})",
+        "internet_fail":         "Sin conexión a internet tras {s} s ({reason}) — instalación de Runtipi cancelada",
+        "net_no_route":          "sin ruta predeterminada",
+        "net_dns_fail":          "DNS {host}: {e}",
+        "net_tcp_fail":          "TCP {host}:{port}: {e}",
+        "net_tls_fail":          "TLS {host}: {e}",
         "runtipi_step":         "Instalando Runtipi (Docker incluido — por favor espere)…",
         "runtipi_done":         "¡Runtipi instalado e iniciado correctamente!",
         "runtipi_fail":         "Runtipi: instalación fallida (código {code})",
         "runtipi_err":          "Instalación de Runtipi: {e}",
-        "runtipi_retry":        "Error de red — intento {attempt}/{total}…",
+        "runtipi_retry":        "{cause} — intento {attempt}/{total} en {delay} s…",
+        "runtipi_no_retry":     "{cause} — reintentar no serviría de nada, se abandona.",
+        "runtipi_installer_cached": "Usando el instalador de Runtipi en caché.",
+        "runtipi_cause_dns":       "Falló la resolución DNS",
+        "runtipi_cause_tls":       "Falló la negociación TLS",
+        "runtipi_cause_network":   "Error de red",
+        "runtipi_cause_not_ready": "Contenedores no listos",
+        "runtipi_cause_script":    "Falló el script de instalación",
+        "runtipi_cause_disk":      "Disco lleno",
+        "runtipi_cause_denied":    "Acceso a la imagen denegado",
+        "runtipi_offline":      "Instalando Runtipi {version} desde las imágenes incluidas en la imagen del sistema…",
+        "runtipi_offline_fail": "Falló la instalación sin conexión — usando el instalador en línea.",
+        "runtipi_images_present": "Imágenes de Runtipi ya presentes — se omite docker load.",
         "runtipi_check_start":  "Verificando el inicio de los contenedores Runtipi (hasta 3 min)…",
-        "runtipi_inactive":     "Runtipi instalado pero servicio inactivo — reintentando.",
+        "runtipi_container":    "Contenedor {name}: {state}",
+        "runtipi_inactive":     "Runtipi instalado pero contenedores no listos: {containers} — reintentando.",
         "runtipi_docker_warn":  "Aviso: {n} error(es) de Docker ignorado(s) por el script de instalación.",
         "runtipi_retry_boot":   "Error al instalar Runtipi. Se reintentará automáticamente en segundo plano tras el reinicio — espere 5–10 min y abra http://{hostname}.local o la IP de su Pi.",
         "config_read_err":      "No se puede leer la configuración: {e}",
         "config_missing":       "Nombre de usuario o contraseña no proporcionados",
-        "wifi_hotspot_warn":    "El hotspot se desconecta — el navegador se reconectará automáticamente. Si la página sigue inaccesible, abra http://tipisetup.local:8080",
+        "config_unreadable":    "No se puede leer la configuración: {e}",
+        "resume_no_journal":    "No hay diario de control desde el que reanudar",
+        "step_cached":          "Ya hecho — paso omitido: {step}",
+        "resume_start":         "Reanudando la instalación desde el diario de control…",
+        "resume_impossible":    "No se puede reanudar: el paso «{step}» nunca se completó y necesita los secretos introducidos en el portal.",
+        "wifi_hotspot_warn":    "⚠️ El hotspot se desconecta — el navegador se reconectará automáticamente. Si la página sigue inaccesible, abra http://tipisetup.local:8080",
         "config_done":          "¡Configuración completada!",
         "label_cockpit":        "Activar Cockpit (interfaz de administración web — puerto 9090)",
         "hint_cockpit":         "Accesible en <code>http://&lt;hostname&gt;.local:9090</code> o <code>http://&lt;ip&gt;:9090</code> tras el reinicio. Usar credenciales SSH.",
         "cockpit_step":         "Activando Cockpit…",
         "cockpit_done":         "Cockpit activado — accesible en el puerto 9090 tras el reinicio",
+        "cockpit_err":          "Cockpit: activación fallida — {e}",
+        "cockpit_disable_warn": "Cockpit: desactivación incompleta — verificar manualmente",
     },
 }
 
 DEFAULT_LANG    = "en"
-SUPPORTED_LANGS = list(TRANSLATIONS.keys())
 LANG_LABELS     = {"en": "🇬🇧 EN", "fr": "🇫🇷 FR", "de": "🇩🇪 DE", "es": "🇪🇸 ES"}
-
-
-def get_t(lang: str) -> dict[str, str]:
-    """Retourne le dict de traductions pour la langue donnée, avec fallback sur 'en'."""
-    return TRANSLATIONS.get(lang, TRANSLATIONS[DEFAULT_LANG])
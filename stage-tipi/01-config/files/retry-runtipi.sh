@@ -9,4 +9,39 @@ FLAG=/boot/firmware/tipi-install-failed.flag
 echo "RuntipiOS: flag d'échec détecté — nouvelle tentative d'installation de Runtipi…"
 rm -f "$FLAG"
 
-curl -sSL https://setup.runtipi.io | bash
+# Reprise du pipeline depuis le journal : les étapes déjà faites sont sautées.
+# setup.py réécrit le flag si Runtipi échoue encore ; sinon on nettoie.
+if [ -f /var/lib/tipi-setup/checkpoints.json ] && [ -f /opt/tipi-setup/setup.py ]; then
+    (cd /opt/tipi-setup && python3 setup.py --resume)
+    RC=$?
+    # setup.py dépose le flag en tmpfs (bootlog.py) : recopie sur la partition boot
+    python3 /opt/tipi-setup/bootlog.py flush
+    if [ "$RC" = "0" ]; then
+        [ -f "$FLAG" ] || rm -rf /opt/tipi-setup /var/lib/tipi-setup/checkpoints.json
+        exit 0
+    fi
+    echo "RuntipiOS: reprise impossible — installation directe de Runtipi…"
+fi
+
+# Bundle hors ligne (TIPI_OFFLINE=1 au build) : images locales, installateur épinglé
+OFFLINE=/opt/tipi-setup/offline
+if [ -f "$OFFLINE/manifest.json" ]; then
+    if docker load -i "$OFFLINE/runtipi-images.tar.gz" \
+        && mkdir -p /opt/runtipi \
+        && tar -xzf "$OFFLINE/runtipi-cli.tar.gz" -C /opt/runtipi \
+        && (cd /opt/runtipi && ./runtipi-cli start); then
+        exit 0
+    fi
+    echo "RuntipiOS: installation hors ligne échouée — installateur épinglé en ligne…"
+    VERSION=$(sed -n 's/.*"version": *"\([^"]*\)".*/\1/p' "$OFFLINE/manifest.json")
+    cd /opt && bash "$OFFLINE/install.sh" --version "$VERSION"
+    exit $?
+fi
+
+# Installateur mis en cache par setup.py (vérifié par son .sha256), sinon en ligne
+CACHE=/var/lib/tipi-setup/runtipi-install.sh
+if [ -f "$CACHE.sha256" ] && sha256sum -c --status "$CACHE.sha256"; then
+    cd /opt && bash "$CACHE"
+else
+    curl -sSL https://setup.runtipi.io | bash
+fi
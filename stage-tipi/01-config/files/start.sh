@@ -9,10 +9,42 @@ HOTSPOT_IP="10.42.0.1"
 DNSMASQ_PID="/run/tipi-dnsmasq.pid"
 HOSTAPD_PID="/run/tipi-hostapd.pid"
 HOSTAPD_CONF="/etc/hostapd/tipi-hostapd.conf"
+# Copie en tmpfs de la config hostapd, au niveau de log choisi
+HOSTAPD_RUN_CONF="/run/tipi-hostapd.conf"
+# Tampons tmpfs recopiés sur la partition boot par bootlog.py
+HOSTAPD_LOG="/run/tipi-hostapd.log"
+DNSMASQ_LOG="/run/tipi-dnsmasq.log"
+LOG_CONF="/boot/firmware/tipi-log.conf"
+# Attentes sur événement (netlink, socket hostapd, NetworkManager), bornées
+IFWAIT="python3 /opt/tipi-setup/ifwait.py"
 
 log() { echo "[tipi-setup] $*"; }
+# Chronologie du démarrage (secondes depuis le boot noyau), relue par
+# bench/boottime.py — même format que sdnotify.timeline() côté portail
+timeline() { local up _; read -r up _ < /proc/uptime; log "timeline $1 ${up}s"; }
+# Niveau de log d'une source dans tipi-log.conf (« source = niveau »), sinon
+# la valeur par défaut — même lecture que bootlog.levels()
+log_level() {
+    local key value level="$2"
+    if [ -f "$LOG_CONF" ]; then
+        while IFS='=' read -r key value; do
+            key="${key//[[:space:]]/}"
+            value="${value%%#*}"
+            value="${value//[[:space:]]/}"
+            [ "$key" = "$1" ] && [ -n "$value" ] && level="${value,,}"
+        done < "$LOG_CONF"
+    fi
+    echo "$level"
+}
 
 log "=== Démarrage tipi-setup $(date) ==="
+timeline start
+
+# ------------------------------------------------------------------ #
+#  0. Journal : sorties en tmpfs, recopiées par lots sur la carte     #
+# ------------------------------------------------------------------ #
+# Arrêté avec le service (SIGTERM) : dernier vidage avant démontage
+python3 /opt/tipi-setup/bootlog.py run &
 
 # ------------------------------------------------------------------ #
 #  1. Débloquer le WiFi                                               #
@@ -20,16 +52,15 @@ log "=== Démarrage tipi-setup $(date) ==="
 rfkill unblock wifi 2>/dev/null || true
 rfkill unblock all  2>/dev/null || true
 log "rfkill unblock effectué"
+timeline rfkill
 
 # ------------------------------------------------------------------ #
 #  2. Attendre l'interface wlan0 (max 30s)                            #
 # ------------------------------------------------------------------ #
 log "Attente interface wlan0..."
 WLAN_OK=0
-for i in $(seq 1 30); do
-    ip link show wlan0 &>/dev/null && WLAN_OK=1 && break
-    sleep 1
-done
+$IFWAIT link wlan0 30 && WLAN_OK=1
+timeline wlan0
 
 if [ "$WLAN_OK" = "0" ]; then
     log "ERREUR : wlan0 absente après 30s — hotspot impossible"
@@ -50,20 +81,35 @@ elif [ "$WLAN_OK" = "1" ]; then
 
     # Sortir wlan0 de la gestion NetworkManager pour qu'hostapd puisse s'en emparer
     nmcli dev set wlan0 managed no 2>/dev/null || true
-    sleep 1
+    $IFWAIT nm wlan0 unmanaged 5 || log "wlan0 encore gérée par NetworkManager après 5 s"
 
     # Éteindre/rallumer wlan0 pour sortir de tout état précédent
+    # (opérations netlink synchrones : aucune attente nécessaire)
     ip link set wlan0 down  2>/dev/null || true
-    sleep 1
     ip link set wlan0 up    2>/dev/null || true
 
     # Assigner l'IP du point d'accès
     ip addr flush dev wlan0 2>/dev/null || true
     ip addr add "${HOTSPOT_IP}/24" dev wlan0
 
-    # Lancer hostapd en daemon
-    if hostapd -B -P "${HOSTAPD_PID}" "${HOSTAPD_CONF}"; then
-        log "hostapd OK — SSID '${HOTSPOT_SSID}' en broadcast sur canal 6"
+    # Verbosité d'hostapd (0 debug verbeux … 4 avertissements)
+    case "$(log_level hostapd warning)" in
+        debug) HOSTAPD_LEVEL=0 ;;
+        info)  HOSTAPD_LEVEL=2 ;;
+        *)     HOSTAPD_LEVEL=4 ;;
+    esac
+    sed "s/^logger_stdout_level=.*/logger_stdout_level=${HOSTAPD_LEVEL}/" \
+        "${HOSTAPD_CONF}" > "${HOSTAPD_RUN_CONF}"
+
+    # Lancer hostapd en daemon, puis attendre l'AP réellement actif (AP-ENABLED)
+    timeline nm-released
+    if hostapd -B -P "${HOSTAPD_PID}" -f "${HOSTAPD_LOG}" "${HOSTAPD_RUN_CONF}"; then
+        if $IFWAIT hostapd wlan0 15; then
+            timeline hostapd
+            log "hostapd OK — SSID '${HOTSPOT_SSID}' en broadcast sur canal 6"
+        else
+            log "hostapd lancé mais AP inactif après 15 s"
+        fi
     else
         log "ERREUR hostapd (code $?) — diagnostic :"
         iw dev wlan0 info   2>&1 || true
@@ -71,7 +117,16 @@ elif [ "$WLAN_OK" = "1" ]; then
         rfkill list         2>&1 || true
     fi
 
+    # Verbosité de dnsmasq : requêtes DNS et détail DHCP en debug, baux en
+    # info, erreurs seules au-delà
+    case "$(log_level dnsmasq info)" in
+        debug) DNSMASQ_VERBOSITY="--log-queries --log-dhcp" ;;
+        info)  DNSMASQ_VERBOSITY="" ;;
+        *)     DNSMASQ_VERBOSITY="--quiet-dhcp" ;;
+    esac
+
     # Lancer dnsmasq pour le DHCP sur wlan0
+    # shellcheck disable=SC2086
     dnsmasq \
         --interface=wlan0 \
         --bind-interfaces \
@@ -79,12 +134,14 @@ elif [ "$WLAN_OK" = "1" ]; then
         --dhcp-range=10.42.0.100,10.42.0.200,12h \
         --dhcp-option=3,"${HOTSPOT_IP}" \
         --dhcp-option=6,"${HOTSPOT_IP}" \
+        --address=/#/"${HOTSPOT_IP}" \
         --no-resolv \
         --no-poll \
+        --log-facility="${DNSMASQ_LOG}" \
+        ${DNSMASQ_VERBOSITY} \
         --pid-file="${DNSMASQ_PID}" 2>&1 | while read -r l; do log "dnsmasq: $l"; done &
+    timeline dnsmasq
 
-    # Attendre que le AP soit visible
-    sleep 3
     log "État radio wlan0 :"
     iw dev wlan0 info 2>&1 || true
     log "Domaine réglementaire :"
@@ -93,10 +150,20 @@ elif [ "$WLAN_OK" = "1" ]; then
 fi
 
 # ------------------------------------------------------------------ #
-#  4. Lancement du portail web Flask (port 8080)                      #
+#  4. Répondeur des sondes captives (port 80, hotspot uniquement)     #
+# ------------------------------------------------------------------ #
+# dnsmasq résout tout vers le hotspot (--address=/#/) : les sondes des
+# téléphones arrivent sur le port 80 et sont redirigées vers le portail.
+if hotspot_active; then
+    python3 /opt/tipi-setup/captive.py "${HOTSPOT_IP}" 80 2>&1 | while read -r l; do log "captive: $l"; done &
+    timeline captive
+fi
+
+# ------------------------------------------------------------------ #
+#  5. Lancement du portail web Flask (port 8080)                      #
 # ------------------------------------------------------------------ #
+# exec : le portail devient le PID principal du service et notifie lui-même
+# systemd (READY=1 une fois le port 8080 en écoute, puis watchdog)
 log "Démarrage du portail de configuration (port 8080)..."
-python3 /opt/tipi-setup/app.py
-EXIT_CODE=$?
-log "Flask terminé avec code $EXIT_CODE"
-exit $EXIT_CODE
+timeline portal-start
+exec python3 /opt/tipi-setup/app.py